@@ -1,15 +1,26 @@
+import time
+
+_IMPORT_START = time.perf_counter()  # 用于 --profile-startup 统计导入耗时
+
 import tkinter as tk
 from tkinter import messagebox, font
-from tkinter import ttk
-from PIL import Image, ImageTk, ImageFont
+from tkinter import ttk, filedialog
 import random
 import sys
-import time
-from itertools import combinations
-import socket
 import threading
-import json
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, namedtuple
+
+from assets import ASSETS
+from dice_rng import DiceStream, CosmeticDice
+from scoring import RollSelection, keep_indices
+from engine import GameState, ROLL, BUST, CONTINUE, BANK, TURN, WIN
+from journal import JournalWriter, FLAG_AI_OPPONENT, FLAG_AI_SELF
+from ai import DIFFICULTY_STRATEGIES
+from odds import ROLL_ODDS
+from solver import prefetch_solver
 
 # 骰子表情符号映射
 DICE_EMOJI = {
@@ -24,76 +35,30 @@ DICE_EMOJI = {
 
 
 
-# 检查单个骰子是否有效计分
-def is_die_scoring(die, counts):
-    if die == 1 or die == 5:
-        return True
-    if counts[die] >= 3:
-        return True
-    return False
-
-# 计算一次投掷的得分
-def calculate_score(dice):
-    score = 0
-    counts = [0] * 7
-    for die in dice:
-        counts[die] += 1
-
-    # 计算单个 1 和 5 的得分
-    score += counts[1] * 100
-    score += counts[5] * 50
-
-    # 处理三个相同点数及以上的情况
-    for i in range(1, 7):
-        if counts[i] >= 3:
-            if i == 1:
-                base_score = 1000
-            else:
-                base_score = i * 100
-            multiplier = 2 ** (counts[i] - 3)
-            score += base_score * multiplier
-            if i == 1:
-                score -= counts[1] * 100  # 减去之前单独计算的 1 的得分
-            if i == 5:
-                score -= counts[5] * 50  # 减去之前单独计算的 5 的得分
-
-    # 检查顺子
-    if all(counts[1:7]):
-        score = 1500
-    elif counts[1] and counts[2] and counts[3] and counts[4] and counts[5]:
-        score = 500
-
-    return score
-
-# 检查是否有得分机会
-def has_scoring_opportunity(dice):
-    return calculate_score(dice) > 0
-
-# 检查选中的骰子是否全部有效计分
-def all_dice_scoring(kept_dice, all_dice):
-    counts = [0] * 7
-    for die in all_dice:
-        counts[die] += 1
-    for die in kept_dice:
-        if not is_die_scoring(die, counts):
-            return False
-    return True
-
 class Tooltip:
-    def __init__(self, widget, text):
+    def __init__(self, widget, text, tag=None):
         self.widget = widget
         self.text = text
+        self.tag = tag  # 为 Canvas 中带此标签的图形项显示提示，为 None 时绑定整个控件
         self.tooltip_window = None
-        self.widget.bind("<Enter>", self.show_tooltip)
-        self.widget.bind("<Leave>", self.hide_tooltip)
-        self.widget.bind("<Motion>", self.update_tooltip_position)
+        if tag is None:
+            self.widget.bind("<Enter>", self.show_tooltip)
+            self.widget.bind("<Leave>", self.hide_tooltip)
+            self.widget.bind("<Motion>", self.update_tooltip_position)
+        else:
+            self.widget.tag_bind(tag, "<Enter>", self.show_tooltip)
+            self.widget.tag_bind(tag, "<Leave>", self.hide_tooltip)
+            self.widget.tag_bind(tag, "<Motion>", self.update_tooltip_position)
 
     def show_tooltip(self, event):
         if self.tooltip_window or not self.text:
             return
-        x, y, _, _ = self.widget.bbox("insert")
-        x += self.widget.winfo_rootx() + 25
-        y += self.widget.winfo_rooty() + 25
+        if self.tag is None:
+            x, y, _, _ = self.widget.bbox("insert")
+            x += self.widget.winfo_rootx() + 25
+            y += self.widget.winfo_rooty() + 25
+        else:
+            x, y = event.x_root + 25, event.y_root + 25
         self.tooltip_window = tw = tk.Toplevel(self.widget)
         tw.wm_overrideredirect(True)
         tw.wm_geometry(f"+{x}+{y}")
@@ -113,41 +78,381 @@ class Tooltip:
             x, y = event.x_root + 25, event.y_root + 25
             self.tooltip_window.wm_geometry(f"+{x}+{y}")
 
+# 按固定帧率驱动动画的调度器
+# 每一帧根据真实经过的时间计算应处于第几帧，Tk 事件循环跟不上时直接跳过落后的帧，
+# 保证动画总时长不变、不会越积越慢。on_frame(frame) 在每个实际绘制的帧调用，on_done() 在结束时调用。
+class FrameScheduler:
+    def __init__(self, root, fps, duration, on_frame, on_done=None):
+        self.root = root
+        self.fps = fps
+        self.duration = duration  # 总时长（毫秒）
+        self.on_frame = on_frame
+        self.on_done = on_done
+        self.frame_interval = 1000 / fps
+        self.total_frames = max(1, round(duration / self.frame_interval))
+        self.start_time = None
+        self.last_frame = -1
+        self.dropped_frames = 0  # 因为跟不上而跳过的帧数
+        self.after_id = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.last_frame = -1
+        self.dropped_frames = 0
+        self._tick()
+
+    def cancel(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _tick(self):
+        self.after_id = None
+        elapsed = (time.perf_counter() - self.start_time) * 1000
+        frame = int(elapsed // self.frame_interval)
+        if frame >= self.total_frames:
+            if self.on_done is not None:
+                self.on_done()
+            return
+        if frame > self.last_frame:
+            self.dropped_frames += frame - self.last_frame - 1
+            self.last_frame = frame
+            self.on_frame(frame)
+        # 下一帧的时间点减去已经经过的时间，绘制耗时不会累积到后面的帧上
+        delay = (frame + 1) * self.frame_interval - (time.perf_counter() - self.start_time) * 1000
+        self.after_id = self.root.after(max(1, int(delay)), self._tick)
+
+# 用一块 Canvas 绘制六个骰子
+# 每个骰子由一个方块和一个点数文字两个图形项组成，句柄在创建时保存下来；
+# 更新时先比较新旧外观，只对真正变化的图形项调用 itemconfig。
+class DiceBoard:
+    DIE_SIZE = 80
+    # 六个骰子在棋盘中的位置（左上角坐标）
+    DIE_POSITIONS = [(10, 10), (160, 10), (310, 10), (10, 160), (160, 160), (310, 160)]
+    NORMAL_FILL = "#f0f0f0"
+    KEPT_FILL = "green"
+
+    def __init__(self, parent, on_click, dice_font):
+        self.canvas = tk.Canvas(parent, width=400, height=250, highlightthickness=0)
+        self.on_click = on_click
+        self.faces = [None] * 6  # 每个位置显示的点数，None 表示空位
+        self.kept = [False] * 6
+        self.enabled = [False] * 6
+        self._rendered = [None] * 6  # 上一次实际绘制的外观 (文字, 填充色, 边框宽度)
+        self.rect_items = []
+        self.text_items = []
+        for i, (x, y) in enumerate(self.DIE_POSITIONS):
+            tag = f"die{i}"
+            rect = self.canvas.create_rectangle(x, y, x + self.DIE_SIZE, y + self.DIE_SIZE,
+                                                fill=self.NORMAL_FILL, outline="gray", width=2, tags=(tag,))
+            text = self.canvas.create_text(x + self.DIE_SIZE // 2, y + self.DIE_SIZE // 2,
+                                           text="", font=dice_font, tags=(tag,))
+            self.rect_items.append(rect)
+            self.text_items.append(text)
+            self.canvas.tag_bind(tag, "<Button-1>", lambda event, index=i: self._clicked(index))
+            Tooltip(self.canvas, "普通骰子", tag=tag)
+            self._draw(i)
+
+    def place(self, **kwargs):
+        self.canvas.place(**kwargs)
+
+    def _clicked(self, index):
+        if self.enabled[index]:
+            self.on_click(index)
+
+    def _draw(self, index):
+        face = self.faces[index]
+        text = DICE_EMOJI[face] if face else ""
+        if self.kept[index]:
+            look = (text, self.KEPT_FILL, 4)
+        else:
+            look = (text, self.NORMAL_FILL, 2)
+        old = self._rendered[index]
+        if old == look:
+            return  # 外观没有变化，不重绘
+        if old is None or old[0] != look[0]:
+            self.canvas.itemconfig(self.text_items[index], text=look[0])
+        if old is None or old[1:] != look[1:]:
+            self.canvas.itemconfig(self.rect_items[index], fill=look[1], width=look[2])
+        self._rendered[index] = look
+
+    # 设置某个位置的骰子，face 为 None 时清空
+    def set_die(self, index, face, kept=False, enabled=True):
+        self.faces[index] = face
+        self.kept[index] = kept
+        self.enabled[index] = enabled
+        self._draw(index)
+
+    def set_face(self, index, face):
+        self.faces[index] = face
+        self._draw(index)
+
+    def set_kept(self, index, kept):
+        self.kept[index] = kept
+        self._draw(index)
+
+    # 启用或禁用点击，不影响外观
+    def set_enabled(self, enabled, indices=range(6)):
+        for i in indices:
+            self.enabled[i] = enabled
+
+    def clear(self, index, enabled=False):
+        self.set_die(index, None, enabled=enabled)
+
+    def clear_all(self, enabled=False):
+        for i in range(6):
+            self.clear(i, enabled)
+
+# 操作记录台
+# 界面上只保留最近 max_lines 行（环形缓冲区），同一轮事件循环中的多次追加合并成一次 Text 更新；
+# 完整的历史以结构化记录保存在 records 中（包括没有文字的引擎事件），可以导出为 JSON Lines 文件。
+LOG_MAX_LINES = 200
+
+LogRecord = namedtuple("LogRecord", "time event text")
+
+
+class LogView:
+    def __init__(self, parent, max_lines=LOG_MAX_LINES, **text_options):
+        self.text = tk.Text(parent, state=tk.DISABLED, **text_options)
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)  # 界面上应当显示的行
+        self.records = []  # 完整历史
+        self._pending = []  # 还没写进 Text 的行
+        self._shown = 0  # Text 中当前的行数
+        self._flush_scheduled = False
+
+    def place(self, **kwargs):
+        self.text.place(**kwargs)
+
+    # 追加一条记录；text 为 None 时只保存事件，不显示
+    def append(self, text, event=None):
+        if text is not None:
+            text = text.rstrip("\n")
+        self.records.append(LogRecord(time.time(), event, text))
+        if text is None:
+            return
+        self.lines.append(text)
+        self._pending.append(text)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.text.after_idle(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        if not pending or not self.text.winfo_exists():
+            return
+        self.text.config(state=tk.NORMAL)
+        if len(pending) >= self.max_lines:
+            # 新增的行已经超过上限，直接整体替换
+            self.text.delete("1.0", tk.END)
+            self.text.insert(tk.END, "\n".join(self.lines) + "\n")
+            self._shown = len(self.lines)
+        else:
+            self.text.insert(tk.END, "\n".join(pending) + "\n")
+            self._shown += len(pending)
+            excess = self._shown - self.max_lines
+            if excess > 0:
+                self.text.delete("1.0", f"{excess + 1}.0")  # 删除最早的几行
+                self._shown = self.max_lines
+        self.text.config(state=tk.DISABLED)
+        self.text.see(tk.END)
+
+    def clear(self):
+        self.lines.clear()
+        self.records = []
+        self._pending = []
+        self._shown = 0
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    # 把完整历史导出为 JSON Lines，每行一条记录
+    def export(self, path):
+        import json  # 只有导出时用到，不拖慢游戏启动
+
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                data = {"time": record.time}
+                if record.event is not None:
+                    data.update(record.event._asdict())
+                if record.text is not None:
+                    data["text"] = record.text
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        return len(self.records)
+
+
+# 电脑玩家的节奏：每一步之前的随机等待（毫秒）和投掷动画时长（毫秒），instant 不等待也不播放动画
+Pacing = namedtuple("Pacing", "min_delay max_delay animation")
+PACING = {
+    "realistic": Pacing(800, 1500, 1000),
+    "fast": Pacing(150, 300, 250),
+    "instant": Pacing(0, 0, 0),
+}
+
+
+# 界面消息泵
+# Tk 只能在主线程中调用。网络线程、AI 工作线程等不直接操作界面，而是用 post(类型, 数据) 把消息放进队列，
+# 主线程每帧用 after 取出队列中的全部消息，按顺序交给注册的处理函数。
+# 注册时 merge=True 的类型在同一帧内合并：处理函数只调用一次，参数为这一帧收到的全部数据列表
+# （例如大量房间广播只刷新一次房间列表）。
+class UIMessagePump:
+    INTERVAL = 16  # 检查队列的间隔（毫秒），约每帧一次
+    CALL = "call"  # 内置类型，数据为 (函数, 参数)，在主线程中执行
+
+    def __init__(self, root, interval=INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.handlers = {self.CALL: (self._call, False)}
+        self.running = False
+        self._after_id = None
+        self.start()
+
+    def register(self, kind, handler, merge=False):
+        self.handlers[kind] = (handler, merge)
+
+    # 发送一条消息，可以在任意线程调用
+    def post(self, kind, data=None):
+        self.queue.put((kind, data))
+
+    # 在主线程中执行 func(*args)，可以在任意线程调用
+    def call(self, func, *args):
+        self.post(self.CALL, (func, args))
+
+    @staticmethod
+    def _call(data):
+        func, args = data
+        func(*args)
+
+    def start(self):
+        self.running = True
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _drain(self):
+        self._after_id = None
+        batch = []
+        merged = {}
+        while True:
+            try:
+                kind, data = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            handler, merge = self.handlers.get(kind, (None, False))
+            if handler is None:
+                print(f"没有处理函数的界面消息: {kind}")
+            elif not merge:
+                batch.append((handler, data))
+            elif kind in merged:
+                merged[kind].append(data)
+            else:
+                merged[kind] = [data]
+                batch.append((handler, merged[kind]))
+        for handler, data in batch:
+            if not self.running:
+                break  # 处理过程中窗口已关闭
+            try:
+                handler(data)
+            except Exception as e:
+                print(f"处理界面消息时出错: {e}")
+        if self.running:
+            self._after_id = self.root.after(self.interval, self._drain)
+
+
+# 在线程池中计算 AI 决策，结果通过界面消息泵交回主线程回调，计算再慢也不会卡住窗口
+class AIWorker:
+    def __init__(self, pump, workers=2):
+        self.pump = pump
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai")
+
+    # 在工作线程中执行 func(*args)，完成后在主线程中以结果调用 callback；
+    # func 抛出异常时在主线程中以异常调用 on_error（未指定时只打印）
+    def submit(self, callback, func, *args, on_error=None):
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda future: self.pump.call(self._finish, callback, on_error, future))
+
+    @staticmethod
+    def _finish(callback, on_error, future):
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            if on_error is None:
+                print(f"AI 决策出错: {e}")
+            else:
+                on_error(e)
+            return
+        callback(result)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
 class DiceGame:
-    def __init__(self, root, target_score, is_ai_mode=False):
+    def __init__(self, root, target_score, is_ai_mode=False, ai_difficulty="easy", seed=None, log_lines=LOG_MAX_LINES, journal=None,
+                 pacing="realistic", spectator=False, net=None, autoplay=True):
         self.root = root
         self.root.title("天国拯救骰子游戏")
         self.root.geometry("800x600")
         self.root.resizable(False, False)
-        self.player1_score = 0
-        self.player2_score = 0
-        self.current_player = 1
-        self.round_score = 0
-        self.remaining_dice = 6
-        self.dice = []
-        self.kept_dice = []
+        self.state = GameState(target_score)  # 对局状态与规则都由引擎维护，界面只负责显示
         self.target_score = target_score
-        self.has_rolled = False  # 标记是否已经投掷过骰子
-        self.is_ai_mode = is_ai_mode  # 是否为 AI 对战模式
-        self.round_num = 1
+        self.is_ai_mode = is_ai_mode or spectator  # 是否为 AI 对战模式
+        self.spectator = spectator  # 观战模式：双方都是电脑玩家
+        self.ai_players = {1, 2} if spectator else {2} if is_ai_mode else set()
+        self.autoplay = autoplay  # 为 False 时电脑玩家不自动行动（回放时只显示局面）
+        # 联机对局（netgame.NetSession）：房主运行规则引擎并同步增量，另一方只发送操作意图
+        self.net = net
+        self.remote_players = {net.remote_player} if net is not None else set()
+        self.net_deltas = deque()  # 收到但还没应用的增量（非房主一方）
+        if net is not None:
+            net.attach(self.state)
+        self.pacing = PACING[pacing]
+        self.ai_difficulty = ai_difficulty  # AI 难度：easy 权重策略，medium 查表决定是否继续，hard 完全按求解表决策
+        self.ai_strategy = DIFFICULTY_STRATEGIES[ai_difficulty]
+        self.dice_stream = DiceStream(seed)  # 对局骰子流，同一种子得到相同的骰子
+        self.seed = self.dice_stream.seed
+        self.ai_rng = random.Random(f"{self.seed}:ai")  # AI 决策使用的随机数，同样由对局种子确定
+        self.cosmetic_dice = CosmeticDice()  # 动画专用，不消耗对局的随机数
         self.animation_duration = 1000  # 动画总时长（毫秒）
-        self.animation_steps = 20  # 动画步数
-        self.animation_interval = self.animation_duration // self.animation_steps  # 每步间隔时间
+        self.animation_fps = 20  # 动画帧率，低配机器上跟不上时会自动跳帧
         self.animation_running = False  # 动画是否正在运行
+        self.ui_pump = UIMessagePump(root)
+        self.ai_worker = AIWorker(self.ui_pump)
+        self.roll_request = 0  # 投掷编号，用来丢弃过期的后台结果
+        self.pending_roll = None  # 本次投掷的真实点数，动画开始时就已取出
+        self.prepared = None  # 后台为本次投掷准备好的 (选择表, AI 决策)
+        self.ai_ready_at = None  # AI 可以开始选骰的时间，等待后台决策时不为 None
+        self.journal = journal  # 对局日志（journal.JournalWriter），由本局负责关闭
+        if self.journal is not None:
+            flags = (FLAG_AI_OPPONENT if self.is_ai_mode else 0) | (FLAG_AI_SELF if spectator else 0)
+            self.journal.begin_game(self.seed, target_score, flags)
+
+        # 中等及以上难度需要求解表，提前在后台准备
+        if self.is_ai_mode and self.ai_difficulty != "easy":
+            prefetch_solver(self.target_score)
 
         # 绑定窗口关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         # 显示当前操作玩家
-        self.player_label = tk.Label(root, text=f"当前轮到: 玩家 {self.current_player}",font=("Huiwen-mincho", 16), bd=2, relief=tk.RIDGE)
+        self.player_label = tk.Label(root, text=f"当前轮到: 玩家 {self.state.current_player}",font=("Huiwen-mincho", 16), bd=2, relief=tk.RIDGE)
         self.player_label.place(x=10, y=10)
 
         # 显示玩家1得分
-        self.player1_total_score_label = tk.Label(root, text=f"玩家 1 总得分: {self.player1_score}",font=("Huiwen-mincho", 16))
+        self.player1_total_score_label = tk.Label(root, text=f"玩家 1 总得分: {self.state.scores[0]}",font=("Huiwen-mincho", 16))
         self.player1_total_score_label.place(x=10, y=60)
 
         # 显示玩家2得分
-        self.player2_total_score_label = tk.Label(root, text=f"玩家 2 总得分: {self.player2_score}",font=("Huiwen-mincho", 16))
+        self.player2_total_score_label = tk.Label(root, text=f"玩家 2 总得分: {self.state.scores[1]}",font=("Huiwen-mincho", 16))
         self.player2_total_score_label.place(x=10, y=100)
 
         # 显示目标得分
@@ -155,48 +460,24 @@ class DiceGame:
         self.target_score_label.place(x=5, y=480)
 
         # 显示本轮得分
-        self.round_score_label = tk.Label(root, text=f"本轮: {self.round_score}",font=("Huiwen-mincho", 16))
+        self.round_score_label = tk.Label(root, text=f"本轮: {self.state.round_score}",font=("Huiwen-mincho", 16))
         self.round_score_label.place(x=5, y=510)
 
         # 实时计分器
         self.selected_score_label = tk.Label(root, text="选中: 0",font=("Huiwen-mincho", 16))
         self.selected_score_label.place(x=5, y=540)
 
-        # 骰子按钮
-        self.dice_buttons = []
+        # 下一次投掷的爆点概率和期望得分（查精确概率表）
+        self.odds_label = tk.Label(root, text="", font=("Huiwen-mincho", 12))
+        self.odds_label.place(x=180, y=440)
+        self.update_odds_label()
+
+        # 骰子棋盘
         default_font_size = 10  # 假设默认字体大小为 10
         enlarged_font_size = default_font_size * 8  # 放大 5 倍
         enlarged_font = ("Arial", enlarged_font_size)
-        zeroX = 10
-        button1 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(0))
-        button1.place(x=180, y=180, width=80, height=80)
-        self.dice_buttons.append(button1)
-        Tooltip(button1, "普通骰子")
-
-        button2 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(1))
-        button2.place(x=330, y=180, width=80, height=80)
-        self.dice_buttons.append(button2)
-        Tooltip(button2, "普通骰子")
-
-        button3 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(2))
-        button3.place(x=480, y=180, width=80, height=80)
-        self.dice_buttons.append(button3)
-        Tooltip(button3, "普通骰子")
-
-        button4 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(3))
-        button4.place(x=180, y=330, width=80, height=80)
-        self.dice_buttons.append(button4)
-        Tooltip(button4, "普通骰子")
-
-        button5 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(4))
-        button5.place(x=330, y=330, width=80, height=80)
-        self.dice_buttons.append(button5)
-        Tooltip(button5, "普通骰子")
-
-        button6 = tk.Button(root, text="", font=enlarged_font, command=lambda: self.toggle_keep_dice(5))
-        button6.place(x=480, y=330, width=80, height=80)
-        self.dice_buttons.append(button6)
-        Tooltip(button6, "普通骰子")
+        self.dice_board = DiceBoard(root, self.toggle_keep_dice, enlarged_font)
+        self.dice_board.place(x=170, y=170, width=400, height=250)
 
         # 投掷按钮
         self.roll_button = tk.Button(root, text="投掷骰子",font=("Huiwen-mincho", 16),command=self.roll_dice)
@@ -209,96 +490,235 @@ class DiceGame:
         self.end_turn_button.place(x=690, y=540)
 
         # 操作日志
-        self.record_text = tk.Text(root, height=6, width=68,font=("微软雅黑", 10),bd=2, relief=tk.RIDGE)
-        self.record_text.place(x=225, y=10)
+        self.log_view = LogView(root, log_lines, height=6, width=68, font=("微软雅黑", 10), bd=2, relief=tk.RIDGE)
+        self.log_view.place(x=225, y=10)
+        self.export_log_button = tk.Button(root, text="导出", font=("Huiwen-mincho", 10), command=self.export_log)
+        self.export_log_button.place(x=735, y=10)
+        if self.is_net_client():
+            self.insert_log("联机对局：骰子由房主投出\n")
+        else:
+            self.insert_log(f"对局种子: {self.seed}\n")  # 记录种子，便于复现对局
+
+        if self.is_ai_turn():
+            self.roll_button.config(state=tk.DISABLED)
+            if self.autoplay:
+                self.root.after(self._get_random_delay(), self.ai_turn)
+        elif self.is_remote_turn():
+            self.roll_button.config(state=tk.DISABLED)
 
-        if self.is_ai_mode and self.current_player == 2:
-            self.root.after(self._get_random_delay(), self.ai_turn)
+    # 当前是否轮到电脑玩家操作
+    def is_ai_turn(self):
+        return self.state.current_player in self.ai_players
+
+    # 当前是否轮到联机对局的另一方操作
+    def is_remote_turn(self):
+        return self.state.current_player in self.remote_players
+
+    # 本机是否为联机对局中的非房主一方：操作只发给房主，状态由房主的增量驱动
+    def is_net_client(self):
+        return self.net is not None and not self.net.is_host
+
+    # 插入一行日志，界面在本轮事件循环结束时统一刷新并滚动到最底部
+    def insert_log(self, action, event=None):
+        self.log_view.append(action, event)
+
+    # 把本局完整的操作记录导出为 JSON Lines 文件
+    def export_log(self):
+        path = filedialog.asksaveasfilename(parent=self.root, title="导出操作记录", defaultextension=".jsonl",
+                                            initialfile=f"dice_log_{self.seed}.jsonl",
+                                            filetypes=[("JSON Lines", "*.jsonl"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            count = self.log_view.export(path)
+        except OSError as e:
+            messagebox.showerror("导出失败", str(e), parent=self.root)
+            return
+        messagebox.showinfo("导出完成", f"已导出 {count} 条记录到 {path}", parent=self.root)
 
-    # 在DiceGame类中添加一个方法用于插入日志并滚动到最底部
-    def insert_log(self, action):
-        self.record_text.insert(tk.END, action)
-        self.record_text.see(tk.END)
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
 
     def on_closing(self):
+        self.ui_pump.stop()
+        self.ai_worker.shutdown()
+        self.close_journal()
         self.root.destroy()
         sys.exit()
 
+    # 把规则引擎产生的事件渲染到界面上
+    def handle_events(self, events):
+        if self.journal is not None:
+            self.journal.write(events)
+        if self.net is not None and self.net.is_host:
+            self.net.publish(events)
+        for event in events:
+            self.insert_log(self.describe_event(event), event)
+            if event.kind == ROLL:
+                for i, die in enumerate(event.dice):
+                    self.dice_board.set_face(i, die)  # 更新骰子点数显示
+            elif event.kind == CONTINUE:
+                self.round_score_label.config(text=f"本轮: {event.round_score}")  # 更新本轮得分显示
+            elif event.kind == TURN:
+                self.start_next_turn()
+            elif event.kind == WIN:
+                self.ui_pump.stop()
+                self.ai_worker.shutdown()
+                self.close_journal()
+                messagebox.showinfo("游戏结束", f"玩家 {event.player} 获胜！")
+                self.root.destroy()
+                sys.exit()
+
+    # 事件在操作记录中显示的文字，不需要显示时返回 None
+    def describe_event(self, event):
+        if self.spectator:
+            who = f"AI {event.player}"
+        else:
+            who = 'AI' if event.player in self.ai_players else '玩家'
+        if event.kind == BUST:
+            return f"[回合{event.round_num}][{who}]投掷骰子无得分机会，回合结束，回合得分为0。\n"
+        if event.kind == CONTINUE:
+            return f"[回合{event.round_num}][{who}]选取骰子点数为: {' '.join(map(str, event.dice))},获取得分{event.score},回合得分为{event.round_score},[选择]继续投掷\n"
+        if event.kind == BANK:
+            return f"[回合{event.round_num}][{who}]选取骰子点数为: {' '.join(map(str, event.dice))},获取得分{event.score},回合得分为{event.round_score},[选择]结束本轮\n"
+        return None
+
+    # 直接显示某一轮开始时的局面（回放跳转用），events 为此前的全部事件，不播放动画也不触发 AI
+    def show_state(self, state, events):
+        self.state = state.copy()
+        self.log_view.clear()
+        self.insert_log(f"对局种子: {self.seed}\n")
+        for event in events:
+            self.insert_log(self.describe_event(event), event)
+        self.update_score_labels()
+        self.dice_board.clear_all()
+        self.selected_score_label.config(text="选中: 0")
+        self.update_odds_label()
+
+    # 禁用全部操作（回放时只能观看）
+    def disable_controls(self):
+        self.roll_button.config(state=tk.DISABLED)
+        self.continue_button.config(state=tk.DISABLED)
+        self.end_turn_button.config(state=tk.DISABLED)
+        self.dice_board.set_enabled(False)
+
     def roll_dice(self):
         self.roll_button.config(state=tk.DISABLED)
-        if self.has_rolled or self.animation_running:
+        if self.state.has_rolled or self.animation_running:
             return  # 如果已经投掷过或动画正在运行，不进行任何操作
-        self.kept_dice = []
-        self.animation_running = True
-        self.animate_dice(0)
-
-    # 骰子动画
-    def animate_dice(self, step):
-        if step < self.animation_steps:
-            for i, button in enumerate(self.dice_buttons):
-                if i < self.remaining_dice:
-                    button.config(state=tk.NORMAL, bg="SystemButtonFace", relief=tk.RAISED)
-                    button.config(text=DICE_EMOJI[random.randint(1, 6)])
-                else:
-                    button.config(text="", state=tk.DISABLED, bg="SystemButtonFace", relief=tk.RAISED)
-            self.root.after(self.animation_interval, self.animate_dice, step + 1)
+        if self.is_net_client():
+            self.net.send_roll()  # 点数由房主投出，收到增量后再播放动画
+            return
+        self.start_roll()
+        if self.is_ai_turn():
+            duration = self.pacing.animation
+        elif self.is_remote_turn():
+            duration = 0  # 对方的投掷由对方自己播放动画，这边立即同步出去
         else:
-            self.animation_running = False
-            self.finalize_roll()
+            duration = self.animation_duration
+        self.play_roll(duration)
+
+    # 播放投掷动画，结束后按 pending_roll 中的点数完成投掷
+    def play_roll(self, duration):
+        if duration <= 0:
+            self.finalize_roll()  # 不播放动画
+            return
+        self.animation_running = True
+        self.animation = FrameScheduler(self.root, self.animation_fps, duration, self.animate_dice, self.finish_animation)
+        self.animation.start()
+
+    # 动画开始时就从骰子流中取出真实点数，并在后台线程中建好这次投掷的选择表、算好 AI 的决策，
+    # 动画播放完时结果通常已经就绪，求解再慢也被动画时间掩盖
+    def start_roll(self):
+        values = self.dice_stream.roll(self.state.remaining_dice)
+        self.pending_roll = values
+        self.roll_request += 1
+        self.prepared = None
+        self.ai_ready_at = None
+        request = self.roll_request
+        speculative = self.state.copy()
+        ai_turn = self.is_ai_turn()
+
+        def prepare():
+            selection = RollSelection(values).prepare()
+            speculative.roll(values, selection)
+            decision = None
+            if ai_turn and speculative.has_rolled:
+                decision = self.ai_strategy(speculative, self.ai_rng)
+            return selection, decision
+
+        self.ai_worker.submit(lambda result: self.on_roll_prepared(request, result), prepare,
+                              on_error=lambda error: self.on_roll_prepare_failed(request, error))
+
+    def on_roll_prepared(self, request, result):
+        if request != self.roll_request:
+            return  # 已经是另一次投掷，丢弃过期的结果
+        self.prepared = result
+        if self.ai_ready_at is not None:
+            self.schedule_ai_choice()  # 骰子已经落地，AI 正在等这个决策
+
+    # 后台准备出错：骰子落地后在主线程中重新建选择表、重新决策，不让 AI 的回合卡住
+    def on_roll_prepare_failed(self, request, error):
+        if request != self.roll_request:
+            return
+        self.insert_log(f"AI 后台决策出错，改为直接决策: {error}\n")
+        self.on_roll_prepared(request, (None, None))
+
+    # 骰子动画的一帧：待投掷的位置显示随机点数，其余位置清空
+    def animate_dice(self, frame):
+        for i in range(6):
+            if i < self.state.remaining_dice:
+                self.dice_board.set_die(i, self.cosmetic_dice.next_die())
+            else:
+                self.dice_board.clear(i)
+
+    def finish_animation(self):
+        self.animation_running = False
+        self.finalize_roll()
+        if self.net_deltas:
+            self.apply_net_deltas()
 
     # 摇骰子结束后的处理
     def finalize_roll(self):
-        self.dice = [random.randint(1, 6) for _ in range(self.remaining_dice)] #生成随机骰子点数
-        for i, die in enumerate(self.dice):
-            self.dice_buttons[i].config(text=DICE_EMOJI[die])  # 更新按钮骰子点数显示
-
-        if not has_scoring_opportunity(self.dice):
-            action = f"[回合{self.round_num}][{'AI' if self.current_player == 2 and self.is_ai_mode else '玩家'}]投掷骰子无得分机会，回合结束，回合得分为0。\n"
-            self.insert_log(action)
-            self.round_score = 0
-            self.end_turn()
-            return
-        else:
-            self.continue_button.config(state=tk.DISABLED)  # 初始时继续投掷按钮不可用
-            self.end_turn_button.config(state=tk.DISABLED)  # 初始时结束按钮不可用
-            self.has_rolled = True
-            self.update_continue_button_state()
-            self.update_selected_score()
+        values, self.pending_roll = self.pending_roll, None  # 动画开始时已从对局骰子流中取出点数
+        selection = self.prepared[0] if self.prepared else None
+        self.handle_events(self.state.roll(values, selection))
+        if not self.state.has_rolled:
+            return  # 投掷无得分机会，已经轮到下一位玩家
+
+        self.update_continue_button_state()
+        self.update_selected_score()
         self.roll_button.config(state=tk.DISABLED)  # 投掷后禁用投掷按钮
+        self.continue_button.config(state=tk.DISABLED)  # 初始时继续投掷按钮不可用
+        self.end_turn_button.config(state=tk.DISABLED)  # 初始时结束按钮不可用
 
         # 如果是AI模式且当前玩家是AI，自动选择骰子
-        if self.is_ai_mode and self.current_player == 2:
-            # 禁用玩家操作按钮
-            for button in self.dice_buttons:
-                button.config(state=tk.DISABLED, disabledforeground=button.cget("foreground"))
-            self.roll_button.config(state=tk.DISABLED)
-            self.continue_button.config(state=tk.DISABLED)
-            self.end_turn_button.config(state=tk.DISABLED)
-            self.root.after(self._get_random_delay(), self.ai_choose_dice) # AI选择骰子
+        if self.is_ai_turn():
+            # 禁用玩家操作骰子
+            self.dice_board.set_enabled(False)
+            # AI选择骰子：等待一段时间后开始，决策还没算好时由 on_roll_prepared 接着安排
+            self.ai_ready_at = time.perf_counter() + self._get_random_delay() / 1000
+            if self.prepared:
+                self.schedule_ai_choice()
+        elif self.is_remote_turn():
+            self.dice_board.set_enabled(False)  # 等待对方留骰
         else:
-            # 启用玩家操作按钮
-            for button in self.dice_buttons:
-                button.config(state=tk.NORMAL)
-            self.roll_button.config(state=tk.DISABLED)
-            self.continue_button.config(state=tk.DISABLED)
-            self.end_turn_button.config(state=tk.DISABLED)
+            # 启用玩家操作骰子
+            self.dice_board.set_enabled(True)
 
     def toggle_keep_dice(self, index):
-        if index < len(self.dice):
-            if index in self.kept_dice:
-                self.kept_dice.remove(index)
-                self.dice_buttons[index].config(bg="SystemButtonFace", relief=tk.RAISED)
-            else:
-                self.kept_dice.append(index)
-                self.dice_buttons[index].config(bg="green", relief=tk.SUNKEN)
+        if index < len(self.state.dice):
+            kept_mask = self.state.toggle_keep(index)
+            self.dice_board.set_kept(index, bool(kept_mask >> index & 1))
             self.update_continue_button_state()
             self.update_selected_score()
 
     def update_continue_button_state(self):
-        if self.is_ai_mode and self.current_player == 2:
-            return  # 如果是AI操作，不改变按钮状态
-        kept_values = [self.dice[i] for i in self.kept_dice]
-        if len(self.kept_dice) > 0 and all_dice_scoring(kept_values, self.dice):
+        if self.is_ai_turn() or self.is_remote_turn():
+            return  # 如果是AI或对方操作，不改变按钮状态
+        if self.state.selection_valid():
             self.continue_button.config(state=tk.NORMAL)
             self.end_turn_button.config(state=tk.NORMAL)  # 启用结束按钮
         else:
@@ -306,200 +726,360 @@ class DiceGame:
             self.end_turn_button.config(state=tk.DISABLED)  # 禁用结束按钮
 
     def update_selected_score(self):
-        kept_values = [self.dice[i] for i in self.kept_dice]
-        if all_dice_scoring(kept_values, self.dice):
-            score = calculate_score(kept_values)
+        self.selected_score_label.config(text=f"选中: {self.state.selected_score()}")
+        self.update_odds_label()
+
+    # 显示按当前选择留骰后，下一次投掷剩余骰子的爆点概率和期望得分
+    def update_odds_label(self):
+        if self.state.has_rolled:
+            n = len(self.state.dice) - self.state.kept_count() or 6
         else:
-            score = 0
-        self.selected_score_label.config(text=f"选中: {score}")
+            n = self.state.remaining_dice
+        odds = ROLL_ODDS[n]
+        self.odds_label.config(text=f"投掷 {n} 个骰子: 爆点概率 {odds.bust:.1%}，期望得分 {odds.expected:.0f}")
 
     def continue_turn(self):
-        kept_values = [self.dice[i] for i in self.kept_dice]
-        score = calculate_score(kept_values)
-        self.round_score += score
-        self.round_score_label.config(text=f"本轮: {self.round_score}")  # 更新本轮得分显示
-        action = f"[回合{self.round_num}][{'AI' if self.current_player == 2 and self.is_ai_mode else '玩家'}]选取骰子点数为: {' '.join(map(str, kept_values))},获取得分{score},回合得分为{self.round_score},[选择]继续投掷\n"
-        self.insert_log(action)
-        remaining = []
-        remaining_buttons = []
-        for i, die in enumerate(self.dice):
-            if i not in self.kept_dice:
-                remaining.append(die)
-                remaining_buttons.append(i)
-        self.remaining_dice = len(remaining)
-        if self.remaining_dice == 0:
-            self.remaining_dice = 6
-        self.dice = remaining
+        if self.is_net_client():
+            self.send_keep_intent(True)
+            return
+        self.keep_and_continue()
+        self.roll_button.config(state=tk.NORMAL)  # 启用投掷按钮
+        self.roll_dice()
+
+    # 留下选中的骰子，从棋盘上移走，剩下的骰子等待下一次投掷
+    def keep_and_continue(self):
+        kept_mask = self.state.kept_mask
+        self.handle_events(self.state.continue_turn())
         for i in range(6):
-            if i in remaining_buttons:
-                self.dice_buttons[i].config(state=tk.NORMAL)
+            if kept_mask >> i & 1:
+                self.dice_board.clear(i)
             else:
-                self.dice_buttons[i].config(text="", state=tk.DISABLED, bg="SystemButtonFace", relief=tk.RAISED)
-        self.has_rolled = False  # 重置投掷标记
-        self.roll_button.config(state=tk.NORMAL)  # 启用投掷按钮
+                self.dice_board.set_enabled(True, [i])
         self.continue_button.config(state=tk.DISABLED)  # 继续投掷按钮初始不可用
-        self.roll_dice()
 
     def end_turn(self):
-        kept_values = [self.dice[i] for i in self.kept_dice]
-        score = calculate_score(kept_values)
-        self.round_score += score
-        action = f"[回合{self.round_num}][{'AI' if self.current_player == 2 and self.is_ai_mode else '玩家'}]选取骰子点数为: {' '.join(map(str, kept_values))},获取得分{score},回合得分为{self.round_score},[选择]结束本轮\n"
-        self.record_text.insert(tk.END, action)
-        if self.current_player == 1:
-            self.player1_score += self.round_score
-            self.current_player = 2
-        else:
-            self.player2_score += self.round_score
-            self.current_player = 1
-            self.round_num += 1
-
-        self.player1_total_score_label.config(text=f"玩家 1 总得分: {self.player1_score}")
-        self.player2_total_score_label.config(text=f"玩家 2 总得分: {self.player2_score}")
-        self.round_score = 0
-        self.round_score_label.config(text=f"本轮: {self.round_score}")
-        self.remaining_dice = 6
-        self.player_label.config(text=f"当前玩家: 玩家 {self.current_player}")
-
-        for button in self.dice_buttons:
-            button.config(text="", bg="SystemButtonFace", state=tk.DISABLED, relief=tk.RAISED)
+        if self.is_net_client():
+            self.send_keep_intent(False)
+            return
+        self.handle_events(self.state.end_turn())
+
+    # 换人后刷新界面，并根据下一位玩家启用按钮或安排AI行动
+    def start_next_turn(self):
+        self.update_score_labels()
+
+        self.dice_board.clear_all()
         self.continue_button.config(state=tk.DISABLED)
         self.end_turn_button.config(state=tk.DISABLED)
         self.selected_score_label.config(text="选中: 0")
-        self.has_rolled = False  # 重置投掷标记
-        self.roll_button.config(state=tk.NORMAL)  # 启用投掷按钮
+        self.update_odds_label()
 
-        if self.player1_score >= self.target_score:
-            messagebox.showinfo("游戏结束", "玩家 1 获胜！")
-            self.root.destroy()
-            sys.exit()
-        elif self.player2_score >= self.target_score:
-            messagebox.showinfo("游戏结束", "玩家 2 获胜！")
-            self.root.destroy()
-            sys.exit()
+        if self.state.winner:
+            return  # 对局已结束，等待显示获胜信息
 
-        if self.is_ai_mode and self.current_player == 2:
+        if self.is_ai_turn():
             # 禁用玩家操作按钮
-            for button in self.dice_buttons:
-                button.config(state=tk.DISABLED)
             self.roll_button.config(state=tk.DISABLED)
-            self.continue_button.config(state=tk.DISABLED)
-            self.end_turn_button.config(state=tk.DISABLED)
-            self.root.after(self._get_random_delay(), self.ai_turn)
+            if self.autoplay:
+                self.root.after(self._get_random_delay(), self.ai_turn)
+        elif self.is_remote_turn():
+            self.roll_button.config(state=tk.DISABLED)  # 等待对方操作
         else:
             # 启用玩家操作按钮
-            for button in self.dice_buttons:
-                button.config(state=tk.NORMAL)
+            self.dice_board.set_enabled(True)
             self.roll_button.config(state=tk.NORMAL)
-            self.continue_button.config(state=tk.DISABLED)
-            self.end_turn_button.config(state=tk.DISABLED)
+
+    def update_score_labels(self):
+        self.player1_total_score_label.config(text=f"玩家 1 总得分: {self.state.scores[0]}")
+        self.player2_total_score_label.config(text=f"玩家 2 总得分: {self.state.scores[1]}")
+        self.round_score_label.config(text=f"本轮: {self.state.round_score}")
+        self.player_label.config(text=f"当前玩家: 玩家 {self.state.current_player}")
 
     def ai_turn(self):
         self.root.after(self._get_random_delay(), self.roll_dice)
 
-    def ai_choose_dice(self):
-        all_combinations = []  # 存储所有可能的骰子组合
-        for r in range(1, len(self.dice) + 1):
-            for comb in combinations(range(len(self.dice)), r):
-                kept_values = [self.dice[i] for i in comb]
-                if all_dice_scoring(kept_values, self.dice):
-                    all_combinations.append(comb)
-
-        if not all_combinations:
-            # 没有有效计分的骰子组合，直接结束回合
-            action = f"[回合{self.round_num}][AI]无有效计分骰子，回合得分为0，[选择]结束本轮\n"
-            self.insert_log(action)
-            self.root.after(self._get_random_delay(), self.end_turn)
-            return
-
-        scores = [calculate_score([self.dice[i] for i in comb]) for comb in all_combinations]  # 计算所有组合的得分
-        max_score_comb = all_combinations[scores.index(max(scores))]  # 获取最大得分的骰子组合
-        print(max_score_comb)
-
-        # 计算选取完后的剩余骰子数量
-        remaining_dice_after_selection = len(self.dice) - len(max_score_comb)
-        print(remaining_dice_after_selection)
-        if remaining_dice_after_selection == 0:
-            remaining_dice_after_selection = 6  # 如果选取完后剩余0个骰子，根据规则重新投掷6个骰子
-
-        # 根据场上情况决定策略
-        remaining_score_to_win = self.target_score - self.player2_score if self.is_ai_mode else self.target_score - self.player1_score
-        current_round_score = self.round_score
-
-        aggressive_weight = 0
-        conservative_weight = 0
-
-        if remaining_score_to_win > 2 * max(scores):
-            # 距离胜利还远，更倾向于激进策略
-            aggressive_weight = 70
-            conservative_weight = 30
-        elif remaining_score_to_win <= max(scores):
-            # 可以一轮获胜，保守结束回合
-            aggressive_weight = 20
-            conservative_weight = 80
-        elif remaining_dice_after_selection < 3:
-            # 剩余骰子少，保守策略
-            aggressive_weight = 30
-            conservative_weight = 70
-        else:
-            # 其他情况，激进和保守策略权重相当
-            aggressive_weight = 50
-            conservative_weight = 50
-
-        strategy_choice = random.choices(['aggressive', 'conservative'], weights=[aggressive_weight, conservative_weight])[0]
+    def schedule_ai_choice(self):
+        decision = self.prepared[1]
+        if decision is None:
+            decision = self.decide_now()
+        delay = max(0, int((self.ai_ready_at - time.perf_counter()) * 1000))
+        self.ai_ready_at = None
+        self.root.after(delay, lambda: self.ai_choose_dice(*decision))
 
-        if strategy_choice == 'aggressive':
-            self.kept_dice = list(max_score_comb)
-        else:
-            if current_round_score == 0 and remaining_dice_after_selection == 6 and max(scores) < 200:
-                # 第一回合得分低时，只选一个骰子
-                single_comb = random.choice([comb for comb in all_combinations if len(comb) == 1])
-                self.kept_dice = list(single_comb)
-            else:
-                self.kept_dice = list(max_score_comb)
+    # 在主线程中为当前投掷做 AI 决策，策略仍然出错时留下得分最高的骰子并结束本轮
+    def decide_now(self):
+        try:
+            return self.ai_strategy(self.state, self.ai_rng)
+        except Exception as e:
+            self.insert_log(f"AI 决策出错，结束本轮: {e}\n")
+            keep = self.state.selection.keeps[0]
+            return keep_indices(self.state.dice, keep.faces), False
 
+    def ai_choose_dice(self, kept_dice, go_on):
         def select_next_dice(index_list, idx=0):
             if idx < len(index_list):
                 index = index_list[idx]
-                self.kept_dice = [index_list[i] for i in range(idx + 1)]
-                self.dice_buttons[index].config(bg="green", relief=tk.SUNKEN)
+                self.state.set_kept_indices(index_list[:idx + 1])
+                self.dice_board.set_kept(index, True)
                 self.update_continue_button_state()
                 self.update_selected_score()
                 self.root.after(self._get_random_delay(), lambda: select_next_dice(index_list, idx + 1))
             else:
-                # 所有骰子选择完成后，根据策略决定下一步操作
-                if strategy_choice == 'aggressive' or remaining_dice_after_selection == 6:
+                # 所有骰子选择完成后，根据决策继续投掷或结束本轮
+                if go_on:
                     self.root.after(self._get_random_delay(), self.continue_turn)
                 else:
                     self.root.after(self._get_random_delay(), self.end_turn)
 
-        select_next_dice(self.kept_dice)
+        select_next_dice(kept_dice)
 
     def _get_random_delay(self):
-        return int(random.uniform(800, 1500))
+        return int(random.uniform(self.pacing.min_delay, self.pacing.max_delay))
+
+    # 联机对局的消息（主线程）
+    def on_net_message(self, message):
+        kind = message["type"]
+        if self.net.is_host:
+            if kind == "intent":
+                self.on_net_intent(message)
+            elif kind == "resync":
+                self.net.resend(message.get("seq", -1))
+        elif kind in ("delta", "snapshot"):
+            self.on_net_update(message)
+        elif kind == "error":
+            self.insert_log(f"房主拒绝了操作: {message.get('reason')}\n")
+            self.restore_controls()
+
+    # 房主：执行对方发来的操作意图，与当前局面不符时拒绝
+    def on_net_intent(self, message):
+        from netgame import unpack_intent
+
+        try:
+            seq, kind, kept_mask = unpack_intent(message["data"])
+        except ValueError as e:
+            self.net.reject(str(e))
+            return
+        if not self.is_remote_turn() or self.state.winner:
+            self.net.reject("还没有轮到你", seq)
+        elif seq != self.net.seq or self.animation_running or self.pending_roll is not None:
+            self.net.reject("局面已经变化，请重新操作", seq)
+        elif kind == ROLL:
+            if self.state.has_rolled:
+                self.net.reject("请先留下骰子", seq)
+            else:
+                self.roll_dice()
+        elif not self.state.has_rolled:
+            self.net.reject("请先投掷骰子", seq)
+        else:
+            self.state.set_kept_mask(kept_mask)
+            if not self.state.selection_valid():
+                self.state.set_kept_mask(0)
+                self.net.reject("选中的骰子无法计分", seq)
+                return
+            for i in range(len(self.state.dice)):
+                self.dice_board.set_kept(i, bool(self.state.kept_mask >> i & 1))
+            self.update_selected_score()
+            if kind == CONTINUE:
+                self.continue_turn()
+            else:
+                self.end_turn()
+
+    # 非房主一方：留骰的决定发给房主，等待房主同步结果
+    def send_keep_intent(self, go_on):
+        self.continue_button.config(state=tk.DISABLED)
+        self.end_turn_button.config(state=tk.DISABLED)
+        self.dice_board.set_enabled(False)
+        self.net.send_keep(self.state.kept_mask, go_on)
+
+    # 非房主一方：收到增量或快照
+    def on_net_update(self, message):
+        try:
+            result = self.net.accept(message)
+        except ValueError as e:
+            self.insert_log(f"{e}，重新同步\n")
+            self.net.request_snapshot()
+            return
+        if result is None:
+            self.net.request_resync()  # 中间缺了增量
+            return
+        state, deltas = result
+        if state is not None:
+            self.load_snapshot(state)
+        self.net_deltas.extend(deltas)
+        if not self.animation_running:
+            self.apply_net_deltas()
+
+    # 依次应用房主的增量；投掷先播放动画，动画结束后（finish_animation）再接着应用后面的增量
+    def apply_net_deltas(self):
+        while self.net_deltas and not self.animation_running and not self.state.winner:
+            delta = self.net_deltas.popleft()
+            try:
+                self.apply_net_delta(delta)
+            except ValueError as e:
+                self.insert_log(f"与房主的局面不一致（{e}），重新同步\n")
+                self.net_deltas.clear()
+                self.net.request_snapshot()
+                return
+
+    def apply_net_delta(self, delta):
+        state = self.state
+        if delta.kind == ROLL:
+            if state.has_rolled or len(delta.value) != state.remaining_dice:
+                raise ValueError("投掷的骰子个数不符")
+            self.pending_roll = list(delta.value)
+            self.prepared = None
+            self.play_roll(self.animation_duration)
+        elif delta.kind == TURN:
+            if state.current_player != delta.value:
+                raise ValueError(f"应轮到玩家 {delta.value}")
+        else:
+            state.set_kept_mask(delta.value)
+            if not state.selection_valid():
+                raise ValueError("留下的骰子无法计分")
+            for i in range(len(state.dice)):
+                self.dice_board.set_kept(i, bool(state.kept_mask >> i & 1))
+            if delta.kind == CONTINUE:
+                self.keep_and_continue()
+                self.roll_button.config(state=tk.DISABLED)  # 剩下的骰子由房主接着投掷
+            else:
+                self.handle_events(state.end_turn())
+
+    # 换成房主发来的局面（中途加入、重连或局面不一致时）
+    def load_snapshot(self, state):
+        if self.animation_running:
+            self.animation.cancel()
+            self.animation_running = False
+        self.pending_roll = None
+        self.net_deltas.clear()
+        self.state = state
+        self.update_score_labels()
+        self.dice_board.clear_all()
+        if state.has_rolled:
+            for i, die in enumerate(state.dice):
+                self.dice_board.set_die(i, die, kept=bool(state.kept_mask >> i & 1))
+        self.update_selected_score()
+        self.restore_controls()
+
+    # 按当前局面恢复本机玩家可以进行的操作
+    def restore_controls(self):
+        local_turn = not self.is_remote_turn() and not self.state.winner
+        self.roll_button.config(state=tk.NORMAL if local_turn and not self.state.has_rolled else tk.DISABLED)
+        self.dice_board.set_enabled(local_turn and self.state.has_rolled, range(len(self.state.dice)))
+        if local_turn and self.state.has_rolled:
+            self.update_continue_button_state()
+        else:
+            self.continue_button.config(state=tk.DISABLED)
+            self.end_turn_button.config(state=tk.DISABLED)
+
+# 对局回放界面：用 DiceGame 显示局面，拖动滑块或点击按钮直接跳到任意一轮，不播放动画
+class ReplayViewer:
+    def __init__(self, root, replay, is_ai_mode=False, spectator=False):
+        self.replay = replay
+        self.game = DiceGame(root, replay.target_score, is_ai_mode=is_ai_mode, seed=replay.seed, spectator=spectator,
+                             autoplay=False)
+        self.game.disable_controls()
+        root.title(f"对局回放 - 种子 {replay.seed}")
+
+        self.turn_label = tk.Label(root, font=("Huiwen-mincho", 12))
+        self.turn_label.place(x=180, y=470)
+        self.scale = tk.Scale(root, from_=0, to=len(replay.turns) - 1, orient=tk.HORIZONTAL, showvalue=False,
+                              command=lambda value: self.jump(int(value)))
+        self.scale.place(x=180, y=500, width=400)
+        prev_button = tk.Button(root, text="上一轮", font=("Huiwen-mincho", 12), command=lambda: self.step(-1))
+        prev_button.place(x=180, y=535, width=100)
+        next_button = tk.Button(root, text="下一轮", font=("Huiwen-mincho", 12), command=lambda: self.step(1))
+        next_button.place(x=480, y=535, width=100)
+        self.index = None
+        self.jump(0)
+
+    def step(self, delta):
+        index = min(max(self.index + delta, 0), len(self.replay.turns) - 1)
+        self.scale.set(index)
+        self.jump(index)
+
+    def jump(self, index):
+        if index == self.index:
+            return
+        self.index = index
+        state, event_count = self.replay.turns[index]
+        self.game.show_state(state, self.replay.events[:event_count])
+        if state.winner:
+            text = f"第 {index + 1}/{len(self.replay.turns)} 步：对局结束，玩家 {state.winner} 获胜"
+        else:
+            text = f"第 {index + 1}/{len(self.replay.turns)} 步：第 {state.round_num} 回合，玩家 {state.current_player}"
+        self.turn_label.config(text=text)
+
+
+# 启动耗时统计：按顺序记录各阶段用时，python DiceGame.py --profile-startup 时打印
+class StartupProfile:
+    def __init__(self, start):
+        self.start = start
+        self.last = start
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, background=()):
+        print("启动耗时：")
+        for name, ms in self.phases:
+            print(f"  {name:<12}{ms:8.1f} ms")
+        print(f"  {'合计':<12}{(self.last - self.start) * 1000:8.1f} ms")
+        # 后台线程与主线程并行，不计入合计
+        for name, ms in background:
+            print(f"  {name:<12}{ms:8.1f} ms（后台）")
+
+
+PREBUILD_DELAY = 300  # 启动后多久开始提前创建其余页面（毫秒）
+
 
 class UI_Core(tk.Tk):
-    def __init__(self):
+    def __init__(self, profile=None):
         super().__init__()
         self.title("DiceGame-天国拯救骰子游戏")
         self.geometry("800x600")
         self.resizable(False, False)
         self.current_page = None
+        self.pages = {}  # 页面类 -> 已创建的页面，页面只创建一次，之后切换时直接提到最上层
+        if profile:
+            profile.mark("Tk 初始化")
+        self.warm_start = time.perf_counter()
+        self.warm_thread = ASSETS.warm()  # 后台预先解码背景和底注图片，切换页面时不再读盘解码
         self.show_page(UI_Multiplayer)
-
+        self.after(PREBUILD_DELAY, lambda: self.prebuild_pages([UI_MainMenu, UI_SingleGame]))
+        if profile:
+            profile.mark("首个页面")
+
+    def _get_page(self, page_class):
+        page = self.pages.get(page_class)
+        if page is None:
+            page = page_class(self)
+            page.place(x=0, y=0, relwidth=1, relheight=1)
+            page.lower()  # 新页面先放在最下层，需要显示时再提上来
+            self.pages[page_class] = page
+        return page
+
+    # 首屏显示后利用空闲时间提前创建其余页面，第一次切换过去时也不用现场创建
+    def prebuild_pages(self, page_classes):
+        for page_class in page_classes:
+            self._get_page(page_class)
+
+    # 显示页面：第一次显示时创建并叠放在窗口中，之后只调用页面的 on_show(*args) 刷新状态并 tkraise
     def show_page(self, page_class, *args):
-        if self.current_page is not None:
-            self.current_page.destroy()
-        self.current_page = page_class(self, *args)
-        self.current_page.pack(fill="both", expand=True)
+        page = self._get_page(page_class)
+        on_show = getattr(page, "on_show", None)
+        if on_show is not None:
+            on_show(*args)
+        page.tkraise()
+        self.current_page = page
 
     @staticmethod
     def load_background_image(parent, image_path):
         if hasattr(parent, 'bg_label'):
             return  # 如果背景图片已经加载过，则不再重新加载
         try:
-            bg_image = Image.open(image_path)
-            bg_photo = ImageTk.PhotoImage(bg_image)
+            bg_photo = ASSETS.get_photo(image_path)
             parent.bg_label = tk.Label(parent, image=bg_photo)
             parent.bg_label.image = bg_photo  # 保持引用，防止被垃圾回收
             parent.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
@@ -510,7 +1090,6 @@ class UI_MainMenu(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.parent.title("DiceGame-天国拯救骰子游戏")
 
         # 加载背景图片
         UI_Core.load_background_image(self, "StartUI.png")
@@ -535,12 +1114,14 @@ class UI_MainMenu(tk.Frame):
         version_build_label = tk.Label(self, text=version_build_text, font=("Arial", 8, "bold"), bg="black", fg="white")
         version_build_label.place(x=0, y=583)
 
+    def on_show(self):
+        self.parent.title("DiceGame-天国拯救骰子游戏")
+
     def load_background_image(self):
         if hasattr(self, 'bg_label'):
             return  # 如果背景图片已经加载过，则不再重新加载
         try:
-            self.bg_image = Image.open("StartUI.png")
-            self.bg_photo = ImageTk.PhotoImage(self.bg_image)
+            self.bg_photo = ASSETS.get_photo("StartUI.png")
             self.bg_label = tk.Label(self, image=self.bg_photo)
             self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
         except Exception as e:
@@ -597,6 +1178,31 @@ class UI_SingleGame(tk.Frame):
             ).place(x=x_position, y=y_position)
             y_position += 50
 
+        pacing_frame = tk.LabelFrame(self, text="AI速度", font=("Huiwen-mincho", 15), bg="#613819", fg="white")
+        pacing_frame.place(x=590, y=385, width=126, height=135)
+
+        self.pacing_var = tk.StringVar(value="realistic")
+        pacing_options = [("真实", "realistic"), ("快速", "fast"), ("瞬间", "instant")]
+        y_position = 0
+        for text, value in pacing_options:
+            tk.Radiobutton(
+            pacing_frame,
+            text=text,
+            variable=self.pacing_var,
+            value=value,
+            font=("Huiwen-mincho", 14),
+            bg="#613819",
+            fg="white",
+            selectcolor="#613819",
+            activebackground="#613819"
+            ).place(x=20, y=y_position)
+            y_position += 35
+
+        # 观战模式：双方都由电脑操作
+        self.spectator_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self, text="观战（AI 对 AI）", variable=self.spectator_var, font=("Huiwen-mincho", 14),
+                       bg="#613819", fg="white", selectcolor="#613819", activebackground="#613819").place(x=315, y=445)
+
         # 中间区域：用于显示图片
         self.image_label = tk.Label(self)
         self.image_label.place(x=300, y=88, width=200, height=344)
@@ -616,8 +1222,7 @@ class UI_SingleGame(tk.Frame):
         bet = self.bet_var.get()
         image_path = os.path.join("UI_Sources", f"bet_{bet}.png")
         try:
-            image = Image.open(image_path)
-            photo = ImageTk.PhotoImage(image)
+            photo = ASSETS.get_photo(image_path)
             self.image_label.config(image=photo)
             self.image_label.image = photo  # 保持引用，防止被垃圾回收
         except Exception as e:
@@ -626,8 +1231,20 @@ class UI_SingleGame(tk.Frame):
     def confirm_game(self):
         bet = self.bet_var.get()
         ai_difficulty = self.ai_difficulty_var.get()
-        # 跳转到游戏页面，具体实现可以在这里添加
-        print(f"确认对局：底注大小={bet}, AI难度={ai_difficulty}")
+        pacing = self.pacing_var.get()
+        spectator = self.spectator_var.get()
+        print(f"确认对局：底注大小={bet}, AI难度={ai_difficulty}, AI速度={pacing}, 观战={spectator}")
+        # 日志文件无法打开时不记录日志，照常开始对局
+        try:
+            journal = JournalWriter()
+        except (OSError, ValueError) as e:
+            journal = None
+            messagebox.showwarning("对局日志", f"无法打开对局日志，本局不会被记录：{e}", parent=self)
+        # 隐藏主窗口，在新窗口中开始与电脑玩家的对局
+        self.parent.withdraw()
+        game_root = tk.Toplevel(self.parent)
+        DiceGame(game_root, bet, is_ai_mode=True, ai_difficulty=ai_difficulty, journal=journal,
+                 pacing=pacing, spectator=spectator)
 
 
 class UI_Multiplayer(tk.Frame):
@@ -639,8 +1256,8 @@ class UI_Multiplayer(tk.Frame):
         UI_Core.load_background_image(self, os.path.join("UI_Sources", "multgame_config_background.png"))
 
         # 加载按钮背景图片
-        self.local_game_image = ImageTk.PhotoImage(Image.open(os.path.join("UI_Sources", "bet_1000.png")))
-        # self.lan_game_image = ImageTk.PhotoImage(Image.open(os.path.join("UI_Sources", "lan_game_button.png")))
+        self.local_game_image = ASSETS.get_photo(os.path.join("UI_Sources", "bet_1000.png"))
+        # self.lan_game_image = ASSETS.get_photo(os.path.join("UI_Sources", "lan_game_button.png"))
 
         # 创建按钮
         button_font = ("Huiwen-mincho", 30)  # 放大字体
@@ -668,6 +1285,11 @@ class UI_About(tk.Frame):
         super().__init__(parent)
 
 
+SEARCH_TIMEOUT = 3000  # 打开大厅后多久仍没有房间就显示“未找到房间”（毫秒）
+RECONNECT_ATTEMPTS = 5  # 联机对局中断线后尝试重新连接的次数
+RECONNECT_DELAY = 2  # 两次重连之间等待的秒数
+
+
 class UI_Config:
     def __init__(self, root):
         self.root = root
@@ -675,6 +1297,27 @@ class UI_Config:
         self.root.geometry("800x600")
         self.root.resizable(False, False)
 
+        # 网络线程不直接操作界面，通过消息泵交给主线程处理
+        self.pump = UIMessagePump(root)
+        self.pump.register("rooms_changed", self.on_rooms_changed, merge=True)
+        self.pump.register("room_created", self.on_room_created)
+        self.pump.register("player_joined", self.on_player_joined)
+        self.pump.register("player_left", self.on_player_left)
+        self.pump.register("room_closed", self.on_room_closed)
+        self.pump.register("join_result", self.on_join_result)
+        self.pump.register("disconnected", self.on_disconnected)
+        self.pump.register("error", self.on_server_error)
+        for kind in ("game", "delta", "snapshot", "intent", "resync"):
+            self.pump.register(kind, self.on_game_message)
+        self.room_server = None  # 房主在后台线程中运行的房间服务器（room_server.ServerThread）
+        self.room_client = None  # 与房间服务器的持久连接（room_client.RoomClient）
+        self.host_port = None  # 要加入的房间服务器端口，None 为默认端口；比赛服务器的分片不在默认端口
+        self.seat_token = None  # 比赛服务器分配的座位凭证，断线重连时用它回到原来的座位
+        self.discovery = None  # 局域网房间发现服务（discovery.DiscoveryService），第一次打开大厅时创建
+        self.found_rooms = {}  # 房主地址 "IP:端口" -> discovery.RoomBeacon
+        self.net_game = None  # 正在进行的联机对局（DiceGame）
+        self.guest_name = None  # 房主：当前在房间里的玩家
+
         # 加载背景图片
         self.load_background_image()
 
@@ -700,8 +1343,7 @@ class UI_Config:
 
     def load_background_image(self):
         try:
-            self.bg_image = Image.open("StartUI.png")
-            self.bg_photo = ImageTk.PhotoImage(self.bg_image)
+            self.bg_photo = ASSETS.get_photo("StartUI.png")
             self.bg_label = tk.Label(self.root, image=self.bg_photo)
             self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
         except Exception as e:
@@ -752,6 +1394,8 @@ class UI_Config:
         messagebox.showinfo("关于", "游戏是在豆包AI和GitHub Copilot合作下完成的，游戏玩法参考了天国拯救系列。")
 
     def show_online_lobby(self):
+        # socket 只有联网大厅用到，在各方法中按需导入，不拖慢游戏启动
+        import socket
         self.mode_window.withdraw()
         self.lobby_window = tk.Toplevel()
         self.lobby_window.title("房间列表")
@@ -807,45 +1451,53 @@ class UI_Config:
         # 搜索房间信息
         self.search_rooms()
 
-    def search_rooms(self):
-        self.search_attempts = 0
-        self.found_rooms = set()
-
-        def listen_for_broadcast():
-            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            udp_socket.bind(("", 12345))
+    # 整个进程共用一个发现服务，创建失败（例如端口被占用）时返回 None
+    def get_discovery(self):
+        if self.discovery is None:
+            from discovery import get_service
+            try:
+                self.discovery = get_service()
+            except OSError as e:
+                print(f"无法启动局域网房间发现: {e}")
+                return None
+            self.discovery.on_change = lambda rooms: self.pump.post("rooms_changed", rooms)
+        return self.discovery
 
-            while True:
-                try:
-                    data, addr = udp_socket.recvfrom(1024)
-                    print(f"接收到广播数据: {data} 来自: {addr}")  # 调试信息
-                    room_info = eval(data.decode('utf-8'))
-                    if addr[0] not in self.found_rooms:
-                        self.found_rooms.add(addr[0])
-                        self.room_treeview.insert("", tk.END, values=(room_info["name"], room_info["host_ip"], room_info["status"], room_info["password"]))
-                        self.searching_label.config(text="")
-                        self.search_attempts = 0  # 重置搜索尝试次数
-                except Exception as e:
-                    print(f"接收广播数据时出错: {e}")  # 调试信息
-
-        def search():
-            if self.search_attempts < 5:
-                self.search_attempts += 1
-                self.searching_label.config(text=f"搜索房间中...（尝试 {self.search_attempts}/5）")
-                threading.Thread(target=listen_for_broadcast, daemon=True).start()
-                if not self.found_rooms:
-                    self.lobby_window.after(10000, search)
+    def search_rooms(self):
+        discovery = self.get_discovery()
+        if discovery is None:
+            self.searching_label.config(text="无法搜索房间（端口被占用？）")
+            return
+        # 先显示缓存中还没过期的房间，再请求房主们尽快广播
+        self.on_rooms_changed([discovery.room_list()])
+        self.searching_label.config(text="搜索房间中...")
+        discovery.search()
+        self.lobby_window.after(SEARCH_TIMEOUT, self.on_search_timeout)
+
+    def on_search_timeout(self):
+        if self.searching_label.winfo_exists() and not self.found_rooms:
+            self.searching_label.config(text="未找到房间")
+
+    # 房间列表变化（主线程），同一帧内的多次变化只按最新的一次刷新
+    def on_rooms_changed(self, batch):
+        self.found_rooms = batch[-1]
+        treeview = getattr(self, "room_treeview", None)
+        if treeview is None or not treeview.winfo_exists():
+            return  # 大厅没有打开
+        for address in treeview.get_children():
+            if address not in self.found_rooms:
+                treeview.delete(address)  # 已过期的房间
+        for address, room in self.found_rooms.items():
+            values = (room.name, room.host_ip, "已满" if room.full else "等待中", "是" if room.password else "否")
+            if treeview.exists(address):
+                treeview.item(address, values=values)
             else:
-                self.searching_label.config(text="未找到房间")
-
-        # 打开大厅后立即搜索一次
-        search()
-        # 三秒后再搜索一次
-        self.lobby_window.after(3000, search)
+                treeview.insert("", tk.END, iid=address, values=values)
+        if self.found_rooms:
+            self.searching_label.config(text="")
 
     def create_room(self):
+        import socket
         self.create_room_window = tk.Toplevel()
         self.create_room_window.title("创建房间")
 
@@ -892,27 +1544,9 @@ class UI_Config:
         self.create_room_window.destroy()
         self.lobby_window.destroy()
         self.show_room_window(ip, room_name, need_password, password, is_host=True)
-        self.broadcast_room_info(ip, room_name, need_password, password)
-
-    def broadcast_room_info(self, ip, room_name, need_password, password):
-        def broadcast():
-            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            room_info = {
-                "name": room_name,
-                "host_ip": ip,
-                "status": "等待中",
-                "password": "是" if need_password else "否",
-                "bet": self.bet
-            }
-            while True:
-                udp_socket.sendto(str(room_info).encode('utf-8'), ('<broadcast>', 12345))
-                print(f"广播房间信息: {room_info}")  # 调试信息
-                time.sleep(3)
-
-        threading.Thread(target=broadcast, daemon=True).start()
 
     def show_room_window(self, ip, room_name, need_password, password, is_host=False):
+        self.is_host = is_host
         self.room_window = tk.Toplevel()
         if is_host:
             self.room_window.title("房主")
@@ -944,77 +1578,152 @@ class UI_Config:
 
         # 开始游戏按钮（仅房主可用）
         if is_host:
-            self.start_game_button = tk.Button(self.room_window, text="开始游戏", command=self.start_game)
+            self.start_game_button = tk.Button(self.room_window, text="开始游戏", command=self.start_lan_game)
             self.start_game_button.pack(pady=10)
 
         if is_host:
-            self.start_broadcasting(ip, room_name, need_password, password)
-            self.wait_for_connection()
-
-    def start_broadcasting(self, ip, room_name, need_password, password):
-        def broadcast():
-            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            room_info = {
-                "name": room_name,
-                "host_ip": ip,
-                "status": "等待中",
-                "password": "是" if need_password else "否",
-                "bet": self.bet
-            }
-            while True:
-                udp_socket.sendto(str(room_info).encode('utf-8'), ('<broadcast>', 12345))
-                print(f"广播房间信息: {room_info}")  # 调试信息
-                time.sleep(3)
-
-        threading.Thread(target=broadcast, daemon=True).start()
-
-    def wait_for_connection(self):
-        def listen_for_connection():
-            tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            tcp_socket.bind(("", 12345))
-            tcp_socket.listen(1)
-
-            while True:
-                conn, addr = tcp_socket.accept()
-                data = conn.recv(1024).decode('utf-8')
-                print(f"接收到连接请求: {data} 来自: {addr}")  # 调试信息
-                request_info = json.loads(data)  # 使用 json.loads
-                if request_info.get("type") == "join_room":
-                    if request_info["password"] == self.password:
-                        response_info = {
-                            "status": "确认连接",
-                            "host_ip": self.host_ip,
-                            "host_name": self.host_name,
-                            "bet": self.bet,
-                            "client_name": request_info["name"]
-                        }
-                        conn.send(json.dumps(response_info).encode('utf-8'))  # 使用 json.dumps
-                        self.player_label.config(text=f"玩家: {request_info['name']} ({request_info['ip']})")
-                    else:
-                        response_info = {
-                            "status": "密码错误"
-                        }
-                        conn.send(json.dumps(response_info).encode('utf-8'))  # 使用 json.dumps
-                elif request_info.get("type") == "close_room":
-                    self.room_window.destroy()
-                    self.show_online_lobby()
-                    messagebox.showinfo("提示", "房主已离开游戏！")
-                    break
-                elif request_info.get("type") == "exit_room":
-                    self.player_label.config(text="虚位以待")
-                conn.close()
-
-        threading.Thread(target=listen_for_connection, daemon=True).start()
+            self.room_name = room_name
+            self.password = password if need_password else ""
+            self.open_room(room_name, self.password)
+            self.advertise_room()
+
+    # 房主：通过发现服务广播房间，房间状态变化时再调用一次即可更新
+    def advertise_room(self, full=False):
+        if not self.is_host:
+            return
+        discovery = self.get_discovery()
+        if discovery is not None:
+            discovery.advertise(self.room_name, self.bet, bool(self.password), full)
+
+    # 服务器消息在连接的读取线程中收到，交给消息泵在主线程处理
+    def on_server_message(self, message):
+        self.pump.post(message["type"], message)
+
+    # 房主：在后台启动房间服务器，自己也作为玩家连接上去并创建房间
+    def open_room(self, room_name, password):
+        from room_server import ServerThread
+        from room_client import RoomClient
+
+        try:
+            if self.room_server is None:
+                self.room_server = ServerThread().start()
+            self.room_client = RoomClient("127.0.0.1", self.on_server_message)
+            self.room_client.send({
+                "type": "create_room",
+                "name": self.local_name,
+                "ip": self.host_ip,
+                "room_name": room_name,
+                "password": password,
+                "bet": self.bet,
+            })
+        except OSError as e:
+            messagebox.showerror("错误", f"无法创建房间: {e}")
+
+    def close_room_connection(self):
+        if self.discovery is not None:
+            self.discovery.stop_advertising()
+        if self.room_client is not None:
+            self.room_client.close()
+            self.room_client = None
+        if self.room_server is not None:
+            self.room_server.stop()
+            self.room_server = None
+
+    def on_room_created(self, message):
+        print(f"房间已创建: {message}")  # 调试信息
+
+    def on_server_error(self, message):
+        print(f"服务器返回错误: {message.get('reason')}")
+        if self.net_game is not None:
+            self.net_game.on_net_message(message)
+
+    def on_player_joined(self, message):
+        self.guest_name = message["name"]
+        if self.room_window.winfo_exists():
+            self.player_label.config(text=f"玩家: {message['name']} ({message['ip']})")
+        self.advertise_room(full=True)
+        if self.net_game is not None and self.is_host:
+            # 对局中有人（重新）加入：通知对方打开对局，对方按已收到的序号请求补发
+            self.net_game.insert_log(f"{message['name']} 已连接\n")
+            self.send_game_start()
+
+    def on_player_left(self, data):
+        self.guest_name = None
+        if self.room_window.winfo_exists():
+            self.player_label.config(text="虚位以待")
+        self.advertise_room()
+        if self.net_game is not None:
+            self.net_game.insert_log("对方已断开连接，等待重连...\n")
+
+    # 房主：开始联机对局
+    def start_lan_game(self):
+        if self.guest_name is None:
+            messagebox.showinfo("提示", "还没有玩家加入房间！")
+            return
+        self.open_net_game(is_host=True)
+        self.send_game_start()
+
+    def send_game_start(self):
+        self.send_room_message({"type": "game", "action": "start", "target_score": self.bet})
+
+    # 在新窗口中打开联机对局；player 为比赛服务器分配的玩家编号，自己开房时房主先手
+    def open_net_game(self, is_host, player=None):
+        from netgame import NetSession
+
+        self.room_window.withdraw()
+        session = NetSession(self.send_room_message, is_host, player)
+        self.net_game = DiceGame(tk.Toplevel(self.root), self.bet, net=session)
+
+    # 对局消息（主线程），交给正在进行的对局
+    def on_game_message(self, message):
+        if message["type"] == "game":
+            if message.get("action") != "start" or self.is_host:
+                return
+            if self.net_game is None:
+                self.bet = message["target_score"]
+                self.open_net_game(is_host=False, player=message.get("player"))
+            self.net_game.net.request_resync()  # 刚加入或重连：按已收到的序号补齐
+            self.net_game.restore_controls()
+        elif self.net_game is not None:
+            self.net_game.on_net_message(message)
+
+    def on_room_closed(self, message):
+        if self.net_game is not None:
+            self.close_room_connection()
+            self.net_game.insert_log("房主已关闭房间，对局无法继续\n")
+            self.net_game.disable_controls()
+            return
+        self.close_room_connection()
+        if self.room_window.winfo_exists():
+            self.room_window.destroy()
+        self.show_online_lobby()
+        messagebox.showinfo("提示", "房主已离开游戏！")
+
+    # 连接意外断开（不是自己退出房间）
+    def on_disconnected(self, message):
+        self.close_room_connection()
+        if self.net_game is not None and not self.is_host:
+            # 对局中断线：重新加入房间，房主会通知我们补齐错过的增量
+            self.net_game.insert_log("与房主的连接已断开，正在重连...\n")
+            self.net_game.disable_controls()
+            self.connect_to_host(self.join_password, RECONNECT_ATTEMPTS)
+            return
+        if self.room_window.winfo_exists():
+            self.room_window.destroy()
+            self.show_online_lobby()
+            messagebox.showinfo("提示", "与房间的连接已断开！")
 
     def join_room(self):
         selected_item = self.room_treeview.selection()
         if selected_item:
-            room_info = self.room_treeview.item(selected_item, "values")
-            self.host_ip = room_info[1]
-            self.host_name = room_info[0]
-            self.bet = room_info[2]
-            self.password_required = room_info[3] == "是"
+            room = self.found_rooms.get(selected_item[0])
+            if room is None:
+                return  # 刚好过期
+            self.host_ip = room.host_ip
+            self.host_port = room.port
+            self.host_name = room.name
+            self.bet = room.bet
+            self.password_required = room.password
 
             if self.password_required:
                 self.ask_password()
@@ -1026,33 +1735,58 @@ class UI_Config:
             self.password_window.destroy()
         self.lobby_window.destroy()
         self.show_room_window(self.host_ip, self.host_name, self.password_required, password, is_host=False)
+        self.join_password = password  # 对局中断线重连时再用
+        self.seat_token = None
+        self.connect_to_host(password)
+
+    # 建立连接可能要等几秒，放在后台线程中；之后的消息都走这条连接
+    def connect_to_host(self, password, attempts=1):
+        from protocol import DEFAULT_PORT
+        from room_client import RoomClient
+
+        message = {"type": "join_room", "ip": self.local_ip, "name": self.local_name, "password": password}
+        if self.seat_token is not None:
+            message["token"] = self.seat_token
 
         def connect():
-            tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            tcp_socket.connect((self.host_ip, 12345))
-            request_info = {
-                "type": "join_room",  # 确保包含 type 键
-                "ip": self.local_ip,
-                "name": self.local_name,
-                "password": password
-            }
-            tcp_socket.send(json.dumps(request_info).encode('utf-8'))  # 使用 json.dumps
-
-            data = tcp_socket.recv(1024).decode('utf-8')
-            response_info = json.loads(data)  # 使用 json.loads
-            if response_info["status"] == "确认连接":
-                self.player_label.config(text=f"玩家: {response_info['host_name']} ({response_info['host_ip']})")
-                self.bet_label.config(text=f"底注: {response_info['bet']}")
-            elif response_info["status"] == "密码错误":
-                messagebox.showerror("错误", "密码错误")
-                self.room_window.destroy()
-                self.show_online_lobby()
-            else:
-                messagebox.showerror("错误", "连接失败")
-                self.room_window.destroy()
-                self.show_online_lobby()
+            for attempt in range(attempts):
+                if attempt:
+                    time.sleep(RECONNECT_DELAY)
+                try:
+                    client = RoomClient(self.host_ip, self.on_server_message, port=self.host_port or DEFAULT_PORT)
+                    self.pump.call(setattr, self, "room_client", client)  # 先于服务器的回复交给主线程
+                    client.send(message)
+                    return
+                except OSError as e:
+                    print(f"连接房间时出错: {e}")
+            self.pump.post("join_result", {"status": "连接失败"})
 
         threading.Thread(target=connect, daemon=True).start()
+
+    # 加入房间的结果（主线程）
+    def on_join_result(self, response_info):
+        if response_info["status"] == "确认连接" and "token" in response_info:
+            self.seat_token = response_info["token"]
+        if self.net_game is not None:
+            # 对局中重连的结果；成功时等房主的通知补齐局面
+            if response_info["status"] != "确认连接":
+                self.close_room_connection()
+                self.net_game.insert_log(f"重连失败（{response_info['status']}），对局无法继续\n")
+            return
+        if response_info["status"] == "确认连接":
+            self.player_label.config(text=f"玩家: {response_info['host_name']} ({response_info['host_ip']})")
+            self.bet_label.config(text=f"底注: {response_info['bet']}")
+        elif response_info["status"] == "密码错误":
+            self.close_room_connection()
+            messagebox.showerror("错误", "密码错误")
+            self.room_window.destroy()
+            self.show_online_lobby()
+        else:
+            self.close_room_connection()
+            messagebox.showerror("错误", "连接失败")
+            self.room_window.destroy()
+            self.show_online_lobby()
+
     def ask_password(self):
         self.password_window = tk.Toplevel()
         self.password_window.title("输入密码")
@@ -1064,38 +1798,6 @@ class UI_Config:
         confirm_button = tk.Button(self.password_window, text="确认", command=lambda: self.send_connection_request(self.password_entry.get()))
         confirm_button.pack(pady=10)
 
-    def send_connection_request(self, password):
-        if hasattr(self, 'password_window'):
-            self.password_window.destroy()
-        self.lobby_window.destroy()
-        self.show_room_window(self.host_ip, self.host_name, self.password_required, password, is_host=False)
-
-        def connect():
-            tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            tcp_socket.connect((self.host_ip, 12345))
-            request_info = {
-                "ip": self.local_ip,
-                "name": self.local_name,
-                "password": password
-            }
-            tcp_socket.send(str(request_info).encode('utf-8'))
-
-            data = tcp_socket.recv(1024).decode('utf-8')
-            response_info = eval(data)
-            if response_info["status"] == "确认连接":
-                self.player_label.config(text=f"玩家: {response_info['host_name']} ({response_info['host_ip']})")
-                self.bet_label.config(text=f"底注: {response_info['bet']}")
-            elif response_info["status"] == "密码错误":
-                messagebox.showerror("错误", "密码错误")
-                self.room_window.destroy()
-                self.show_online_lobby()
-            else:
-                messagebox.showerror("错误", "连接失败")
-                self.room_window.destroy()
-                self.show_online_lobby()
-
-        threading.Thread(target=connect, daemon=True).start()
-
     def confirm_exit_room(self):
         if messagebox.askyesno("确认", "你确定要退出房间吗？"):
             if self.is_host:
@@ -1105,31 +1807,78 @@ class UI_Config:
             self.room_window.destroy()
             self.show_online_lobby()
 
+    # 房主关闭房间：服务器会通知房间里的另一方
     def send_close_room_signal(self):
-        tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        tcp_socket.connect((self.host_ip, 12345))
-        close_info = {
-            "type": "close_room"
-        }
-        tcp_socket.send(json.dumps(close_info).encode('utf-8'))  # 使用 json.dumps
-        tcp_socket.close()
+        self.send_room_message({"type": "close_room"})
+        self.close_room_connection()
 
     def send_exit_room_signal(self):
-        tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        tcp_socket.connect((self.host_ip, 12345))
-        exit_info = {
-            "type": "exit_room",
-            "ip": self.local_ip,
-            "name": self.local_name
-        }
-        tcp_socket.send(json.dumps(exit_info).encode('utf-8'))  # 使用 json.dumps
-        tcp_socket.close()
+        self.send_room_message({"type": "exit_room"})
+        self.close_room_connection()
+
+    def send_room_message(self, message):
+        if self.room_client is None:
+            return
+        try:
+            self.room_client.send(message)
+        except OSError as e:
+            print(f"发送消息时出错: {e}")
 
 # if __name__ == "__main__":
 #     root = tk.Tk()
 #     start_ui = UI_Config(root)
 #     root.mainloop()
 
+# 打印启动各阶段耗时后退出：导入模块、Tk 初始化、首个页面（含背景图加载）、首次绘制，
+# 以及后台预加载全部启动图片所用的时间
+def profile_startup():
+    profile = StartupProfile(_IMPORT_START)
+    profile.mark("导入模块")
+    app = UI_Core(profile)
+    app.update()
+    profile.mark("首次绘制")
+    app.warm_thread.join()
+    warm_ms = (time.perf_counter() - app.warm_start) * 1000
+    profile.report([("图片预加载", warm_ms)])
+    app.destroy()
+
+
+# 在回放界面中打开对局日志中的一局，game_index 为局号（从 0 开始，负数从末尾数）
+def open_replay(path, game_index=-1):
+    from journal import read_games
+    from replay import Replay
+
+    games = list(read_games(path))
+    if not games:
+        print(f"{path} 中没有对局记录")
+        return
+    if not -len(games) <= game_index < len(games):
+        print(f"{path} 中只有 {len(games)} 局对局记录（局号 0~{len(games) - 1}），没有第 {game_index} 局")
+        return
+    game, events = games[game_index]
+    root = tk.Tk()
+    ReplayViewer(root, Replay.from_journal(game, events), is_ai_mode=bool(game.flags & FLAG_AI_OPPONENT),
+                 spectator=bool(game.flags & FLAG_AI_SELF))
+    root.mainloop()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="天国拯救骰子游戏")
+    parser.add_argument("--profile-startup", action="store_true", help="打印启动各阶段耗时后退出")
+    parser.add_argument("--replay", metavar="JOURNAL", help="回放对局日志中的一局")
+    parser.add_argument("--game", type=int, default=-1, help="回放第几局（从 0 开始，默认最后一局）")
+    args = parser.parse_args(argv)
+
+    if args.profile_startup:
+        profile_startup()
+    elif args.replay:
+        open_replay(args.replay, args.game)
+    else:
+        app = UI_Core()
+        app.mainloop()
+
+
 if __name__ == "__main__":
-    app = UI_Core()
-    app.mainloop()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+from odds import ROLL_ODDS
+from scoring import keep_indices, MAX_DICE
+from solver import get_solver
+
+# 电脑玩家的决策策略
+# 每个策略都是 choose(state, rng) -> (留下的骰子下标, 是否继续投掷)，state 为 engine.GameState，
+# 轮到电脑玩家且已投掷出可计分的骰子时调用。界面和无界面模拟器共用这些策略。
+
+
+# 简单难度：按场上情况和精确概率表设定激进/保守权重后随机选择策略
+def weighted_choice(state, rng):
+    dice = state.dice
+    keeps = state.selection.keeps  # 所有去重后的合法留骰组合，按得分从高到低排列
+    max_score = keeps[0].score
+    max_score_comb = keep_indices(dice, keeps[0].faces)  # 获取最大得分的骰子组合
+
+    # 计算选取完后的剩余骰子数量
+    remaining_dice_after_selection = len(dice) - len(max_score_comb)
+    if remaining_dice_after_selection == 0:
+        remaining_dice_after_selection = 6  # 如果选取完后剩余0个骰子，根据规则重新投掷6个骰子
+
+    # 根据场上情况决定策略
+    remaining_score_to_win = state.remaining_to_win()
+    current_round_score = state.round_score
+
+    if remaining_score_to_win <= max_score:
+        # 可以一轮获胜，保守结束回合
+        aggressive_weight = 20
+    else:
+        # 按精确概率表权衡继续投掷的期望收益和爆点时失去的本轮得分
+        odds = ROLL_ODDS[remaining_dice_after_selection]
+        expected_gain = odds.expected
+        expected_loss = odds.bust * (current_round_score + max_score)
+        aggressive_weight = 100 * expected_gain / (expected_gain + expected_loss)
+
+    aggressive = rng.random() * 100 < aggressive_weight
+
+    if aggressive:
+        kept_dice = max_score_comb
+    else:
+        if current_round_score == 0 and remaining_dice_after_selection == 6 and max_score < 200:
+            # 第一回合得分低时，只选一个骰子
+            single_keep = rng.choice([keep for keep in keeps if keep.size == 1])
+            kept_dice = keep_indices(dice, single_keep.faces)
+        else:
+            kept_dice = max_score_comb
+
+    # 激进策略或者骰子全部计分时继续投掷，否则结束本轮
+    return kept_dice, aggressive or remaining_dice_after_selection == 6
+
+
+# 贪心策略：总是留下得分最高的组合，本轮得分达到 GREEDY_BANK_SCORE 或剩余骰子少于 3 个时结束本轮
+GREEDY_BANK_SCORE = 300
+
+
+def greedy_choice(state, rng):
+    keep = state.selection.keeps[0]
+    new_round_score = state.round_score + keep.score
+    remaining_dice_after_selection = len(state.dice) - keep.size
+    if new_round_score >= state.remaining_to_win():
+        go_on = False  # 结束本轮即可获胜
+    elif remaining_dice_after_selection == 0:
+        go_on = True  # 骰子全部计分，重新投掷 6 个
+    else:
+        go_on = new_round_score < GREEDY_BANK_SCORE and remaining_dice_after_selection >= 3
+    return keep_indices(state.dice, keep.faces), go_on
+
+
+# 中等难度：留下得分最高的组合，是否继续投掷查单回合求解表
+def table_bank_choice(state, rng):
+    keep = state.selection.keeps[0]
+    remaining_dice_after_selection = len(state.dice) - keep.size or MAX_DICE
+    solver = get_solver(state.target_score)
+    go_on = solver.should_continue(state.round_score + keep.score, remaining_dice_after_selection, state.remaining_to_win())
+    return keep_indices(state.dice, keep.faces), go_on
+
+
+# 困难难度：留骰和继续/结束都按单回合求解表选择期望存分最高的决策
+def solver_choice(state, rng):
+    solver = get_solver(state.target_score)
+    keep, go_on = solver.best_action(state.dice, state.round_score, state.remaining_to_win())
+    return keep_indices(state.dice, keep.faces), go_on
+
+
+# 各难度对应的策略
+DIFFICULTY_STRATEGIES = {
+    "easy": weighted_choice,
+    "medium": table_bank_choice,
+    "hard": solver_choice,
+}
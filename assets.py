@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 图片资源缓存
+# 每张图片只从磁盘读取并解码一次；解码后的图片和转换好的 PhotoImage 都按 (路径, 尺寸) 缓存在
+# 一个按最近使用顺序淘汰的 LRU 中，总占用超过上限时淘汰最久未用的条目。
+# 解码和缩放可以在后台线程提前完成（warm），PhotoImage 必须在 Tk 主线程中创建，在第一次 get_photo 时转换。
+#
+# 调用方仍需像以前一样持有返回的 PhotoImage（例如 label.image = photo），被淘汰的条目才不会从界面上消失。
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 启动时预先解码的图片
+STARTUP_IMAGES = [
+    "StartUI.png",
+    os.path.join("UI_Sources", "game_config_background.png"),
+    os.path.join("UI_Sources", "multgame_config_background.png"),
+] + [os.path.join("UI_Sources", f"bet_{bet}.png") for bet in (1000, 2000, 4000, 8000)]
+
+
+def _image_bytes(image):
+    width, height = image.size
+    return width * height * 4
+
+
+class AssetManager:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (类型, 路径, 尺寸) -> (对象, 估算字节数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._failed = {}  # 路径 -> 加载失败的异常，避免反复读取不存在的文件
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key, value, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            # 超出上限时淘汰最久未用的条目（至少保留刚放入的这一项）
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    # 读取并解码图片，size 不为 None 时缩放到指定尺寸；可以在任意线程调用
+    def load_image(self, path, size=None):
+        key = ("image", path, size)
+        image = self._get(key)
+        if image is not None:
+            return image
+        if path in self._failed:
+            raise self._failed[path]
+        from PIL import Image
+
+        if size is None:
+            try:
+                image = Image.open(path)
+                image.load()
+            except OSError as e:
+                self._failed[path] = e
+                raise
+        else:
+            image = self.load_image(path).resize(size)
+        self._put(key, image, _image_bytes(image))
+        return image
+
+    # 获取可直接显示的 PhotoImage，必须在 Tk 主线程调用
+    def get_photo(self, path, size=None):
+        key = ("photo", path, size)
+        photo = self._get(key)
+        if photo is not None:
+            return photo
+        from PIL import ImageTk
+
+        image = self.load_image(path, size)
+        photo = ImageTk.PhotoImage(image)
+        self._put(key, photo, _image_bytes(image))
+        return photo
+
+    # 在后台线程中预先解码图片，items 为路径或 (路径, 尺寸) 的列表
+    def warm(self, items=STARTUP_IMAGES):
+        def run():
+            for item in items:
+                path, size = item if isinstance(item, tuple) else (item, None)
+                try:
+                    self.load_image(path, size)
+                except Exception as e:
+                    print(f"预加载图片 {path} 时出错: {e}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._failed.clear()
+
+
+ASSETS = AssetManager()
@@ -0,0 +1,169 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from itertools import product
+
+import ai
+from engine import GameState, play_game
+from scoring import calculate_score, all_dice_scoring, has_scoring_opportunity
+from solver import get_solver
+
+# 性能基准测试（不需要显示器）
+#   python benchmark.py                         运行并打印结果
+#   python benchmark.py --save baseline.json    保存为基线
+#   python benchmark.py --compare baseline.json --tolerance 10
+#                                               与基线比较，任一指标下降超过 10% 时以非零状态退出
+# 所有指标都是“每秒次数”，越大越好；每项重复多次取最好成绩以减小波动。
+
+MIN_DECISIONS = 20000
+ALL_SIX_DICE_ROLLS = [list(roll) for roll in product(range(1, 7), repeat=6)]
+
+
+def _best_rate(func, count, repeat):
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed)
+    return best
+
+
+def bench_scoring(repeat):
+    rolls = ALL_SIX_DICE_ROLLS
+    kept = [roll[:3] for roll in rolls]
+
+    def score_all():
+        for roll in rolls:
+            calculate_score(roll)
+
+    def opportunity_all():
+        for roll in rolls:
+            has_scoring_opportunity(roll)
+
+    def all_scoring_all():
+        for roll, kept_dice in zip(rolls, kept):
+            all_dice_scoring(kept_dice, roll)
+
+    return {
+        "calculate_score": _best_rate(score_all, len(rolls), repeat),
+        "has_scoring_opportunity": _best_rate(opportunity_all, len(rolls), repeat),
+        "all_dice_scoring": _best_rate(all_scoring_all, len(rolls), repeat),
+    }
+
+
+# 按骰子个数测试 AI 的单次决策速度（只用有得分机会的投掷）
+def bench_ai(repeat, target_score=2000):
+    get_solver(target_score)
+    rng = random.Random(0)
+    results = {}
+    for n in range(1, 7):
+        states = []
+        for roll in product(range(1, 7), repeat=n):
+            if has_scoring_opportunity(roll):
+                state = GameState(target_score)
+                state.remaining_dice = n
+                state.roll(list(roll))
+                states.append(state)
+        states *= max(1, MIN_DECISIONS // len(states))  # 骰子少时组合太少，重复多次以减小计时误差
+        for name, strategy in (("heuristic", ai.weighted_choice), ("solver", ai.solver_choice)):
+            def decide_all():
+                for state in states:
+                    strategy(state, rng)
+            results[f"ai_{name}_{n}_dice"] = _best_rate(decide_all, len(states), repeat)
+    return results
+
+
+def bench_games(repeat, games=2000, target_score=1000):
+    players = (ai.weighted_choice, ai.weighted_choice)
+
+    def play_all():
+        rng = random.Random(0)
+        for _ in range(games):
+            play_game(target_score, players, rng)
+
+    return {"games_heuristic_1000": _best_rate(play_all, games, repeat)}
+
+
+def run_benchmarks(repeat=3):
+    metrics = {}
+    metrics.update(bench_scoring(repeat))
+    metrics.update(bench_ai(repeat))
+    metrics.update(bench_games(repeat))
+    return metrics
+
+
+# 与基线比较，返回下降超过 tolerance（百分比）的指标列表 [(名称, 基线, 当前, 变化百分比)]；
+# 基线中有而本次没有测到的指标（改名或测试出错）也算下降，当前值和变化为 None
+def compare(baseline, metrics, tolerance):
+    regressions = []
+    for name, base in baseline.items():
+        current = metrics.get(name)
+        if current is None:
+            regressions.append((name, base, None, None))
+            continue
+        if base <= 0:
+            # 基线数值无效（例如手工编辑过），无法计算变化比例
+            regressions.append((name, base, current, None))
+            continue
+        change = (current - base) / base * 100
+        if change < -tolerance:
+            regressions.append((name, base, current, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="骰子游戏性能基准测试")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最好成绩）")
+    parser.add_argument("--save", metavar="PATH", help="把结果保存为 JSON 基线")
+    parser.add_argument("--compare", metavar="PATH", help="与 JSON 基线比较")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="允许的下降百分比（默认 10）")
+    args = parser.parse_args(argv)
+
+    metrics = run_benchmarks(args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+
+    for name, value in metrics.items():
+        line = f"{name:<32} {value:>14,.0f} 次/秒"
+        if baseline and name in baseline:
+            if baseline[name] > 0:
+                line += f"  ({(value - baseline[name]) / baseline[name] * 100:+.1f}%)"
+            else:
+                line += "  (基线数值无效)"
+        print(line)
+
+    if args.save:
+        data = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "metrics": metrics,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.save}")
+
+    if baseline is not None:
+        regressions = compare(baseline, metrics, args.tolerance)
+        if regressions:
+            print(f"\n以下指标下降超过 {args.tolerance}%、没有测到或基线无效：")
+            for name, base, current, change in regressions:
+                if current is None:
+                    print(f"  {name}: {base:,.0f} -> 本次没有这项结果")
+                elif change is None:
+                    print(f"  {name}: 基线数值 {base:,.0f} 无效 -> {current:,.0f}")
+                else:
+                    print(f"  {name}: {base:,.0f} -> {current:,.0f} ({change:+.1f}%)")
+            return 1
+        print(f"\n所有指标都在允许范围内（{args.tolerance}%）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
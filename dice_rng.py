@@ -0,0 +1,64 @@
+import os
+import random
+
+# 可复现的骰子随机数流
+# 每局游戏由一个种子确定全部骰子点数：按块生成随机字节，再把字节映射为 1~6 的点数放进缓冲区，
+# 投掷时直接从缓冲区取值。模拟器、回放和联机对局只要使用同一个种子，就能得到完全相同的骰子。
+#
+# 字节到点数的映射：0~251 按 b % 6 + 1 映射（每个点数恰好 42 个字节值），252~255 丢弃，保证均匀。
+# 只使用标准库的 random.Random，不同机器、是否安装 NumPy 都不影响同一种子得到的点数。
+
+BLOCK_SIZE = 4096
+
+_BYTE_TO_DIE = bytes(b % 6 + 1 if b < 252 else 0 for b in range(256))
+_REJECTED_BYTES = bytes(range(252, 256))
+
+
+# 生成一个新的对局种子
+def new_seed():
+    return int.from_bytes(os.urandom(8), "big")
+
+
+class DiceStream:
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        self.seed = new_seed() if seed is None else seed
+        self.block_size = block_size
+        self._rng = random.Random(self.seed)
+        self._buffer = b""
+        self._pos = 0
+        self.drawn = 0  # 已经取出的骰子个数，回放时可用来核对位置
+
+    def _refill(self, needed):
+        data = self._buffer[self._pos:]
+        while len(data) < needed:
+            block = self._rng.randbytes(self.block_size)
+            data += block.translate(_BYTE_TO_DIE, _REJECTED_BYTES)
+        self._buffer = data
+        self._pos = 0
+
+    # 投掷 n 个骰子，返回点数列表
+    def roll(self, n):
+        pos = self._pos
+        if pos + n > len(self._buffer):
+            self._refill(n)
+            pos = 0
+        self._pos = pos + n
+        self.drawn += n
+        return list(self._buffer[pos:pos + n])
+
+    # 取一个骰子点数
+    def next_die(self):
+        return self.roll(1)[0]
+
+    # 跳过 n 个骰子（快进到对局中的某个位置）
+    def skip(self, n):
+        while n > 0:
+            step = min(n, self.block_size)
+            self.roll(step)
+            n -= step
+
+
+# 只用于骰子动画的随机数流，与对局的骰子流相互独立，动画不会消耗对局的随机数
+class CosmeticDice(DiceStream):
+    def __init__(self):
+        super().__init__(seed=None, block_size=256)
@@ -0,0 +1,219 @@
+import argparse
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from protocol import DEFAULT_PORT
+
+# 局域网房间发现
+# 每个进程只有一个发现服务（get_service），只用一个 UDP 套接字和一个后台线程：既收发房间广播，也维护房间缓存。
+#   房间广播  !4sBBIBHHB + 房间名   魔数、版本、类型、进程标识、标志位（有密码/已满）、底注、房间服务器端口、房间名字节数
+#   搜索请求  !4sBBI                魔数、版本、类型、进程标识
+# 报文是定长的二进制头加 UTF-8 房间名，格式不对的报文直接丢弃。
+#
+# 房主的广播间隔自适应：房间刚创建、状态变化或有人搜索时每 BEACON_MIN_INTERVAL 秒广播一次，
+# 之后每次加倍，最长 BEACON_MAX_INTERVAL 秒。大厅打开或刷新时发一次搜索请求，房主会尽快回应，
+# 所以机器多的局域网上广播也不会太密。
+# 房间缓存按房主地址（IP:端口，同一台机器上可以有多个比赛服务器进程）记录，超过 ROOM_TTL 秒没有收到广播的房间自动移除。
+#
+#   python discovery.py --seconds 5     搜索几秒并列出局域网中的房间
+
+DISCOVERY_PORT = 12345
+MAGIC = b"KCDR"
+VERSION = 1
+BEACON = struct.Struct("!4sBBIBHHB")
+QUERY = struct.Struct("!4sBBI")
+KIND_BEACON = 1
+KIND_QUERY = 2
+FLAG_PASSWORD = 1
+FLAG_FULL = 2
+NAME_MAX_BYTES = 60  # 房间名最多的字节数，超出的部分截掉
+
+BEACON_MIN_INTERVAL = 1.0
+BEACON_MAX_INTERVAL = 8.0
+ROOM_TTL = 20.0  # 应明显大于 BEACON_MAX_INTERVAL，偶尔丢一两个广播不至于让房间消失
+
+# host_ip: 房主 IP（取报文来源地址），name: 房间名，bet: 底注，password: 是否需要密码，
+# full: 是否已满，port: 房间服务器端口
+RoomBeacon = namedtuple("RoomBeacon", "host_ip name bet password full port")
+
+
+def pack_beacon(instance, name, bet, password=False, full=False, port=DEFAULT_PORT):
+    name = name.encode("utf-8")[:NAME_MAX_BYTES].decode("utf-8", "ignore").encode("utf-8")
+    flags = (FLAG_PASSWORD if password else 0) | (FLAG_FULL if full else 0)
+    return BEACON.pack(MAGIC, VERSION, KIND_BEACON, instance, flags, bet, port, len(name)) + name
+
+
+def pack_query(instance):
+    return QUERY.pack(MAGIC, VERSION, KIND_QUERY, instance)
+
+
+# 解析收到的报文，返回 (类型, 进程标识, RoomBeacon 或 None)；不是本游戏的报文返回 None
+def parse_packet(data, host_ip):
+    if len(data) < QUERY.size:
+        return None
+    magic, version, kind, instance = QUERY.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if kind == KIND_QUERY:
+        return kind, instance, None
+    if kind != KIND_BEACON or len(data) < BEACON.size:
+        return None
+    _, _, _, _, flags, bet, port, name_len = BEACON.unpack_from(data)
+    if len(data) != BEACON.size + name_len:
+        return None
+    name = data[BEACON.size:].decode("utf-8", "replace")
+    return kind, instance, RoomBeacon(host_ip, name, bet, bool(flags & FLAG_PASSWORD), bool(flags & FLAG_FULL), port)
+
+
+class DiscoveryService:
+    def __init__(self, port=DISCOVERY_PORT, ttl=ROOM_TTL):
+        self.port = port
+        self.ttl = ttl
+        self.on_change = None  # 房间列表变化时以 {房主地址: RoomBeacon} 调用，在后台线程中
+        self.instance = int.from_bytes(os.urandom(4), "big")  # 用于忽略自己发出的报文
+        self.rooms = {}  # 房主地址 "IP:端口" -> (RoomBeacon, 过期时间)
+        self.beacon = None  # 正在广播的房间报文
+        self.interval = BEACON_MIN_INTERVAL
+        self.next_beacon = 0.0
+        self.closed = False
+        self._lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            self.sock.bind(("", port))
+        except OSError:
+            self.sock.close()
+            raise
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # 开始（或更新）广播本机的房间，立即发出一次
+    def advertise(self, name, bet, password=False, full=False, port=DEFAULT_PORT):
+        with self._lock:
+            self.beacon = pack_beacon(self.instance, name, bet, password, full, port)
+            self.interval = BEACON_MIN_INTERVAL
+            self.next_beacon = 0.0
+        self._send_beacon()
+
+    def stop_advertising(self):
+        with self._lock:
+            self.beacon = None
+
+    # 请求局域网中的房主尽快广播一次
+    def search(self):
+        self._send(pack_query(self.instance))
+
+    # 当前未过期的房间 {房主地址: RoomBeacon}
+    def room_list(self):
+        with self._lock:
+            return {address: room for address, (room, _) in self.rooms.items()}
+
+    def _send(self, data):
+        try:
+            self.sock.sendto(data, ("<broadcast>", self.port))
+        except OSError as e:
+            print(f"发送局域网广播时出错: {e}")
+
+    # 到时间（或被要求立即）发送房间广播，之后逐渐拉长间隔
+    def _send_beacon(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.beacon is None or now < self.next_beacon:
+                return
+            data = self.beacon
+            self.next_beacon = now + self.interval * random.uniform(0.9, 1.1)  # 错开各房主的广播时间
+            self.interval = min(self.interval * 2, BEACON_MAX_INTERVAL)
+        self._send(data)
+
+    def _run(self):
+        while not self.closed:
+            with self._lock:
+                wait = self.next_beacon - time.monotonic() if self.beacon is not None else 1.0
+            try:
+                self.sock.settimeout(min(max(wait, 0.05), 1.0))  # 关闭后套接字不可用，同样在下面退出
+                data, addr = self.sock.recvfrom(BEACON.size + 255)
+            except socket.timeout:
+                data = None
+            except OSError:
+                if self.closed:
+                    break
+                continue
+            changed = self._expire()
+            if data is not None:
+                changed = self._receive(data, addr[0]) or changed
+            self._send_beacon()
+            if changed and self.on_change is not None:
+                self.on_change(self.room_list())
+
+    # 处理一条报文，房间列表有变化时返回 True
+    def _receive(self, data, host_ip):
+        packet = parse_packet(data, host_ip)
+        if packet is None:
+            return False
+        kind, instance, room = packet
+        if instance == self.instance:
+            return False  # 自己发出的
+        with self._lock:
+            if kind == KIND_QUERY:
+                # 有人在搜索：下一次广播提前到最短间隔之后（已经很快时不再提前）
+                self.interval = BEACON_MIN_INTERVAL
+                self.next_beacon = min(self.next_beacon, time.monotonic() + random.uniform(0, 0.2))
+                return False
+            address = f"{host_ip}:{room.port}"
+            old = self.rooms.get(address)
+            self.rooms[address] = (room, time.monotonic() + self.ttl)
+            return old is None or old[0] != room
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = [address for address, (_, expires) in self.rooms.items() if expires <= now]
+            for address in stale:
+                del self.rooms[address]
+        return bool(stale)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.thread.join(timeout=2)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+# 本进程的发现服务，第一次调用时创建；端口被占用等情况下抛出 OSError
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DiscoveryService()
+        return _service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="搜索局域网中的骰子游戏房间")
+    parser.add_argument("--seconds", type=float, default=3.0, help="搜索时长（秒）")
+    parser.add_argument("--port", type=int, default=DISCOVERY_PORT, help="广播端口")
+    args = parser.parse_args(argv)
+
+    service = DiscoveryService(args.port)
+    service.search()
+    time.sleep(args.seconds)
+    rooms = service.room_list()
+    service.close()
+    for room in rooms.values():
+        status = "已满" if room.full else "等待中"
+        password = "有密码" if room.password else "无密码"
+        print(f"{room.host_ip}:{room.port}  {room.name}  底注 {room.bet}  {status}  {password}")
+    print(f"共找到 {len(rooms)} 个房间")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from collections import namedtuple
+
+from dice_rng import DiceStream
+from scoring import calculate_score, all_dice_scoring, RollSelection, MAX_DICE
+
+# 无界面的游戏规则引擎
+# GameState 只保存对局状态并提供状态转移方法，每个转移方法返回本次产生的事件列表，
+# 界面（DiceGame）、模拟器和网络对局都只负责把事件渲染或转发出去。
+
+# 事件类型
+ROLL = "roll"  # 投掷出骰子
+BUST = "bust"  # 投掷无得分机会，本轮得分清零
+CONTINUE = "continue"  # 留下骰子并继续投掷
+BANK = "bank"  # 留下骰子并结束本轮，本轮得分计入总分
+TURN = "turn"  # 轮到另一位玩家
+WIN = "win"  # 有玩家达到目标分数
+
+# player: 产生事件的玩家，dice: 投掷结果或留下的点数，kept_mask: 留下的骰子下标位掩码，
+# score: 本次得分，round_score: 事件发生后的本轮得分
+Event = namedtuple("Event", "kind player round_num dice kept_mask score round_score")
+
+
+class GameState:
+    __slots__ = ("target_score", "scores", "current_player", "round_score", "remaining_dice",
+                 "dice", "kept_mask", "round_num", "has_rolled", "winner", "selection")
+
+    def __init__(self, target_score):
+        self.target_score = target_score
+        self.scores = [0, 0]  # 玩家 1、玩家 2 的总得分
+        self.current_player = 1
+        self.round_score = 0
+        self.remaining_dice = MAX_DICE
+        self.dice = []
+        self.kept_mask = 0
+        self.round_num = 1
+        self.has_rolled = False  # 当前骰子是否已投掷、等待留骰
+        self.winner = 0  # 获胜玩家，0 表示对局未结束
+        self.selection = None  # 本次投掷的选择缓存（scoring.RollSelection），投掷后才有
+
+    def copy(self):
+        state = GameState.__new__(GameState)
+        for name in GameState.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.scores = list(self.scores)
+        state.dice = list(self.dice)
+        return state
+
+    # 当前玩家距离目标还差的分数
+    def remaining_to_win(self):
+        return self.target_score - self.scores[self.current_player - 1]
+
+    def kept_indices(self):
+        return [i for i in range(len(self.dice)) if self.kept_mask >> i & 1]
+
+    def kept_values(self):
+        return [die for i, die in enumerate(self.dice) if self.kept_mask >> i & 1]
+
+    def kept_count(self):
+        return bin(self.kept_mask).count("1")
+
+    # 当前选中的骰子是否可以计分（至少选中一个，且全部有效计分）
+    def selection_valid(self):
+        return self.has_rolled and self.selection.is_valid(self.kept_mask)
+
+    # 当前选中骰子的得分，选中了无效骰子时为 0
+    def selected_score(self):
+        if not self.has_rolled:
+            return 0
+        return self.selection.score(self.kept_mask)
+
+    # 投掷剩余的骰子，values 为本次投出的点数
+    # selection 可选，为提前（例如在后台线程中）为同样点数建好的 RollSelection
+    def roll(self, values, selection=None):
+        if self.winner:
+            raise ValueError("对局已结束")
+        if self.has_rolled:
+            raise ValueError("请先留下骰子再投掷")
+        if len(values) != self.remaining_dice:
+            raise ValueError(f"应投掷 {self.remaining_dice} 个骰子，实际为 {len(values)} 个")
+        self.dice = list(values)
+        self.kept_mask = 0
+        if selection is None or selection.dice != tuple(self.dice):
+            selection = RollSelection(self.dice)
+        self.selection = selection
+        events = [Event(ROLL, self.current_player, self.round_num, tuple(self.dice), 0, 0, self.round_score)]
+        if not self.selection.keeps:
+            # 投掷无得分机会，本轮得分清零并换人
+            self.round_score = 0
+            events.append(Event(BUST, self.current_player, self.round_num, tuple(self.dice), 0, 0, 0))
+            self._finish_turn(events)
+        else:
+            self.has_rolled = True
+        return events
+
+    # 选中/取消选中某个骰子，返回新的位掩码
+    def toggle_keep(self, index):
+        if self.has_rolled and 0 <= index < len(self.dice):
+            self.kept_mask ^= 1 << index
+        return self.kept_mask
+
+    def set_kept_mask(self, kept_mask):
+        if self.has_rolled:
+            self.kept_mask = kept_mask & ((1 << len(self.dice)) - 1)
+        return self.kept_mask
+
+    def set_kept_indices(self, indices):
+        kept_mask = 0
+        for i in indices:
+            kept_mask |= 1 << i
+        return self.set_kept_mask(kept_mask)
+
+    # 计入选中骰子的得分，返回 (留下的点数, 得分)
+    # 提交时直接按点数计分，不需要为整次投掷建立选择表（无界面模拟时用不到）
+    def _take_kept(self):
+        kept_values = self.kept_values()
+        if not self.has_rolled or not kept_values or not all_dice_scoring(kept_values, self.dice):
+            raise ValueError("选中的骰子无法计分")
+        score = calculate_score(kept_values)
+        self.round_score += score
+        return kept_values, score
+
+    # 留下选中的骰子并继续投掷剩余骰子（全部留下时重新投掷 6 个）
+    def continue_turn(self):
+        kept_values, score = self._take_kept()
+        events = [Event(CONTINUE, self.current_player, self.round_num, tuple(kept_values), self.kept_mask, score, self.round_score)]
+        self.dice = [die for i, die in enumerate(self.dice) if not self.kept_mask >> i & 1]
+        self.remaining_dice = len(self.dice) or MAX_DICE
+        self.kept_mask = 0
+        self.selection = None
+        self.has_rolled = False
+        return events
+
+    # 留下选中的骰子并结束本轮，本轮得分计入总分
+    def end_turn(self):
+        kept_values, score = self._take_kept()
+        events = [Event(BANK, self.current_player, self.round_num, tuple(kept_values), self.kept_mask, score, self.round_score)]
+        self.scores[self.current_player - 1] += self.round_score
+        self._finish_turn(events)
+        return events
+
+    def _finish_turn(self, events):
+        player = self.current_player
+        if self.scores[player - 1] >= self.target_score:
+            self.winner = player
+        if player == 1:
+            self.current_player = 2
+        else:
+            self.current_player = 1
+            self.round_num += 1
+        self.round_score = 0
+        self.remaining_dice = MAX_DICE
+        self.dice = []
+        self.kept_mask = 0
+        self.selection = None
+        self.has_rolled = False
+        events.append(Event(TURN, self.current_player, self.round_num, (), 0, 0, 0))
+        if self.winner:
+            events.append(Event(WIN, self.winner, self.round_num, (), 0, self.scores[self.winner - 1], 0))
+
+
+# 无界面地进行一整局游戏
+# players 为两位玩家的决策函数 choose(state, rng) -> (留下的骰子下标, 是否继续投掷)，
+# rng 为 AI 决策使用的 random.Random；dice 为骰子流（dice_rng.DiceStream），未指定时用 rng 生成种子。
+# on_events 可选，每次状态转移后以事件列表调用。返回结束时的 GameState。
+def play_game(target_score, players, rng, max_rounds=1000, on_events=None, dice=None):
+    if dice is None:
+        dice = DiceStream(rng.getrandbits(64))
+    roll = dice.roll
+    state = GameState(target_score)
+    while not state.winner and state.round_num <= max_rounds:
+        events = state.roll(roll(state.remaining_dice))
+        if on_events is not None:
+            on_events(events)
+        if not state.has_rolled:
+            continue  # 爆点，已经换人
+        indices, go_on = players[state.current_player - 1](state, rng)
+        state.set_kept_indices(indices)
+        if go_on:
+            events = state.continue_turn()
+        else:
+            events = state.end_turn()
+        if on_events is not None:
+            on_events(events)
+    return state
@@ -0,0 +1,200 @@
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from engine import Event, ROLL, BUST, CONTINUE, BANK, TURN, WIN
+
+# 对局日志（只追加）
+# 每局以一条“开局”记录（种子、目标分数、开始时间）开头，之后依次是引擎产生的每个事件。
+# 文件开头是 6 字节的文件头（魔数、版本、记录长度），之后每条记录都是 20 字节的定长二进制：
+#   事件记录  <BBHB6sBII  类型、玩家、回合数、骰子个数、骰子点数（每个 1 字节）、留骰掩码、得分、本轮得分
+#   开局记录  <BBQII2x    类型（0）、标志位、种子、目标分数、开始时间（Unix 秒）
+# 写入时先在调用方线程把事件打包成字节，再交给后台线程按批追加到文件，界面线程不做磁盘 IO。
+# 读取时忽略文件末尾不完整的记录（例如写到一半时程序被关闭）。
+#
+#   python journal.py games.kcdj -o games.jsonl    逐条导出为 JSON Lines（不指定 -o 时输出到标准输出）
+
+MAGIC = b"KCDJ"
+VERSION = 1
+HEADER = struct.Struct("<4sBB")
+EVENT_RECORD = struct.Struct("<BBHB6sBII")
+GAME_RECORD = struct.Struct("<BBQII2x")
+RECORD_SIZE = EVENT_RECORD.size
+
+DEFAULT_JOURNAL_PATH = os.path.join("journal", "games.kcdj")
+
+# 记录类型编号，0 为开局记录
+GAME_START = 0
+KIND_CODES = {ROLL: 1, BUST: 2, CONTINUE: 3, BANK: 4, TURN: 5, WIN: 6}
+CODE_KINDS = {code: kind for kind, code in KIND_CODES.items()}
+
+FLAG_AI_OPPONENT = 1  # 玩家 2 为电脑玩家
+FLAG_AI_SELF = 2  # 玩家 1 也为电脑玩家（观战模式）
+
+# seed: 对局种子，target_score: 目标分数，flags: 标志位，started: 开始时间（Unix 秒）
+GameStart = namedtuple("GameStart", "seed target_score flags started")
+
+
+def pack_event(event):
+    return EVENT_RECORD.pack(KIND_CODES[event.kind], event.player, event.round_num, len(event.dice),
+                             bytes(event.dice), event.kept_mask, event.score, event.round_score)
+
+
+def pack_game_start(seed, target_score, flags=0, started=None):
+    if not 0 <= seed < 1 << 64:
+        raise ValueError(f"日志只能记录 64 位无符号整数种子，实际为 {seed!r}")
+    if started is None:
+        started = int(time.time())
+    return GAME_RECORD.pack(GAME_START, flags, seed, target_score, started)
+
+
+def _check_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} 不是对局日志文件：文件头不完整")
+    magic, version, record_size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} 不是本版本的对局日志文件")
+
+
+class JournalWriter:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, flush_interval=0.5):
+        self.path = path
+        self.flush_interval = flush_interval  # 两次写盘之间至少间隔的秒数，期间的记录合并成一批
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                _check_header(f.read(HEADER.size), path)
+            self._file = open(path, "ab")
+            # 上次写到一半的记录截掉，保证新记录仍然按定长对齐
+            size = os.path.getsize(path)
+            extra = (size - HEADER.size) % RECORD_SIZE
+            if extra:
+                self._file.truncate(size - extra)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        self._queue = queue.Queue()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def begin_game(self, seed, target_score, flags=0):
+        self._queue.put(pack_game_start(seed, target_score, flags))
+
+    # 追加一批引擎事件，可以直接作为 play_game 的 on_events 回调
+    def write(self, events):
+        self._queue.put(b"".join([pack_event(event) for event in events]))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            chunks = []
+            done = False
+            while True:
+                if item is None:
+                    done = True
+                else:
+                    chunks.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if chunks:
+                self._file.write(b"".join(chunks))
+                self._file.flush()
+            if done:
+                break
+            self._closing.wait(self.flush_interval)
+        self._file.close()
+
+    # 写完已提交的全部记录后关闭文件
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._closing.set()
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# 依次读出日志中的记录：开局记录为 GameStart，其余为 engine.Event
+def read_records(path, block_records=4096):
+    unpack_event = EVENT_RECORD.unpack_from
+    unpack_game = GAME_RECORD.unpack_from
+    with open(path, "rb") as f:
+        _check_header(f.read(HEADER.size), path)
+        while True:
+            block = f.read(RECORD_SIZE * block_records)
+            usable = len(block) - len(block) % RECORD_SIZE
+            for offset in range(0, usable, RECORD_SIZE):
+                if block[offset] == GAME_START:
+                    _, flags, seed, target_score, started = unpack_game(block, offset)
+                    yield GameStart(seed, target_score, flags, started)
+                else:
+                    code, player, round_num, n, dice, kept_mask, score, round_score = unpack_event(block, offset)
+                    yield Event(CODE_KINDS[code], player, round_num, tuple(dice[:n]), kept_mask, score, round_score)
+            if len(block) < RECORD_SIZE * block_records:
+                break
+
+
+# 按局读出日志，每局为 (GameStart, [事件])
+def read_games(path):
+    game = None
+    events = []
+    for record in read_records(path):
+        if isinstance(record, GameStart):
+            if game is not None:
+                yield game, events
+            game, events = record, []
+        elif game is not None:
+            events.append(record)
+    if game is not None:
+        yield game, events
+
+
+# 逐条把日志导出为 JSON Lines，out 为文本文件对象，返回导出的记录数
+def export_jsonl(path, out):
+    import json  # 只有导出时用到，图形界面写日志时不导入
+
+    count = 0
+    game_index = -1
+    for record in read_records(path):
+        if isinstance(record, GameStart):
+            game_index += 1
+            data = {"game": game_index, "kind": "start"}
+        else:
+            data = {"game": game_index}
+        data.update(record._asdict())
+        out.write(json.dumps(data, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    import argparse  # 只有命令行用到，图形界面启动时不导入
+
+    parser = argparse.ArgumentParser(description="把对局日志导出为 JSON Lines")
+    parser.add_argument("journal", help="对局日志文件")
+    parser.add_argument("-o", "--output", help="输出文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            count = export_jsonl(args.journal, out)
+        print(f"已导出 {count} 条记录到 {args.output}")
+    else:
+        export_jsonl(args.journal, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
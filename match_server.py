@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import secrets
+import signal
+import sys
+
+from dice_rng import DiceStream
+from engine import GameState, ROLL, CONTINUE
+from netgame import HostSync, unpack_intent
+from protocol import DEFAULT_PORT
+from room_server import RoomServer
+from solver import BET_LEVELS
+
+# 专用比赛服务器（无界面，不导入 tkinter）
+# 一个进程用一个 asyncio 事件循环同时承载几百张牌桌。每张桌的对局由服务器运行规则引擎裁判，
+# 两位玩家都只发送操作意图，服务器核对后把增量同步给双方（格式见 netgame.py）；
+# 图形界面中的玩家和加入别人开的房间时一样操作。
+# 入座时服务器发给玩家一个座位凭证（join_result 中的 token），座位只认凭证、不认名字。
+# 加入时不指定桌号会自动入座：带着凭证时回到断线前的座位，否则先找已有一人等待的桌，最后是空桌。
+# 对局中断线的玩家保留座位，带着凭证重新加入后按已收到的序号补齐局面（服务器还没发现旧连接断开时顶替旧连接）；
+# 双方都离开后 ABANDON_TIMEOUT 秒内没有人回来，对局作废。
+#
+#   python match_server.py --tables 200                          单进程 200 张桌
+#   python match_server.py --tables 400 --workers 4 --advertise  分到 4 个进程（端口依次加 1），并在局域网中广播
+
+DEFAULT_TARGET_SCORE = 4000
+STATUS_INTERVAL = 60  # 打印运行状态的间隔（秒）
+ABANDON_TIMEOUT = 120  # 双方都断线后保留对局的时间（秒）
+BEACON_UPDATE_DELAY = 1.0  # 入座情况变化后最多隔多久更新一次局域网广播（秒），避免频繁广播
+
+
+# 一局对局的裁判：服务器一方的规则引擎和增量记录
+class Match:
+    def __init__(self, target_score, seed=None):
+        self.dice = DiceStream(seed)
+        self.seed = self.dice.seed
+        self.state = GameState(target_score)
+        self.sync = HostSync(self.state)
+
+    # 执行玩家的操作，返回要发给双方的 delta 消息；不合规则时抛出 ValueError
+    def apply(self, player, seq, kind, kept_mask):
+        state = self.state
+        if state.winner:
+            raise ValueError("对局已经结束")
+        if state.current_player != player:
+            raise ValueError("还没有轮到你")
+        if seq != self.sync.seq:
+            raise ValueError("局面已经变化，请重新操作")
+        if kind == ROLL:
+            if state.has_rolled:
+                raise ValueError("请先留下骰子")
+            events = state.roll(self.dice.roll(state.remaining_dice))
+        else:
+            if not state.has_rolled:
+                raise ValueError("请先投掷骰子")
+            state.set_kept_mask(kept_mask)
+            if not state.selection_valid():
+                state.set_kept_mask(0)
+                raise ValueError("选中的骰子无法计分")
+            if kind == CONTINUE:
+                # 与图形界面一致：继续投掷时立即投出剩下的骰子
+                events = state.continue_turn()
+                events += state.roll(self.dice.roll(state.remaining_dice))
+            else:
+                events = state.end_turn()
+        return self.sync.publish(events)
+
+
+class Table:
+    def __init__(self, table_id, name, target_score, password="", temporary=False):
+        self.id = table_id
+        self.name = name
+        self.target_score = target_score
+        self.password = password
+        self.temporary = temporary  # 玩家创建的桌，没人时删除
+        self.seats = [None, None]  # 座位上的连接，断线时为 None
+        self.names = [None, None]  # 座位上的玩家名字，对局中断线时保留
+        self.tokens = [None, None]  # 座位凭证，空座位为 None，对局中断线时保留
+        self.match = None
+        self.abandon = None  # 双方都断线时作废对局的定时器
+
+    # 持有 token 的玩家可以坐的座位下标，没有时返回 None；对局中只能凭凭证回到自己的座位
+    def free_seat(self, token=None):
+        if self.match is not None:
+            return self.tokens.index(token) if token is not None and token in self.tokens else None
+        return self.tokens.index(None) if None in self.tokens else None
+
+    def has_room(self):
+        return self.match is None and not self.password and None in self.tokens
+
+    def clear_seats(self):
+        self.seats = [None, None]
+        self.names = [None, None]
+        self.tokens = [None, None]
+
+    def info(self):
+        if self.match is not None:
+            status = "对局中"
+        else:
+            status = "已满" if None not in self.tokens else "等待中"
+        return {
+            "room": self.id,
+            "name": self.name,
+            "host_ip": "",
+            "status": status,
+            "password": "是" if self.password else "否",
+            "bet": self.target_score,
+            "players": [name for name in self.names if name],
+        }
+
+
+class MatchServer(RoomServer):
+    def __init__(self, target_score=DEFAULT_TARGET_SCORE, room_ids=None):
+        super().__init__()
+        self.target_score = target_score
+        if room_ids is not None:
+            self._room_ids = room_ids  # 分多个进程时各进程的桌号不重复
+        self.finished = 0  # 已经结束的对局数
+        self.discovery = None
+        self.beacon = None  # (广播名, 端口, 上次广播的 (房间名, 是否已满))
+        self.beacon_update = None  # 等待中的广播更新
+        self.handlers.update({
+            "create_room": self.create_room,
+            "join_room": self.join_room,
+            "intent": self.intent,
+            "resync": self.resync,
+        })
+        for kind in ("game", "delta", "snapshot"):
+            del self.handlers[kind]  # 对局消息只由服务器发出
+
+    def add_table(self, table_id=None, name=None, target_score=None, password="", temporary=False):
+        if table_id is None:
+            table_id = next(self._room_ids)
+        table = Table(table_id, name or f"第 {table_id} 桌", target_score or self.target_score, password, temporary)
+        self.rooms[table.id] = table
+        return table
+
+    def create_room(self, peer, message):
+        bet = message.get("bet")
+        if "bet" in message and not (isinstance(bet, int) and bet in BET_LEVELS):
+            # 只接受游戏里的几档底注，其他数值在打包快照、广播时会出错
+            peer.send({"type": "room_created", "status": "底注无效"})
+            return
+        self.leave_room(peer)
+        table = self.add_table(name=message.get("room_name"), target_score=bet,
+                               password=message.get("password", ""), temporary=True)
+        token = secrets.token_hex(8)
+        peer.send(dict(table.info(), type="room_created", token=token))
+        self.seat_player(peer, table, 0, message.get("name", ""), token)
+
+    def join_room(self, peer, message):
+        self.leave_room(peer)
+        name = message.get("name", "")
+        token = message.get("token")
+        if "room" in message:
+            table = self.rooms.get(message["room"])
+            if table is None:
+                peer.send({"type": "join_result", "status": "房间不存在"})
+                return
+            if table.password and message.get("password") != table.password:
+                peer.send({"type": "join_result", "status": "密码错误"})
+                return
+            seat = table.free_seat(token)
+        else:
+            table, seat = self.find_seat(token)
+        if seat is None:
+            peer.send({"type": "join_result", "status": "房间已满"})
+            return
+        if table.tokens[seat] is None:
+            token = secrets.token_hex(8)  # 新入座；否则是凭凭证回到原来的座位
+        peer.send({
+            "type": "join_result",
+            "status": "确认连接",
+            "room": table.id,
+            "host_ip": "",
+            "host_name": table.name,
+            "bet": table.target_score,
+            "client_name": name,
+            "token": token,
+        })
+        self.seat_player(peer, table, seat, name, token)
+
+    # 自动入座，返回 (桌, 座位)，没有空位时座位为 None
+    def find_seat(self, token=None):
+        waiting = empty = None
+        for table in self.rooms.values():
+            if table.match is not None:
+                if token is not None and token in table.tokens:
+                    return table, table.free_seat(token)  # 回到断线前的座位
+            elif table.has_room():
+                if table.tokens != [None, None]:
+                    waiting = waiting or table
+                else:
+                    empty = empty or table
+        table = waiting or empty
+        return table, table.free_seat() if table is not None else None
+
+    def seat_player(self, peer, table, seat, name, token):
+        old = table.seats[seat]
+        if old is not None:
+            old.room = None  # 顶替还没断开的旧连接
+            old.close()
+        if table.abandon is not None:
+            table.abandon.cancel()
+            table.abandon = None
+        peer.name = name
+        peer.room = table
+        peer.seat = seat
+        table.seats[seat] = peer
+        table.names[seat] = name
+        table.tokens[seat] = token
+        other = table.seats[1 - seat]
+        if other is not None:
+            other.send({"type": "player_joined", "name": name, "ip": peer.ip})
+        if table.match is None:
+            if None not in table.tokens:
+                table.match = Match(table.target_score)
+                for index in range(2):
+                    self.send_start(table, index)
+        else:
+            self.send_start(table, seat)  # 重连：对方随后按已收到的序号请求补发
+        self.update_beacon()
+
+    def send_start(self, table, seat):
+        peer = table.seats[seat]
+        if peer is not None:
+            peer.send({"type": "game", "action": "start", "target_score": table.target_score,
+                       "player": seat + 1, "opponent": table.names[1 - seat]})
+
+    def leave_room(self, peer, message=None):
+        table = peer.room
+        if table is None:
+            return
+        peer.room = None
+        table.seats[peer.seat] = None
+        if table.match is None:
+            table.names[peer.seat] = None
+            table.tokens[peer.seat] = None
+        elif table.seats == [None, None]:
+            table.abandon = asyncio.get_running_loop().call_later(ABANDON_TIMEOUT, self.abandon_match, table)
+        other = table.seats[1 - peer.seat]
+        if other is not None:
+            other.send({"type": "player_left", "name": peer.name})
+        if table.temporary and table.tokens == [None, None]:
+            del self.rooms[table.id]
+        self.update_beacon()
+
+    def abandon_match(self, table):
+        print(f"{table.name}：双方都已离开，对局作废")
+        table.abandon = None
+        table.match = None
+        table.clear_seats()
+        if table.temporary:
+            del self.rooms[table.id]
+        self.update_beacon()
+
+    def intent(self, peer, message):
+        table = peer.room
+        if table is None or table.match is None:
+            peer.send({"type": "error", "reason": "对局还没有开始"})
+            return
+        try:
+            seq, kind, kept_mask = unpack_intent(message.get("data", b""))
+        except ValueError as e:
+            peer.send({"type": "error", "reason": str(e)})
+            return
+        match = table.match
+        try:
+            update = match.apply(peer.seat + 1, seq, kind, kept_mask)
+        except ValueError as e:
+            peer.send({"type": "error", "reason": str(e)})
+            for reply in match.sync.sync(seq):
+                peer.send(reply)  # 对方可能缺了增量
+            return
+        if update is not None:
+            for other in table.seats:
+                if other is not None:
+                    other.send(update)
+        if match.state.winner:
+            self.finish_match(table)
+
+    def resync(self, peer, message):
+        table = peer.room
+        if table is not None and table.match is not None:
+            for reply in table.match.sync.sync(message.get("seq", -1)):
+                peer.send(reply)
+
+    # 对局结束：记录结果并清空座位，桌子留给下一局
+    def finish_match(self, table):
+        match = table.match
+        winner = match.state.winner
+        print(f"{table.name}：{table.names[winner - 1]} 获胜 {match.state.scores[0]}:{match.state.scores[1]}"
+              f"（种子 {match.seed}）")
+        self.finished += 1
+        for peer in table.seats:
+            if peer is not None:
+                peer.room = None
+        table.match = None
+        table.clear_seats()
+        if table.temporary:
+            del self.rooms[table.id]
+        self.update_beacon()
+
+    # 在局域网中广播本服务器（大厅中显示为一个房间，加入后自动入座）；发现服务的端口被占用时不广播，照常提供服务
+    def advertise(self, name, port):
+        from discovery import get_service
+
+        try:
+            self.discovery = get_service()
+        except OSError as e:
+            print(f"警告：无法启动局域网房间发现（{e}），不在大厅中广播")
+            return
+        self.beacon = (name, port, None)
+        self.send_beacon()
+
+    # 入座情况变化：稍后按最新的空桌数更新广播，短时间内的多次变化只广播一次
+    def update_beacon(self):
+        if self.beacon is None or self.beacon_update is not None:
+            return
+        self.beacon_update = asyncio.get_running_loop().call_later(BEACON_UPDATE_DELAY, self.send_beacon)
+
+    # 广播内容变化时重新广播，其余时候由发现服务按间隔重复
+    def send_beacon(self):
+        self.beacon_update = None
+        name, port, last = self.beacon
+        free = sum(1 for table in self.rooms.values() if table.has_room())
+        current = (f"{name}（{free}/{len(self.rooms)} 桌有空位）", free == 0)
+        if current != last:
+            self.beacon = (name, port, current)
+            self.discovery.advertise(current[0], self.target_score, False, current[1], port)
+
+    def status(self):
+        playing = sum(1 for table in self.rooms.values() if table.match is not None)
+        return f"{len(self.rooms)} 张桌，{playing} 桌对局中，{len(self.peers)} 个连接，已完成 {self.finished} 局"
+
+
+async def report_status(server, port):
+    while True:
+        await asyncio.sleep(STATUS_INTERVAL)
+        print(f"[端口 {port}] {server.status()}")
+
+
+async def serve(host, port, table_ids, target_score, advertise=None, room_ids=None):
+    server = MatchServer(target_score, room_ids)
+    for table_id in table_ids:
+        server.add_table(table_id)
+    listener = await server.start(host, port)
+    if advertise:
+        server.advertise(advertise, port)
+    print(f"比赛服务器已启动，端口 {port}，{len(server.rooms)} 张桌")
+    status_task = asyncio.create_task(report_status(server, port))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        status_task.cancel()
+        await server.close()  # 按 Ctrl+C 退出时也先断开各连接，不留下被取消的任务
+
+
+# 运行一个分片（也是单进程时的入口）；worker 为分片编号，workers 为分片数，
+# 玩家创建的桌从 first_id 开始编号，各分片交错分配，桌号不会重复
+def run_shard(host, port, table_ids, target_score, advertise, worker, workers, first_id):
+    room_ids = itertools.count(first_id + worker, workers)
+    try:
+        asyncio.run(serve(host, port, table_ids, target_score, advertise, room_ids))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="骰子游戏专用比赛服务器（无界面）")
+    parser.add_argument("--host", default="", help="监听地址（默认所有地址）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口，多进程时依次加 1")
+    parser.add_argument("--tables", type=int, default=100, help="预先开设的牌桌数")
+    parser.add_argument("--target-score", type=int, default=DEFAULT_TARGET_SCORE, help="每局的目标分数")
+    parser.add_argument("--workers", type=int, default=1, help="把牌桌分到几个进程")
+    parser.add_argument("--advertise", nargs="?", const="比赛服务器", metavar="NAME", help="在局域网大厅中广播，可以指定显示的名字")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    table_ids = list(range(1, args.tables + 1))
+    if workers == 1:
+        run_shard(args.host, args.port, table_ids, args.target_score, args.advertise, 0, 1, args.tables + 1)
+        return
+    processes = []
+    for worker in range(workers):
+        name = f"{args.advertise} {worker + 1}/{workers}" if args.advertise else None
+        process = multiprocessing.Process(
+            target=run_shard, daemon=True,
+            args=(args.host, args.port + worker, table_ids[worker::workers], args.target_score, name, worker, workers,
+                  args.tables + 1))
+        process.start()
+        processes.append(process)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # 被结束时也结束各分片
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import struct
+from collections import namedtuple
+
+from engine import GameState, ROLL, CONTINUE, BANK, TURN
+from protocol import MAX_RAW_SIZE
+from scoring import RollSelection
+
+# 联机对局的状态同步
+# 房主（或专用服务器）运行规则引擎，是对局状态的唯一权威；另一方只发送操作意图，并按收到的增量重放出同样的状态。
+#
+# 增量由引擎事件得出，每个增量有递增的序号，按发生顺序编码为字节：
+#   投掷  0x10 | 骰子个数，之后每个骰子 1 字节
+#   留骰  0x20（结束本轮）或 0x21（继续投掷），之后 1 字节留骰掩码
+#   换人  0x30 | 接下来的玩家，用于核对双方状态一致
+# 爆点、获胜由对方的引擎自己得出，不传输。
+#   delta     二进制段 !I 首个增量的序号 + 若干增量
+#   snapshot  二进制段 SNAPSHOT：序号和某一轮开始时的完整状态
+#   intent    二进制段 !I 发送方已收到的序号 + 1 个操作（投掷只有操作字节 0x10）
+#   resync    {"seq": 已收到的序号}，请求补发
+# 房主在每一轮开始时保存一次快照并清空增量记录，断线重连或中途加入的一方按自己已收到的序号补发缺少的增量，
+# 序号早于快照时先发快照再发这一轮的增量，不需要重发整局。一轮通常只有几十个字节。
+
+SEQ = struct.Struct("!I")
+SNAPSHOT = struct.Struct("!IIIIBIBHB6sBBB")
+
+OP_ROLL = 0x10
+OP_KEEP = 0x20
+OP_TURN = 0x30
+
+HOST_PLAYER = 1  # 房主先手
+GUEST_PLAYER = 2
+
+# kind: ROLL / CONTINUE / BANK / TURN，value: 投掷的点数、留骰掩码或接下来的玩家
+Delta = namedtuple("Delta", "kind value")
+
+
+def deltas_from_events(events):
+    deltas = []
+    for event in events:
+        if event.kind == ROLL:
+            deltas.append(Delta(ROLL, event.dice))
+        elif event.kind in (CONTINUE, BANK):
+            deltas.append(Delta(event.kind, event.kept_mask))
+        elif event.kind == TURN:
+            deltas.append(Delta(TURN, event.player))
+    return deltas
+
+
+def pack_delta(delta):
+    if delta.kind == ROLL:
+        return bytes([OP_ROLL | len(delta.value), *delta.value])
+    if delta.kind == TURN:
+        return bytes([OP_TURN | delta.value])
+    return bytes([OP_KEEP | (delta.kind == CONTINUE), delta.value])
+
+
+def unpack_deltas(data):
+    deltas = []
+    pos = 0
+    while pos < len(data):
+        op = data[pos]
+        code, low = op & 0xF0, op & 0x0F
+        if code == OP_ROLL:
+            if pos + 1 + low > len(data):
+                raise ValueError("增量数据不完整")
+            deltas.append(Delta(ROLL, tuple(data[pos + 1:pos + 1 + low])))
+            pos += 1 + low
+        elif code == OP_KEEP and low <= 1 and pos + 1 < len(data):
+            deltas.append(Delta(CONTINUE if low else BANK, data[pos + 1]))
+            pos += 2
+        elif code == OP_TURN:
+            deltas.append(Delta(TURN, low))
+            pos += 1
+        else:
+            raise ValueError(f"无法识别的增量: {op:#04x}")
+    return deltas
+
+
+# 把一个增量应用到状态上，返回引擎产生的事件；与房主状态不一致时抛出 ValueError
+def apply_delta(state, delta):
+    if delta.kind == ROLL:
+        return state.roll(delta.value)
+    if delta.kind == TURN:
+        if state.current_player != delta.value:
+            raise ValueError(f"轮次不一致：本地为玩家 {state.current_player}，房主为玩家 {delta.value}")
+        return []
+    state.set_kept_mask(delta.value)
+    return state.continue_turn() if delta.kind == CONTINUE else state.end_turn()
+
+
+def pack_snapshot(seq, state):
+    return SNAPSHOT.pack(seq, state.target_score, state.scores[0], state.scores[1], state.current_player,
+                         state.round_score, state.remaining_dice, state.round_num, len(state.dice),
+                         bytes(state.dice), state.kept_mask, state.has_rolled, state.winner)
+
+
+# 返回 (序号, GameState)
+def unpack_snapshot(data):
+    (seq, target_score, score1, score2, current_player, round_score, remaining_dice, round_num, n, dice,
+     kept_mask, has_rolled, winner) = SNAPSHOT.unpack(data)
+    state = GameState(target_score)
+    state.scores = [score1, score2]
+    state.current_player = current_player
+    state.round_score = round_score
+    state.remaining_dice = remaining_dice
+    state.round_num = round_num
+    state.dice = list(dice[:n])
+    state.kept_mask = kept_mask
+    state.has_rolled = bool(has_rolled)
+    state.winner = winner
+    if state.has_rolled:
+        state.selection = RollSelection(state.dice)
+    return seq, state
+
+
+def pack_intent(seq, kind, kept_mask=0):
+    if kind == ROLL:
+        return SEQ.pack(seq) + bytes([OP_ROLL])
+    return SEQ.pack(seq) + pack_delta(Delta(kind, kept_mask))
+
+
+# 返回 (发送方已收到的序号, 操作, 留骰掩码)
+def unpack_intent(data):
+    if len(data) < SEQ.size + 1:
+        raise ValueError("操作意图不完整")
+    (seq,) = SEQ.unpack_from(data)
+    if data[SEQ.size] == OP_ROLL:
+        return seq, ROLL, 0
+    deltas = unpack_deltas(data[SEQ.size:])
+    if len(deltas) != 1 or deltas[0].kind not in (CONTINUE, BANK):
+        raise ValueError("无法识别的操作意图")
+    return seq, deltas[0].kind, deltas[0].value
+
+
+def roll_intent(seq):
+    return {"type": "intent", "data": pack_intent(seq, ROLL)}
+
+
+def keep_intent(seq, kept_mask, go_on):
+    return {"type": "intent", "data": pack_intent(seq, CONTINUE if go_on else BANK, kept_mask)}
+
+
+def resync_request(seq):
+    return {"type": "resync", "seq": seq}
+
+
+# 权威一方：把引擎事件编成带序号的增量，并保存本轮的增量供补发
+class HostSync:
+    def __init__(self, state):
+        self.state = state
+        self.seq = 0
+        self.checkpoint = (0, pack_snapshot(0, state))
+        self.log = []  # 快照之后的 (序号, 增量字节)
+
+    # 记录一批事件，返回要发给对方的 delta 消息（没有需要同步的内容时返回 None）
+    def publish(self, events):
+        deltas = deltas_from_events(events)
+        if not deltas:
+            return None
+        first = self.seq + 1
+        packed = []
+        for delta in deltas:
+            self.seq += 1
+            data = pack_delta(delta)
+            packed.append(data)
+            self.log.append((self.seq, data))
+        if deltas[-1].kind == TURN:
+            # 新的一轮开始：保存快照，之前的增量不再需要
+            self.checkpoint = (self.seq, pack_snapshot(self.seq, self.state))
+            self.log = []
+        return {"type": "delta", "data": SEQ.pack(first) + b"".join(packed)}
+
+    # 对方已收到 last_seq 为止的增量，返回补齐到最新所需的消息
+    def sync(self, last_seq):
+        checkpoint_seq, snapshot = self.checkpoint
+        messages = []
+        if not checkpoint_seq <= last_seq <= self.seq:
+            messages.append({"type": "snapshot", "data": snapshot})
+            last_seq = checkpoint_seq
+        chunk = b""
+        first = last_seq + 1
+        for seq, data in self.log:
+            if seq <= last_seq:
+                continue
+            if len(chunk) + len(data) > MAX_RAW_SIZE - SEQ.size:
+                messages.append({"type": "delta", "data": SEQ.pack(first) + chunk})
+                chunk, first = b"", seq
+            chunk += data
+        if chunk:
+            messages.append({"type": "delta", "data": SEQ.pack(first) + chunk})
+        return messages
+
+
+# 非权威一方：核对序号，取出还没有应用过的增量
+class ClientSync:
+    def __init__(self):
+        self.seq = 0  # 已应用的最后一个增量的序号，-1 表示状态不可信、正在等待快照
+
+    # 返回 (快照状态或 None, [新的增量])；中间缺了增量时返回 None，应发送 resync_request(self.seq)
+    def accept(self, message):
+        if message["type"] == "snapshot":
+            self.seq, state = unpack_snapshot(message["data"])
+            return state, []
+        if self.seq < 0:
+            return None, []  # 已经请求了快照，在此之前的增量都不再应用
+        data = message["data"]
+        (first,) = SEQ.unpack_from(data)
+        if first > self.seq + 1:
+            return None
+        deltas = unpack_deltas(data[SEQ.size:])[self.seq + 1 - first:]  # 跳过已经应用过的
+        self.seq += len(deltas)
+        return None, deltas
+
+
+# 图形界面中联机对局一方的会话，send(message) 把消息发给对方（经房间服务器转发）
+# DiceGame 建好对局状态后调用 attach；房主一方产生增量、处理对方的意图，另一方只发送意图并应用增量。
+# player 为本机玩家的编号，在比赛服务器上由服务器分配，默认房主为玩家 1。
+class NetSession:
+    def __init__(self, send, is_host, player=None):
+        self.send = send
+        self.is_host = is_host
+        self.local_player = player or (HOST_PLAYER if is_host else GUEST_PLAYER)
+        self.remote_player = GUEST_PLAYER if self.local_player == HOST_PLAYER else HOST_PLAYER
+        self.sync = None
+
+    def attach(self, state):
+        self.sync = HostSync(state) if self.is_host else ClientSync()
+
+    @property
+    def seq(self):
+        return self.sync.seq
+
+    # 房主：把本次状态转移同步给对方
+    def publish(self, events):
+        message = self.sync.publish(events)
+        if message is not None:
+            self.send(message)
+
+    # 房主：对方已收到 last_seq 为止的增量，补发其余部分
+    def resend(self, last_seq):
+        for message in self.sync.sync(last_seq):
+            self.send(message)
+
+    # 房主：拒绝对方的操作，并把对方可能缺少的增量补发过去
+    def reject(self, reason, last_seq=None):
+        self.send({"type": "error", "reason": reason})
+        if last_seq is not None:
+            self.resend(last_seq)
+
+    def send_roll(self):
+        self.send(roll_intent(self.sync.seq))
+
+    def send_keep(self, kept_mask, go_on):
+        self.send(keep_intent(self.sync.seq, kept_mask, go_on))
+
+    def request_resync(self):
+        self.send(resync_request(self.sync.seq))
+
+    # 本地状态与房主不一致：丢弃之后的增量，请求完整快照
+    def request_snapshot(self):
+        self.sync.seq = -1
+        self.request_resync()
+
+    # 见 ClientSync.accept，数据格式错误时抛出 ValueError
+    def accept(self, message):
+        try:
+            return self.sync.accept(message)
+        except struct.error as e:
+            raise ValueError(f"同步数据格式错误: {e}") from None
@@ -0,0 +1,38 @@
+from collections import namedtuple
+from itertools import combinations_with_replacement
+from math import factorial
+
+from scoring import legal_keeps, MAX_DICE
+
+# 精确概率表
+# 投掷 k 个骰子（k = 1~6）的全部结果只有 923 种点数组合，导入时按多项分布精确计算：
+# 爆点概率、单次投掷可得分数（最高的合法留骰得分）的期望和完整分布。
+
+# bust: 爆点概率，expected: 期望得分（爆点按 0 分计），distribution: {得分: 概率}（含 0 分）
+RollOdds = namedtuple("RollOdds", "bust expected distribution")
+
+
+def _build_odds(n):
+    distribution = {}
+    total = 6 ** n
+    for dice in combinations_with_replacement(range(1, 7), n):
+        counts = [0] * 7
+        for die in dice:
+            counts[die] += 1
+        ways = factorial(n)
+        for c in counts:
+            ways //= factorial(c)
+        keeps = legal_keeps(dice)
+        score = keeps[0].score if keeps else 0
+        distribution[score] = distribution.get(score, 0) + ways
+    distribution = {score: ways / total for score, ways in sorted(distribution.items())}
+    expected = sum(score * prob for score, prob in distribution.items())
+    return RollOdds(distribution.get(0, 0.0), expected, distribution)
+
+
+ROLL_ODDS = {n: _build_odds(n) for n in range(1, MAX_DICE + 1)}
+
+
+# 投掷 n 个骰子的概率信息
+def roll_odds(n):
+    return ROLL_ODDS[n]
@@ -0,0 +1,119 @@
+import json
+import struct
+
+# 联机消息格式
+# 每条消息是一个带 "type" 字段的字典，在连接上以带长度前缀的帧传输：
+#   帧头  !IBBB   正文字节数、协议版本、消息类型编号、二进制段字节数
+#   正文          二进制段，其余字段为紧凑 JSON（没有其余字段时为空）
+# 二进制段一般是骰子点数（每个 1 字节，对应消息中的 "dice" 字段，解码为列表）；
+# RAW_FIELDS 中的消息类型改为原样传输 bytes 字段（联机对局的增量等，见 netgame.py）。
+# 消息类型用编号传输，新的类型只在 MESSAGE_TYPES 末尾追加；协议版本不同的帧直接拒绝。
+# FrameDecoder 可以处理一次读到半帧或多帧的情况，房间服务器（room_server.py）和客户端（room_client.py）都只通过这里编解码。
+
+DEFAULT_PORT = 12345
+PROTOCOL_VERSION = 3  # 版本 1 为按行分隔的 JSON；版本 2 的帧头第 4 个字节只表示骰子个数，没有原样传输的二进制段
+MAX_MESSAGE_SIZE = 64 * 1024  # 单帧正文的最大字节数，超过时断开连接
+
+FRAME_HEADER = struct.Struct("!IBBB")
+
+MESSAGE_TYPES = (
+    "error",
+    "create_room",
+    "room_created",
+    "list_rooms",
+    "room_list",
+    "join_room",
+    "join_result",
+    "player_joined",
+    "player_left",
+    "exit_room",
+    "close_room",
+    "game",
+    "room_closed",
+    "delta",
+    "snapshot",
+    "intent",
+    "resync",
+)
+TYPE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+RAW_FIELDS = {"delta": "data", "snapshot": "data", "intent": "data"}
+MAX_RAW_SIZE = 255
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_message(message):
+    fields = dict(message)
+    kind = fields.pop("type")
+    code = TYPE_CODES.get(kind)
+    if code is None:
+        raise ProtocolError(f"未知的消息类型: {kind}")
+    raw = bytes(fields.pop(RAW_FIELDS.get(kind, "dice"), b""))
+    if len(raw) > MAX_RAW_SIZE:
+        raise ProtocolError(f"二进制段过长: {len(raw)} 字节")
+    body = json.dumps(fields, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if fields else b""
+    length = len(raw) + len(body)
+    if length > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"消息过长: {length} 字节")
+    return FRAME_HEADER.pack(length, PROTOCOL_VERSION, code, len(raw)) + raw + body
+
+
+# 解析帧头，返回 (正文字节数, 消息类型, 二进制段字节数)
+def decode_header(header):
+    length, version, code, raw_size = FRAME_HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"不支持的协议版本: {version}")
+    if code >= len(MESSAGE_TYPES):
+        raise ProtocolError(f"未知的消息类型编号: {code}")
+    if length > MAX_MESSAGE_SIZE or raw_size > length:
+        raise ProtocolError(f"帧长度无效: {length}")
+    return length, MESSAGE_TYPES[code], raw_size
+
+
+def decode_body(kind, raw_size, body):
+    if len(body) > raw_size:
+        try:
+            message = json.loads(bytes(body[raw_size:]))
+        except ValueError as e:
+            raise ProtocolError(f"消息正文不是合法的 JSON: {e}") from None
+        if not isinstance(message, dict):
+            raise ProtocolError("消息正文必须是对象")
+    else:
+        message = {}
+    message["type"] = kind
+    field = RAW_FIELDS.get(kind)
+    if field is not None:
+        message[field] = bytes(body[:raw_size])
+    elif raw_size:
+        message["dice"] = list(body[:raw_size])
+    return message
+
+
+# 增量解码：每次 feed 收到的字节，返回其中已经完整的消息列表，不完整的部分留到下次
+class FrameDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        pos = 0
+        buffer = self.buffer
+        while len(buffer) - pos >= FRAME_HEADER.size:
+            length, kind, raw_size = decode_header(buffer[pos:pos + FRAME_HEADER.size])
+            end = pos + FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            messages.append(decode_body(kind, raw_size, buffer[pos + FRAME_HEADER.size:end]))
+            pos = end
+        del buffer[:pos]
+        return messages
+
+
+# 从 asyncio.StreamReader 读一条消息，连接关闭时抛出 asyncio.IncompleteReadError
+async def read_message(reader):
+    length, kind, raw_size = decode_header(await reader.readexactly(FRAME_HEADER.size))
+    body = await reader.readexactly(length) if length else b""
+    return decode_body(kind, raw_size, body)
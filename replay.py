@@ -0,0 +1,101 @@
+import argparse
+import sys
+import time
+
+from dice_rng import DiceStream
+from engine import GameState, ROLL, CONTINUE, BANK, TURN, WIN
+from journal import read_games
+
+# 对局回放
+# 同一种子的骰子流加上记录下来的每次决策（留骰掩码、继续或结束本轮），按与 DiceGame 相同的规则引擎
+# 重新进行一遍对局，没有动画和等待。用于核对对局日志（争议处理）和调试 AI：
+#   python replay.py journal/games.kcdj            全速核对日志中的每一局
+#   python replay.py journal/games.kcdj --game 3   只核对第 3 局（从 0 开始）
+# 图形界面中跳转到任意回合见 python DiceGame.py --replay。
+
+
+# 从事件中取出每次决策 [(留骰掩码, 是否继续投掷)]
+def decisions_from_events(events):
+    return [(event.kept_mask, event.kind == CONTINUE) for event in events if event.kind in (CONTINUE, BANK)]
+
+
+class Replay:
+    # rolls 为最多投掷的次数：记录在中途结束（关闭了窗口）时，回放到同一位置为止
+    def __init__(self, seed, target_score, decisions, rolls=None):
+        self.seed = seed
+        self.target_score = target_score
+        self.events = []
+        self.turns = []  # 每一轮开始时（以及结束时）的 (状态副本, 此前的事件数)，用于直接跳转
+        dice = DiceStream(seed)
+        state = GameState(target_score)
+        self.turns.append((state.copy(), 0))
+        decisions = iter(decisions)
+        while not state.winner and (rolls is None or rolls > 0):
+            events = state.roll(dice.roll(state.remaining_dice))
+            if rolls is not None:
+                rolls -= 1
+            if state.has_rolled:
+                decision = next(decisions, None)
+                if decision is None:
+                    self.events.extend(events)
+                    break  # 记录到此为止
+                kept_mask, go_on = decision
+                state.set_kept_mask(kept_mask)
+                events += state.continue_turn() if go_on else state.end_turn()
+            self.events.extend(events)
+            if events[-1].kind in (TURN, WIN):
+                self.turns.append((state.copy(), len(self.events)))
+        self.state = state
+
+    @classmethod
+    def from_journal(cls, game, events):
+        rolls = sum(1 for event in events if event.kind == ROLL)
+        return cls(game.seed, game.target_score, decisions_from_events(events), rolls)
+
+
+# 回放一局并与记录比较，一致时返回 None，否则返回第一处不一致的说明
+def verify_game(game, events):
+    try:
+        replay = Replay.from_journal(game, events)
+    except ValueError as e:
+        return f"记录中的决策不合规则: {e}"
+    for index, (recorded, replayed) in enumerate(zip(events, replay.events)):
+        if recorded != replayed:
+            return f"第 {index} 个事件不一致：记录为 {recorded}，回放为 {replayed}"
+    if len(events) != len(replay.events):
+        return f"事件个数不一致：记录为 {len(events)}，回放为 {len(replay.events)}"
+    return None
+
+
+# 核对日志中的对局，返回 (核对局数, [(局号, 种子, 不一致说明)])
+def verify_journal(path, game_index=None):
+    checked = 0
+    failures = []
+    for index, (game, events) in enumerate(read_games(path)):
+        if game_index is not None and index != game_index:
+            continue
+        checked += 1
+        problem = verify_game(game, events)
+        if problem:
+            failures.append((index, game.seed, problem))
+    return checked, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回放并核对对局日志")
+    parser.add_argument("journal", help="对局日志文件")
+    parser.add_argument("--game", type=int, help="只核对指定的一局（从 0 开始）")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    checked, failures = verify_journal(args.journal, args.game)
+    elapsed = time.perf_counter() - start
+    for index, seed, problem in failures:
+        print(f"第 {index} 局（种子 {seed}）: {problem}")
+    rate = checked / elapsed if elapsed > 0 else 0.0
+    print(f"核对 {checked} 局，{len(failures)} 局不一致，用时 {elapsed:.2f} 秒（{rate:,.0f} 局/秒）")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
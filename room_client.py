@@ -0,0 +1,54 @@
+import socket
+import threading
+
+from protocol import DEFAULT_PORT, FrameDecoder, encode_message
+
+# 房间服务器的客户端（供图形界面使用）
+# 连接一次后一直保持，send 可以在任意线程调用；后台线程读取服务器发来的消息并以字典调用 on_message。
+# on_message 在读取线程中被调用，图形界面应把消息转交给 UIMessagePump，不要直接操作 Tk。
+# 连接断开时（不是主动 close）会收到一条 {"type": "disconnected"}。
+
+CONNECT_TIMEOUT = 5
+RECV_SIZE = 65536
+
+
+class RoomClient:
+    def __init__(self, host, on_message, port=DEFAULT_PORT, timeout=CONNECT_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(None)
+        self.on_message = on_message
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.thread.start()
+
+    def send(self, message):
+        data = encode_message(message)
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def _read_loop(self):
+        decoder = FrameDecoder()
+        try:
+            while True:
+                data = self.sock.recv(RECV_SIZE)
+                if not data:
+                    break
+                for message in decoder.feed(data):
+                    self.on_message(message)
+        except (OSError, ValueError) as e:
+            if not self.closed:
+                print(f"与服务器的连接出错: {e}")
+        if not self.closed:
+            self.closed = True
+            self.on_message({"type": "disconnected"})
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import itertools
+import threading
+
+from protocol import DEFAULT_PORT, ProtocolError, encode_message, read_message
+
+# 房间服务器
+# 一个 asyncio 事件循环同时服务多个房间和客户端，消息格式见 protocol.py。每位玩家只建立一次 TCP 连接，之后创建房间、加入、
+# 退出、关闭房间以及对局消息都在这条连接上收发，服务器也通过它主动通知房间里的另一方。
+#
+# 背压：发给每位玩家的消息先进入一个有上限的发送队列，由单独的写任务写出并等待 drain。
+# 对方读得太慢、队列被占满时直接断开这位玩家，不会拖慢其它房间。
+#
+#   python room_server.py --port 12345     单独运行服务器
+# 大厅中的房主用 ServerThread 在后台线程里运行服务器。
+
+SEND_QUEUE_SIZE = 256  # 每位玩家最多积压的待发送消息数
+
+
+class Peer:
+    def __init__(self, writer):
+        self.writer = writer
+        peername = writer.get_extra_info("peername")
+        self.ip = peername[0] if peername else ""
+        self.name = ""
+        self.room = None
+        self.outbox = asyncio.Queue(SEND_QUEUE_SIZE)
+        self.closed = False
+        self.write_task = asyncio.create_task(self._write_loop())
+
+    # 发送一条消息（不等待），发送队列已满时断开连接
+    def send(self, message):
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(encode_message(message))
+        except asyncio.QueueFull:
+            print(f"{self.name or self.ip} 接收太慢，断开连接")
+            self.close()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                data = await self.outbox.get()
+                self.writer.write(data)
+                await self.writer.drain()  # 对方读得慢时在这里等待
+        except (ConnectionError, OSError):
+            self.closed = True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.write_task.cancel()
+        self.writer.close()
+
+
+class Room:
+    def __init__(self, room_id, host, name, password, bet, host_ip):
+        self.id = room_id
+        self.host = host
+        self.guest = None
+        self.name = name
+        self.password = password
+        self.bet = bet
+        self.host_ip = host_ip
+
+    def other(self, peer):
+        return self.guest if peer is self.host else self.host
+
+    def info(self):
+        return {
+            "room": self.id,
+            "name": self.name,
+            "host_ip": self.host_ip,
+            "status": "已满" if self.guest else "等待中",
+            "password": "是" if self.password else "否",
+            "bet": self.bet,
+        }
+
+
+class RoomServer:
+    def __init__(self):
+        self.rooms = {}  # 房间号 -> Room
+        self.peers = set()
+        self.server = None
+        self._tasks = set()  # 正在处理连接的任务
+        self._room_ids = itertools.count(1)
+        self.handlers = {
+            "create_room": self.create_room,
+            "list_rooms": self.list_rooms,
+            "join_room": self.join_room,
+            "exit_room": self.leave_room,
+            "close_room": self.leave_room,
+            "game": self.relay,
+            "delta": self.relay,
+            "snapshot": self.relay,
+            "intent": self.relay,
+            "resync": self.relay,
+        }
+
+    async def start(self, host="", port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._serve, host or None, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        peers = list(self.peers)
+        for peer in peers:
+            peer.close()
+        # 等待各连接的收发任务结束，关闭后不留下被取消的任务
+        await asyncio.gather(*self._tasks, *(peer.write_task for peer in peers), return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        peer = Peer(writer)
+        self.peers.add(peer)
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            while not peer.closed:
+                message = await read_message(reader)
+                handler = self.handlers.get(message["type"])
+                if handler is None:
+                    peer.send({"type": "error", "reason": f"服务器不接受的消息类型: {message['type']}"})
+                else:
+                    handler(peer, message)
+        except ProtocolError as e:
+            # 帧格式错误后无法再对齐后续的帧，告知对方后断开（直接写入，关闭连接前会发出）
+            peer.writer.write(encode_message({"type": "error", "reason": str(e)}))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # 连接断开
+        finally:
+            try:
+                self.leave_room(peer)
+            finally:
+                self.peers.discard(peer)  # 通知对方出错时也要释放这条连接
+                self._tasks.discard(task)
+                peer.close()
+
+    def create_room(self, peer, message):
+        self.leave_room(peer)
+        peer.name = message.get("name", "")
+        room = Room(next(self._room_ids), peer, message.get("room_name", ""), message.get("password", ""),
+                    message.get("bet"), message.get("ip", peer.ip))
+        self.rooms[room.id] = room
+        peer.room = room
+        peer.send(dict(room.info(), type="room_created"))
+
+    def list_rooms(self, peer, message):
+        peer.send({"type": "room_list", "rooms": [room.info() for room in self.rooms.values()]})
+
+    def join_room(self, peer, message):
+        room = self.rooms.get(message.get("room"))
+        if room is None and "room" not in message and len(self.rooms) == 1:
+            room = next(iter(self.rooms.values()))  # 局域网房主只开一个房间，可以不指定房间号
+        if room is None:
+            peer.send({"type": "join_result", "status": "房间不存在"})
+        elif room.guest is not None:
+            peer.send({"type": "join_result", "status": "房间已满"})
+        elif room.password and message.get("password") != room.password:
+            peer.send({"type": "join_result", "status": "密码错误"})
+        else:
+            self.leave_room(peer)
+            peer.name = message.get("name", "")
+            room.guest = peer
+            peer.room = room
+            peer.send({
+                "type": "join_result",
+                "status": "确认连接",
+                "room": room.id,
+                "host_ip": room.host_ip,
+                "host_name": room.host.name,
+                "bet": room.bet,
+                "client_name": peer.name,
+            })
+            room.host.send({"type": "player_joined", "name": peer.name, "ip": message.get("ip", peer.ip)})
+
+    # 退出房间；房主退出时关闭房间并通知对方
+    def leave_room(self, peer, message=None):
+        room = peer.room
+        if room is None:
+            return
+        peer.room = None
+        if room.host is peer:
+            del self.rooms[room.id]
+            if room.guest is not None:
+                room.guest.room = None
+                room.guest.send({"type": "room_closed"})
+        elif room.guest is peer:
+            room.guest = None
+            room.host.send({"type": "player_left", "name": peer.name})
+
+    # 把对局消息转发给房间里的另一方
+    def relay(self, peer, message):
+        other = peer.room.other(peer) if peer.room else None
+        if other is not None:
+            other.send(message)
+
+
+# 在后台线程中运行房间服务器（供图形界面使用）
+class ServerThread:
+    def __init__(self, host="", port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.server = RoomServer()
+        self.loop = asyncio.new_event_loop()
+        self.error = None
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    # 启动并等待端口监听成功，失败时抛出 OSError
+    def start(self):
+        self.thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.server.start(self.host, self.port))
+        except OSError as e:
+            self.error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+
+
+async def serve(host, port):
+    server = RoomServer()
+    listener = await server.start(host, port)
+    print(f"房间服务器已启动，端口 {port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()  # 按 Ctrl+C 退出时也先断开各连接，不留下被取消的任务
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="骰子游戏房间服务器")
+    parser.add_argument("--host", default="", help="监听地址（默认所有地址）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+from collections import namedtuple
+from itertools import combinations_with_replacement
+
+# 计分查表模块
+# 0~6 个骰子一共只有 924 种点数组合（多重集合），导入时一次性算好每种组合的得分，
+# 之后计分只需把骰子打包成键再查一次表。
+#
+# 键的打包方式：每个点数占 3 位（个数最多为 6），点数 d 的个数存放在第 3*(d-1) 位起。
+# 因为每个点数的个数不会超过 7，所以直接把每个骰子对应的权重相加就能得到键。
+
+MAX_DICE = 6
+
+# 每个点数对应的键权重，下标 0 留空（权重为 0），方便与 counts[0] 未使用的写法保持一致
+KEY_WEIGHT = (0,) + tuple(1 << (3 * (face - 1)) for face in range(1, 7))
+
+
+# 按计数数组计算得分（原始算法，只在建表时使用）
+def _reference_score(counts):
+    score = 0
+
+    # 计算单个 1 和 5 的得分
+    score += counts[1] * 100
+    score += counts[5] * 50
+
+    # 处理三个相同点数及以上的情况
+    for i in range(1, 7):
+        if counts[i] >= 3:
+            if i == 1:
+                base_score = 1000
+            else:
+                base_score = i * 100
+            multiplier = 2 ** (counts[i] - 3)
+            score += base_score * multiplier
+            if i == 1:
+                score -= counts[1] * 100  # 减去之前单独计算的 1 的得分
+            if i == 5:
+                score -= counts[5] * 50  # 减去之前单独计算的 5 的得分
+
+    # 检查顺子
+    if all(counts[1:7]):
+        score = 1500
+    elif counts[1] and counts[2] and counts[3] and counts[4] and counts[5]:
+        score = 500
+
+    return score
+
+
+# 检查单个骰子是否有效计分
+def is_die_scoring(die, counts):
+    if die == 1 or die == 5:
+        return True
+    if counts[die] >= 3:
+        return True
+    return False
+
+
+# 把骰子点数列表打包成查表键
+def dice_key(dice):
+    key = 0
+    for die in dice:
+        key += KEY_WEIGHT[die]
+    return key
+
+
+# 把计数数组（counts[1]~counts[6]）打包成查表键
+def counts_key(counts):
+    return (counts[1] | counts[2] << 3 | counts[3] << 6 |
+            counts[4] << 9 | counts[5] << 12 | counts[6] << 15)
+
+
+# 把查表键还原成计数数组
+def key_counts(key):
+    return [0] + [(key >> (3 * (face - 1))) & 7 for face in range(1, 7)]
+
+
+def _build_tables():
+    score_table = {}
+    scoring_faces = {}
+    faces_present = {}
+    for n in range(MAX_DICE + 1):
+        for dice in combinations_with_replacement(range(1, 7), n):
+            counts = [0] * 7
+            for die in dice:
+                counts[die] += 1
+            key = counts_key(counts)
+            score_table[key] = _reference_score(counts)
+            # 在这组骰子中能单独算作有效计分的点数（按位存放，第 d 位对应点数 d）
+            scoring_faces[key] = sum(1 << face for face in range(1, 7) if counts[face] and is_die_scoring(face, counts))
+            faces_present[key] = sum(1 << face for face in range(1, 7) if counts[face])
+    return score_table, scoring_faces, faces_present
+
+
+SCORE_TABLE, SCORING_FACES, FACES_PRESENT = _build_tables()
+
+
+# 按计数数组查表得分
+def score_counts(counts):
+    return SCORE_TABLE[counts_key(counts)]
+
+
+# 按骰子点数列表查表得分
+def score_dice(dice):
+    key = 0
+    for die in dice:
+        key += KEY_WEIGHT[die]
+    return SCORE_TABLE[key]
+
+
+# 计算一次投掷的得分（保留原有函数名）
+calculate_score = score_dice
+
+
+# 检查是否有得分机会
+def has_scoring_opportunity(dice):
+    key = 0
+    for die in dice:
+        key += KEY_WEIGHT[die]
+    return SCORE_TABLE[key] > 0
+
+
+# 检查选中的骰子是否全部有效计分
+def all_dice_scoring(kept_dice, all_dice):
+    key = 0
+    for die in all_dice:
+        key += KEY_WEIGHT[die]
+    scoring_faces = SCORING_FACES[key]
+    for die in kept_dice:
+        if not scoring_faces >> die & 1:
+            return False
+    return True
+
+
+
+# ---------------- 合法留骰索引 ----------------
+# 一次投掷中可以留下的骰子按点数去重后最多只有几十种（三个 5 只算留 1/2/3 个 5 三种），
+# 导入时为每种投掷组合列出全部合法留法及其得分，AI 和提示只需查表，再映射回按钮下标。
+
+# key: 留下骰子的查表键，faces: 留下的点数（升序），score: 得分，size: 留下的骰子个数
+Keep = namedtuple("Keep", "key faces score size")
+
+
+def _build_keep_table():
+    # 每种点数组合作为留法只创建一次，各投掷共用
+    all_keeps = {}
+    for key, score in SCORE_TABLE.items():
+        counts = key_counts(key)
+        faces = tuple(face for face in range(1, 7) for _ in range(counts[face]))
+        all_keeps[key] = Keep(key, faces, score, len(faces))
+    # 得分高的在前，同分时留骰少的在前；先对全部留法排好一次序，之后按名次排序
+    ordered = sorted(all_keeps.values(), key=lambda keep: (-keep.score, keep.size, keep.faces))
+    rank = {keep.key: i for i, keep in enumerate(ordered)}
+
+    keep_table = {}
+    for key in SCORE_TABLE:
+        counts = key_counts(key)
+        scoring_faces = SCORING_FACES[key]
+        # 逐个点数展开可以留下的个数（不计分的点数只能留 0 个）
+        sub_keys = [0]
+        for face in range(1, 7):
+            if scoring_faces >> face & 1:
+                weight = KEY_WEIGHT[face]
+                sub_keys = [sub + c * weight for sub in sub_keys for c in range(counts[face] + 1)]
+        sub_keys.sort(key=rank.__getitem__)
+        keep_table[key] = tuple(all_keeps[sub] for sub in sub_keys if sub)
+    return keep_table
+
+
+KEEP_TABLE = _build_keep_table()
+
+
+# 列出一次投掷的全部合法留法（按得分从高到低），没有得分机会时返回空元组
+def legal_keeps(dice):
+    key = 0
+    for die in dice:
+        key += KEY_WEIGHT[die]
+    return KEEP_TABLE[key]
+
+
+# 把留下的点数映射回骰子下标（同点数的骰子按下标从小到大选取）
+def keep_indices(dice, faces):
+    needed = [0] * 7
+    for face in faces:
+        needed[face] += 1
+    indices = []
+    for i, die in enumerate(dice):
+        if needed[die]:
+            needed[die] -= 1
+            indices.append(i)
+    return indices
+
+
+# ---------------- 单次投掷的选择缓存 ----------------
+# 投掷落地时一次性算出所有 2^k 种选择（位掩码，第 i 位表示选中第 i 个骰子）的得分和是否有效，
+# 之后点击骰子只是翻转一位再查表；AI 和提示也共用这份缓存，每次投掷只计分一次。
+
+class RollSelection:
+    __slots__ = ("dice", "keeps", "_scores", "_valid")
+
+    def __init__(self, dice):
+        self.dice = tuple(dice)
+        self.keeps = KEEP_TABLE[dice_key(self.dice)]  # 去重后的合法留法，按得分从高到低排列
+        self._scores = None  # 各位掩码的得分，第一次查询时才建表（无界面模拟通常用不到）
+        self._valid = None
+
+    def _build(self):
+        n = len(self.dice)
+        size = 1 << n
+        scoring_faces = SCORING_FACES[dice_key(self.dice)]
+        keys = [0] * size
+        bad = [False] * size  # 是否选中了不能单独计分的骰子
+        scores = [0] * size
+        valid = [False] * size
+        for mask in range(1, size):
+            low = mask & -mask
+            die = self.dice[low.bit_length() - 1]
+            rest = mask ^ low
+            keys[mask] = keys[rest] + KEY_WEIGHT[die]
+            bad[mask] = bad[rest] or not scoring_faces >> die & 1
+            if not bad[mask]:
+                scores[mask] = SCORE_TABLE[keys[mask]]
+                valid[mask] = True
+        self._scores = scores
+        self._valid = valid
+
+    # 提前建好全部选择的表（可以在后台线程中调用），返回自身
+    def prepare(self):
+        if self._scores is None:
+            self._build()
+        return self
+
+    # 选中骰子的得分，选中了无效骰子时为 0
+    def score(self, mask):
+        if self._scores is None:
+            self._build()
+        return self._scores[mask]
+
+    # 是否可以计分（至少选中一个且全部有效计分）
+    def is_valid(self, mask):
+        if self._valid is None:
+            self._build()
+        return self._valid[mask]
+
+    # 把留下的点数映射为位掩码
+    def mask_of(self, faces):
+        mask = 0
+        for i in keep_indices(self.dice, faces):
+            mask |= 1 << i
+        return mask
+
+    # 得分最高的留法对应的位掩码
+    def best_mask(self):
+        return self.mask_of(self.keeps[0].faces) if self.keeps else 0
+
+# ---------------- NumPy 批量计分 ----------------
+# 蒙特卡洛估算时一次性给出成千上万次投掷，逐个调用 calculate_score 太慢，
+# 这里用向量化的计数键一次查完整批。NumPy 为可选依赖，未安装时调用会报错。
+# 只在第一次批量调用时才导入 NumPy，游戏界面启动时不需要付出导入它的时间。
+
+_np_tables = None
+
+
+def _import_numpy(name):
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(f"{name} 需要安装 numpy") from None
+    return numpy
+
+
+def _get_np_tables(np):
+    global _np_tables
+    if _np_tables is None:
+        size = 1 << (3 * 6)
+        score = np.zeros(size, dtype=np.int32)
+        faces = np.zeros(size, dtype=np.uint8)
+        for key, value in SCORE_TABLE.items():
+            score[key] = value
+            faces[key] = SCORING_FACES[key]
+        _np_tables = (np.array(KEY_WEIGHT, dtype=np.int32), score, faces)
+    return _np_tables
+
+
+# 批量计分：rolls 为 N×k 的点数数组（k ≤ 6，点数 1~6，0 表示空位）
+# 返回 (得分向量, 爆点掩码, 每个骰子是否有效计分的掩码)
+def score_batch(rolls):
+    np = _import_numpy("score_batch")
+    rolls = np.asarray(rolls, dtype=np.intp)
+    if rolls.ndim != 2 or rolls.shape[1] > MAX_DICE:
+        raise ValueError(f"rolls 的形状应为 (N, k) 且 k <= {MAX_DICE}，实际为 {rolls.shape}")
+    weight, score_table, faces_table = _get_np_tables(np)
+    keys = weight[rolls].sum(axis=1)
+    scores = score_table[keys]
+    bust = scores == 0
+    scoring = ((faces_table[keys][:, None] >> rolls) & 1).astype(bool)
+    return scores, bust, scoring
+
+
+# 生成一批随机投掷，rng 为 numpy.random.Generator，未指定时新建一个
+def roll_batch(n, k, rng=None):
+    np = _import_numpy("roll_batch")
+    if rng is None:
+        rng = np.random.default_rng()
+    return rng.integers(1, 7, size=(n, k), dtype=np.uint8)
@@ -0,0 +1,137 @@
+import argparse
+import math
+import random
+import time
+from multiprocessing import Pool
+
+import ai
+from engine import play_game, ROLL, BUST
+from solver import get_solver, BET_LEVELS
+
+# AI 对战批量模拟：python simulate.py -n 100000 -a heuristic -b solver --bet 2000 --workers 4
+# 在多进程池中进行 N 局两种策略之间的对局，统计胜率（含置信区间）、平均回合数、爆点率和模拟速度。
+# 每个任务块使用由 (种子, 块编号) 确定的独立随机数流，同样的参数总能得到同样的结果。
+
+# 可选策略：简单难度的权重策略、贪心策略、中等/困难难度的求解表策略
+STRATEGIES = {
+    "heuristic": ai.weighted_choice,
+    "greedy": ai.greedy_choice,
+    "table": ai.table_bank_choice,
+    "solver": ai.solver_choice,
+}
+
+CHUNK_SIZE = 2000  # 每个任务块的局数
+
+
+# 统计一块对局的结果，返回 [A胜, B胜, 未分胜负, 总回合数, A投掷次数, A爆点次数, B投掷次数, B爆点次数]
+def run_chunk(args):
+    seed, chunk_index, games, target_score, name_a, name_b = args
+    rng = random.Random(f"{seed}:{chunk_index}")
+    strategies = (STRATEGIES[name_a], STRATEGIES[name_b])
+    stats = [0] * 8
+    for game_index in range(games):
+        # 轮流先手，消除先手优势；A 为先手时 players 顺序为 (A, B)
+        a_first = (chunk_index * CHUNK_SIZE + game_index) % 2 == 0
+        players = strategies if a_first else strategies[::-1]
+        counter = _EventCounter()
+        state = play_game(target_score, players, rng, on_events=counter.add)
+        if state.winner:
+            a_won = (state.winner == 1) == a_first
+            stats[0 if a_won else 1] += 1
+        else:
+            stats[2] += 1
+        stats[3] += counter.rounds
+        first, second = (4, 6) if a_first else (6, 4)
+        stats[first] += counter.rolls[1]
+        stats[first + 1] += counter.busts[1]
+        stats[second] += counter.rolls[2]
+        stats[second + 1] += counter.busts[2]
+    return stats
+
+
+# 回合数取最后一次投掷所在的回合：state.round_num 在玩家 2 结束本轮（包括获胜的一轮）后才加 1，
+# 直接用它会让玩家 2 获胜的对局多算一个回合
+class _EventCounter:
+    __slots__ = ("rolls", "busts", "rounds")
+
+    def __init__(self):
+        self.rolls = [0, 0, 0]
+        self.busts = [0, 0, 0]
+        self.rounds = 0
+
+    def add(self, events):
+        for event in events:
+            if event.kind == ROLL:
+                self.rolls[event.player] += 1
+                self.rounds = event.round_num
+            elif event.kind == BUST:
+                self.busts[event.player] += 1
+
+
+# Wilson 置信区间
+def wilson_interval(wins, n, z=1.96):
+    if n == 0:
+        return 0.0, 0.0
+    p = wins / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return center - half, center + half
+
+
+def simulate(games, target_score, name_a, name_b, workers=1, seed=0):
+    # 需要求解表的策略先在主进程中生成缓存，避免每个子进程各自求解一遍
+    if {name_a, name_b} & {"table", "solver"}:
+        get_solver(target_score)
+
+    tasks = []
+    chunk_index = 0
+    left = games
+    while left > 0:
+        size = min(CHUNK_SIZE, left)
+        tasks.append((seed, chunk_index, size, target_score, name_a, name_b))
+        chunk_index += 1
+        left -= size
+
+    start = time.perf_counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(run_chunk, tasks, chunksize=1)
+    else:
+        results = [run_chunk(task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    totals = [sum(column) for column in zip(*results)] if results else [0] * 8
+    return totals, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI 对战批量模拟")
+    parser.add_argument("-n", "--games", type=int, default=10000, help="对局数")
+    parser.add_argument("-a", "--strategy-a", choices=sorted(STRATEGIES), default="heuristic", help="策略 A")
+    parser.add_argument("-b", "--strategy-b", choices=sorted(STRATEGIES), default="solver", help="策略 B")
+    parser.add_argument("--bet", type=int, choices=BET_LEVELS, default=1000, help="底注（目标分数）")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="进程数")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args(argv)
+    if args.games < 1:
+        parser.error("对局数至少为 1")
+
+    totals, elapsed = simulate(args.games, args.bet, args.strategy_a, args.strategy_b, args.workers, args.seed)
+    a_wins, b_wins, unfinished, rounds, a_rolls, a_busts, b_rolls, b_busts = totals
+    decided = a_wins + b_wins
+
+    print(f"底注 {args.bet}，{args.games} 局，{args.workers} 个进程，种子 {args.seed}")
+    for name, wins, rolls, busts in ((args.strategy_a, a_wins, a_rolls, a_busts), (args.strategy_b, b_wins, b_rolls, b_busts)):
+        low, high = wilson_interval(wins, decided)
+        rate = wins / decided if decided else 0.0
+        bust_rate = busts / rolls if rolls else 0.0
+        print(f"  {name:<10} 胜率 {rate:7.2%}  95% 置信区间 [{low:.2%}, {high:.2%}]  爆点率 {bust_rate:6.2%}")
+    if unfinished:
+        print(f"  未分胜负: {unfinished} 局")
+    print(f"  平均回合数: {rounds / args.games:.2f}")
+    print(f"  用时 {elapsed:.2f} 秒，{args.games / elapsed:,.0f} 局/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+import threading
+from array import array
+from itertools import combinations_with_replacement
+from math import factorial
+
+from scoring import legal_keeps, MAX_DICE
+
+# 单回合最优决策求解器
+# 状态为（本回合已得分, 剩余骰子数, 距离目标的分数），目标是让本回合最终存下的分数
+# （超过目标的部分不计）期望最大。所有得分都是 50 的倍数，因此以 50 分为单位建表。
+#
+# 表按底注（目标分数）各建一次并缓存到磁盘，之后的每次决策只是查表。
+
+SCORE_UNIT = 50
+BET_LEVELS = (1000, 2000, 4000, 8000)
+
+# 计分规则或表格式变化时修改版本号，旧的缓存文件会自动失效
+TABLE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solver_cache")
+
+
+# 列出投掷 n 个骰子的所有结果（按点数去重），并合并可选动作相同的结果
+# 返回 [(概率, ((得分单位数, 之后剩余骰子数), ...)), ...]，爆点的结果不列出
+def _roll_outcomes(n):
+    merged = {}
+    for dice in combinations_with_replacement(range(1, 7), n):
+        counts = [0] * 7
+        for die in dice:
+            counts[die] += 1
+        ways = factorial(n)
+        for c in counts:
+            ways //= factorial(c)
+        prob = ways / 6 ** n
+
+        # 剩余骰子数相同的留法只保留得分最高的
+        best = {}
+        for keep in legal_keeps(dice):
+            next_n = n - keep.size or MAX_DICE
+            units = keep.score // SCORE_UNIT
+            if units > best.get(next_n, 0):
+                best[next_n] = units
+        if not best:
+            continue
+        options = tuple(sorted((units, next_n) for next_n, units in best.items()))
+        merged[options] = merged.get(options, 0.0) + prob
+    return [(prob, options) for options, prob in merged.items()]
+
+
+class TurnSolver:
+    def __init__(self, target_score, values=None):
+        self.target_score = target_score
+        self.max_units = -(-target_score // SCORE_UNIT)
+        self.values = values if values is not None else self._solve()
+
+    # values 的布局：距离目标 r 单位时占据 r*(r-1)/2*6 起的 r*6 个格子，
+    # 格子 (j, n) 表示本回合已得 j 单位、准备投掷 n 个骰子时的期望存分（单位数）
+    @staticmethod
+    def _offset(r_units, j, n):
+        return ((r_units * (r_units - 1) // 2 + j) * MAX_DICE) + n - 1
+
+    def _solve(self):
+        values = array("d")
+        outcomes = [_roll_outcomes(n) for n in range(1, MAX_DICE + 1)]
+        for r_units in range(1, self.max_units + 1):
+            # after[j2][n2]: 留骰后得 j2 单位、剩 n2 个骰子时的最优值（存分或继续取较大者）
+            after = [None] * r_units
+            block = [0.0] * (r_units * MAX_DICE)
+            for j in range(r_units - 1, -1, -1):
+                row = [0.0] * (MAX_DICE + 1)
+                for n in range(1, MAX_DICE + 1):
+                    expected = 0.0
+                    for prob, options in outcomes[n - 1]:
+                        best = 0.0
+                        for units, next_n in options:
+                            j2 = j + units
+                            if j2 >= r_units:
+                                value = r_units
+                            else:
+                                value = after[j2][next_n]
+                            if value > best:
+                                best = value
+                        expected += prob * best
+                    block[j * MAX_DICE + n - 1] = expected
+                    row[n] = expected if expected > j else j
+                after[j] = row
+            values.extend(block)
+        return values
+
+    # 本回合已得 round_score 分、准备投掷 n 个骰子时的期望存分
+    def expected_value(self, round_score, n, remaining):
+        r_units = -(-remaining // SCORE_UNIT)
+        j = round_score // SCORE_UNIT
+        if j >= r_units:
+            return remaining
+        return self.values[self._offset(r_units, j, n)] * SCORE_UNIT
+
+    # 留骰后（本回合已得 round_score 分，剩 n 个骰子）继续投掷是否比存分更好
+    def should_continue(self, round_score, n, remaining):
+        return round_score < remaining and self.expected_value(round_score, n, remaining) > round_score
+
+    # 给出一次投掷的最优决策：返回 (留骰组合, 是否继续投掷)，无得分机会时返回 (None, False)
+    def best_action(self, dice, round_score, remaining):
+        best_keep = None
+        best_value = -1.0
+        best_continue = False
+        for keep in legal_keeps(dice):
+            new_score = round_score + keep.score
+            next_n = len(dice) - keep.size or MAX_DICE
+            if new_score >= remaining:
+                value, go_on = remaining, False
+            else:
+                expected = self.expected_value(new_score, next_n, remaining)
+                value, go_on = (expected, True) if expected > new_score else (new_score, False)
+            if value > best_value:
+                best_keep, best_value, best_continue = keep, value, go_on
+        return best_keep, best_continue
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            self.values.tofile(f)
+
+    @classmethod
+    def load(cls, target_score, path):
+        max_units = -(-target_score // SCORE_UNIT)
+        size = max_units * (max_units + 1) // 2 * MAX_DICE
+        values = array("d")
+        with open(path, "rb") as f:
+            values.fromfile(f, size)
+        return cls(target_score, values)
+
+
+def cache_path(target_score):
+    return os.path.join(CACHE_DIR, f"turn_table_v{TABLE_VERSION}_{target_score}.bin")
+
+
+_solvers = {}
+_solvers_lock = threading.Lock()
+
+
+# 获取某个底注对应的求解器：优先使用内存中的表，其次读取磁盘缓存，都没有时求解并写入缓存
+def get_solver(target_score):
+    with _solvers_lock:
+        solver = _solvers.get(target_score)
+        if solver is not None:
+            return solver
+        path = cache_path(target_score)
+        try:
+            solver = TurnSolver.load(target_score, path)
+        except (OSError, EOFError, ValueError):
+            # 缓存不存在或不完整（例如写入时被中断）时重新求解
+            solver = TurnSolver(target_score)
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                solver.save(path)
+            except OSError as e:
+                print(f"保存求解表缓存时出错: {e}")
+        _solvers[target_score] = solver
+        return solver
+
+
+# 在后台线程中提前准备求解表，避免第一次决策时卡住界面
+def prefetch_solver(target_score):
+    threading.Thread(target=get_solver, args=(target_score,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    # 预先为所有底注生成缓存：python solver.py
+    for bet in BET_LEVELS:
+        get_solver(bet)
+        print(f"底注 {bet} 的求解表已就绪: {cache_path(bet)}")
@@ -0,0 +1,79 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from discovery import (BEACON, KIND_BEACON, KIND_QUERY, MAGIC, NAME_MAX_BYTES, QUERY, VERSION, DiscoveryService,
+                       RoomBeacon, pack_beacon, pack_query, parse_packet)
+
+
+@pytest.fixture
+def service():
+    # 绑定随机端口，不占用默认的广播端口
+    service = DiscoveryService(port=0, ttl=0.2)
+    yield service
+    service.close()
+
+
+def test_parse_beacon_and_query():
+    data = pack_beacon(7, "房间", 2000, password=True, full=False, port=12000)
+    assert parse_packet(data, "10.0.0.2") == (KIND_BEACON, 7, RoomBeacon("10.0.0.2", "房间", 2000, True, False, 12000))
+    assert parse_packet(pack_query(9), "10.0.0.3") == (KIND_QUERY, 9, None)
+
+    # 过长的房间名按字节截断，不会截出半个汉字
+    room = parse_packet(pack_beacon(7, "长" * 40, 1000), "10.0.0.2")[2]
+    assert room.name == "长" * (NAME_MAX_BYTES // 3)
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    pack_query(1)[:-1],  # 比最短的报文还短
+    pack_beacon(1, "房间", 1000)[:BEACON.size - 1],  # 广播头不完整
+    b"XXXX" + pack_beacon(1, "房间", 1000)[4:],  # 魔数不对
+    MAGIC + bytes([VERSION + 1]) + pack_beacon(1, "房间", 1000)[5:],  # 版本不对
+    QUERY.pack(MAGIC, VERSION, 9, 1),  # 未知类型
+    pack_beacon(1, "房间", 1000)[:-1],  # 房间名字节数与长度字段不符
+    pack_beacon(1, "房间", 1000) + b"x",
+])
+def test_parse_rejects_bad_packets(data):
+    assert parse_packet(data, "10.0.0.2") is None
+
+
+def test_receive_ignores_own_and_bad_packets(service):
+    assert not service._receive(pack_beacon(service.instance, "自己", 1000), "10.0.0.2")
+    assert not service._receive(b"garbage", "10.0.0.2")
+    assert not service._receive(pack_query(service.instance + 1), "10.0.0.2")
+    assert service.room_list() == {}
+
+
+def test_receive_updates_and_expires_rooms(service):
+    beacon = pack_beacon(1, "房间", 1000, port=12000)
+    assert service._receive(beacon, "10.0.0.2")
+    assert not service._receive(beacon, "10.0.0.2")  # 同样的广播只刷新过期时间
+    assert service._receive(pack_beacon(1, "房间", 1000, full=True, port=12000), "10.0.0.2")
+    assert service._receive(pack_beacon(2, "另一个", 4000, port=12001), "10.0.0.2")  # 同一台机器上的另一个进程
+    rooms = service.room_list()
+    assert sorted(rooms) == ["10.0.0.2:12000", "10.0.0.2:12001"]
+    assert rooms["10.0.0.2:12000"].full
+
+    time.sleep(service.ttl + 0.05)
+    service._expire()  # 后台线程也可能已经移除
+    assert service.room_list() == {}
+
+
+def test_beacon_over_udp(service):
+    changed = threading.Event()
+    service.on_change = lambda rooms: changed.set()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sender.sendto(pack_beacon(3, "局域网", 8000, port=12002), ("127.0.0.1", service.sock.getsockname()[1]))
+        assert changed.wait(2)
+    finally:
+        sender.close()
+    assert service.room_list() == {"127.0.0.1:12002": RoomBeacon("127.0.0.1", "局域网", 8000, False, False, 12002)}
+
+    # 超过 ttl 没有新的广播，房间被后台线程移除
+    changed.clear()
+    assert changed.wait(2)
+    assert service.room_list() == {}
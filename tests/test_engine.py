@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from ai import greedy_choice, weighted_choice
+from engine import BANK, BUST, CONTINUE, ROLL, TURN, WIN, GameState, play_game
+
+
+# 按给定顺序投出骰子的骰子流
+class ScriptedDice:
+    def __init__(self, rolls):
+        self.rolls = list(rolls)
+
+    def roll(self, n):
+        values = self.rolls.pop(0)
+        assert len(values) == n
+        return list(values)
+
+
+def kinds(events):
+    return [event.kind for event in events]
+
+
+def test_bust_clears_round_score():
+    state = GameState(1000)
+    state.roll((1, 5, 2, 3, 4, 6))
+    state.set_kept_indices([0])
+    assert kinds(state.continue_turn()) == [CONTINUE]
+    assert state.round_score == 100 and state.remaining_dice == 5
+
+    events = state.roll((2, 3, 4, 6, 2))
+    assert kinds(events) == [ROLL, BUST, TURN]
+    assert events[0].round_score == 100
+    assert events[1].player == 1 and events[1].round_score == 0
+    assert events[2].player == 2 and events[2].round_num == 1
+    assert state.scores == [0, 0]
+    assert state.current_player == 2 and state.round_score == 0 and state.remaining_dice == 6
+
+
+def test_hot_dice_rolls_six_again():
+    state = GameState(4000)
+    state.roll((1, 1, 1, 5, 5, 5))
+    state.set_kept_mask(0b111111)
+    events = state.continue_turn()
+    assert kinds(events) == [CONTINUE]
+    assert events[0].score == 1500 and events[0].kept_mask == 0b111111
+    assert state.remaining_dice == 6 and state.dice == []
+    with pytest.raises(ValueError):
+        state.roll((1, 2, 3))
+    assert kinds(state.roll((1, 2, 3, 4, 6, 6))) == [ROLL]
+
+
+def test_invalid_selection_is_rejected():
+    state = GameState(1000)
+    state.roll((1, 5, 2, 3, 4, 6))
+    state.set_kept_indices([0, 2])  # 2 不能单独计分
+    assert not state.selection_valid()
+    with pytest.raises(ValueError):
+        state.end_turn()
+    with pytest.raises(ValueError):
+        state.roll((1, 2, 3, 4, 5, 6))
+
+
+def test_win_ends_the_game():
+    dice = ScriptedDice([(1, 5, 2, 3, 4, 6), (2, 3, 4, 6), (1, 1, 1, 5, 5, 5), (1, 1, 1, 2, 3, 4)])
+    events = []
+    state = play_game(2000, [greedy_choice, greedy_choice], random.Random(0), on_events=events.extend, dice=dice)
+    assert kinds(events) == [
+        ROLL, CONTINUE,  # 玩家 1 留下 1 和 5 得 150 分，继续投掷剩下的 4 个骰子
+        ROLL, BUST, TURN,  # 玩家 1 爆点
+        ROLL, CONTINUE,  # 玩家 2 六个骰子全部计分得 1500 分，重新投掷 6 个
+        ROLL, BANK, TURN, WIN,  # 玩家 2 再得 1000 分，存分后获胜
+    ]
+    assert state.scores == [0, 2500]
+    assert state.winner == 2
+    assert events[-1] == (WIN, 2, 2, (), 0, 2500, 0)
+    with pytest.raises(ValueError):
+        state.roll((1, 2, 3, 4, 5, 6))
+
+
+# 逐个检查事件序列的顺序，并按事件重新计算双方总分
+def check_sequence(events, state):
+    scores = [0, 0]
+    player, round_num = 1, 1
+    expect = {ROLL}
+    for event in events:
+        assert event.kind in expect, event
+        if event.kind == TURN:
+            if player == 2:
+                round_num += 1
+            player = 3 - player
+            expect = {ROLL, WIN}
+        elif event.kind == WIN:
+            assert event.player == 3 - player  # 获胜者是刚结束回合的玩家
+            assert event.score == scores[event.player - 1]
+            expect = set()
+        else:
+            assert event.player == player
+            if event.kind == ROLL:
+                expect = {BUST, CONTINUE, BANK}
+            elif event.kind == CONTINUE:
+                expect = {ROLL}
+            elif event.kind in (BUST, BANK):
+                if event.kind == BANK:
+                    scores[player - 1] += event.round_score
+                expect = {TURN}
+        assert event.round_num == round_num
+    assert scores == state.scores
+    assert (events[-1].kind == WIN) == bool(state.winner)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_seeded_game_events(seed):
+    players = [greedy_choice, weighted_choice]
+    events = []
+    state = play_game(2000, players, random.Random(seed), on_events=events.extend)
+    check_sequence(events, state)
+    assert state.winner and state.scores[state.winner - 1] >= 2000
+
+    # 同一个种子得到完全相同的事件序列
+    again = []
+    play_game(2000, players, random.Random(seed), on_events=again.extend)
+    assert again == events
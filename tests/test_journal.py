@@ -0,0 +1,91 @@
+import io
+import json
+import random
+
+import pytest
+
+from ai import greedy_choice, weighted_choice
+from engine import play_game
+from journal import (FLAG_AI_OPPONENT, HEADER, RECORD_SIZE, GameStart, JournalWriter, export_jsonl, read_games,
+                     read_records)
+
+
+# 用固定种子进行几局游戏并写入日志，返回 [(种子, 目标分数, 事件列表), ...]
+def write_games(path, count=3, target_score=2000):
+    games = []
+    with JournalWriter(str(path), flush_interval=0) as journal:
+        for seed in range(count):
+            events = []
+
+            def on_events(batch):
+                events.extend(batch)
+                journal.write(batch)
+
+            journal.begin_game(seed, target_score, FLAG_AI_OPPONENT)
+            play_game(target_score, [greedy_choice, weighted_choice], random.Random(seed), on_events=on_events)
+            games.append((seed, target_score, events))
+    return games
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "journal" / "games.kcdj"
+    games = write_games(path)
+    assert (path.stat().st_size - HEADER.size) % RECORD_SIZE == 0
+
+    loaded = list(read_games(str(path)))
+    assert len(loaded) == len(games)
+    for (start, events), (seed, target_score, expected) in zip(loaded, games):
+        assert (start.seed, start.target_score, start.flags) == (seed, target_score, FLAG_AI_OPPONENT)
+        assert events == expected
+
+    records = list(read_records(str(path), block_records=7))  # 记录跨读取块时结果不变
+    assert sum(isinstance(record, GameStart) for record in records) == len(games)
+    assert len(records) == sum(len(events) + 1 for _, _, events in games)
+
+
+def test_append_to_existing_journal(tmp_path):
+    path = tmp_path / "games.kcdj"
+    first = write_games(path, count=1)
+    second = write_games(path, count=2)
+    assert [events for _, events in read_games(str(path))] == [events for _, _, events in first + second]
+
+
+def test_export_jsonl(tmp_path):
+    path = tmp_path / "games.kcdj"
+    games = write_games(path, count=2)
+    out = io.StringIO()
+    count = export_jsonl(str(path), out)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == len(lines) == sum(len(events) + 1 for _, _, events in games)
+
+    starts = [line for line in lines if line.get("kind") == "start"]
+    assert [(line["game"], line["seed"]) for line in starts] == [(0, 0), (1, 1)]
+    first_event = lines[1]
+    assert first_event["game"] == 0
+    assert first_event["kind"] == games[0][2][0].kind
+    assert first_event["dice"] == list(games[0][2][0].dice)
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = tmp_path / "games.kcdj"
+    games = write_games(path, count=1)
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD_SIZE // 2))  # 写到一半的记录
+    (_, events), = read_games(str(path))
+    assert events == games[0][2]
+
+    # 再次打开时截掉不完整的记录，新记录仍然对齐
+    more = write_games(path, count=1)
+    assert [events for _, events in read_games(str(path))] == [games[0][2], more[0][2]]
+
+
+@pytest.mark.parametrize("data", [b"", b"KCD", b"NOPE\x01\x14", b"KCDJ\x02\x14", b"KCDJ\x01\x10"])
+def test_bad_header(tmp_path, data):
+    path = tmp_path / "games.kcdj"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        list(read_records(str(path)))
+    if data:
+        with pytest.raises(ValueError):
+            JournalWriter(str(path))
+        assert path.read_bytes() == data  # 不覆盖别的文件
@@ -0,0 +1,113 @@
+import asyncio
+
+import match_server
+from protocol import encode_message, read_message
+
+
+async def connect(port, clients=None):
+    client = await asyncio.open_connection("127.0.0.1", port)
+    if clients is not None:
+        clients.append(client)
+    return client
+
+
+async def join(client, **fields):
+    reader, writer = client
+    writer.write(encode_message(dict({"type": "join_room", "name": "同名", "password": ""}, **fields)))
+    while True:
+        message = await asyncio.wait_for(read_message(reader), 5)
+        if message["type"] == "join_result":
+            return message
+
+
+# 座位只认入座时发的凭证：同名的玩家各坐各的，不带凭证的人不能顶替对局中的座位，带凭证可以回到原来的座位
+def test_seats_are_reclaimed_by_token_not_name():
+    async def scenario():
+        server = match_server.MatchServer(2000)
+        server.add_table(1)
+        server.add_table(2)
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        clients = []
+        first, second = await connect(port, clients), await connect(port, clients)
+        a = await join(first)
+        b = await join(second)
+        assert a["room"] == b["room"] == 1
+        assert a["token"] != b["token"]
+        table = server.rooms[1]
+        assert table.match is not None
+
+        impostor = await join(await connect(port, clients), room=1)
+        assert impostor["status"] == "房间已满"
+        stranger = await join(await connect(port, clients))
+        assert stranger["room"] == 2
+
+        first[1].close()
+        back = await join(await connect(port, clients), token=a["token"])
+        assert back["room"] == 1 and back["token"] == a["token"]
+        assert table.seats[0] is not None and table.seats[0].seat == 0
+        await server.close()
+        for _, writer in clients:
+            writer.close()
+
+    asyncio.run(scenario())
+
+
+# 关闭服务器时等待各连接的任务结束，不留下被取消的任务，也不打印异常
+def test_close_leaves_no_tasks():
+    async def scenario():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        server = match_server.MatchServer(2000)
+        server.add_table(1)
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        clients = []
+        await join(await connect(port, clients))
+        await join(await connect(port, clients))
+        assert server.rooms[1].match is not None
+        await server.close()
+        assert not server.peers
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        for _, writer in clients:
+            writer.close()
+        return errors
+
+    assert asyncio.run(scenario()) == []
+
+
+async def create(client, **fields):
+    reader, writer = client
+    writer.write(encode_message(dict({"type": "create_room", "name": "房主", "room_name": "新桌"}, **fields)))
+    while True:
+        message = await asyncio.wait_for(read_message(reader), 5)
+        if message["type"] == "room_created":
+            return message
+
+
+# 玩家开的桌只接受游戏里的几档底注，否则第二位玩家入座开局时打包快照会出错
+def test_create_room_checks_bet():
+    async def scenario():
+        server = match_server.MatchServer(2000)
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        clients = []
+        host = await connect(port, clients)
+        for bet in ("1000", 1500, 1 << 40, -1000, 1000.0, None):
+            reply = await create(host, bet=bet)
+            assert reply == {"type": "room_created", "status": "底注无效"}
+        assert not server.rooms
+
+        created = await create(host, bet=8000)
+        assert created["bet"] == 8000
+        joined = await join(await connect(port, clients), room=created["room"])
+        assert joined["status"] == "确认连接" and joined["bet"] == 8000
+        assert server.rooms[created["room"]].match is not None
+        await server.close()
+        for _, writer in clients:
+            writer.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,185 @@
+import random
+
+import pytest
+
+from ai import greedy_choice
+from dice_rng import DiceStream
+from engine import BANK, GameState
+from netgame import (ClientSync, HostSync, NetSession, apply_delta, keep_intent, pack_snapshot, unpack_deltas,
+                     unpack_intent)
+
+TARGET = 2000
+
+
+# 房主一方：用固定种子进行一整局，每次状态转移后返回要发给对方的 delta 消息
+def host_messages(host, seed):
+    dice = DiceStream(seed)
+    rng = random.Random(seed)
+    state = host.state
+    while not state.winner:
+        message = host.publish(state.roll(dice.roll(state.remaining_dice)))
+        if message is not None:
+            yield message
+        if state.has_rolled:
+            indices, go_on = greedy_choice(state, rng)
+            state.set_kept_indices(indices)
+            message = host.publish(state.continue_turn() if go_on else state.end_turn())
+            if message is not None:
+                yield message
+
+
+# 非权威一方：按收到的消息重放状态，缺了增量时向房主请求补发
+class Client:
+    def __init__(self, host):
+        self.host = host
+        self.sync = ClientSync()
+        self.state = GameState(TARGET)
+        self.resyncs = 0
+
+    def receive(self, message):
+        result = self.sync.accept(message)
+        if result is None:
+            self.resync()
+            return
+        snapshot, deltas = result
+        if snapshot is not None:
+            self.state = snapshot
+        for delta in deltas:
+            apply_delta(self.state, delta)
+
+    # 相当于发送 resync_request(self.sync.seq)，房主的回复直接按顺序送达
+    def resync(self):
+        self.resyncs += 1
+        for message in self.host.sync(self.sync.seq):
+            self.receive(message)
+
+
+def same_state(a, b):
+    return pack_snapshot(0, a) == pack_snapshot(0, b)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_in_order_delivery(seed):
+    host = HostSync(GameState(TARGET))
+    client = Client(host)
+    for message in host_messages(host, seed):
+        client.receive(message)
+        assert client.sync.seq == host.seq
+        assert same_state(client.state, host.state)
+    assert client.resyncs == 0 and client.state.winner
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dropped_deltas_are_recovered(seed):
+    host = HostSync(GameState(TARGET))
+    client = Client(host)
+    rng = random.Random(seed)
+    for message in host_messages(host, seed):
+        if rng.random() < 0.3:
+            continue  # 丢失
+        client.receive(message)
+        assert client.sync.seq == host.seq
+        assert same_state(client.state, host.state)
+    assert client.resyncs > 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_reordered_deltas_are_recovered(seed):
+    host = HostSync(GameState(TARGET))
+    client = Client(host)
+    rng = random.Random(seed)
+    held = []
+    for message in host_messages(host, seed):
+        held.append(message)
+        if len(held) < 3:
+            continue
+        rng.shuffle(held)
+        client.receive(held.pop())
+    for message in held:
+        client.receive(message)  # 迟到的旧增量直接跳过
+    assert client.sync.seq == host.seq
+    assert same_state(client.state, host.state)
+    assert client.resyncs > 0
+
+
+def test_reconnect_after_missing_rounds():
+    host = HostSync(GameState(TARGET))
+    client = Client(host)
+    messages = host_messages(host, 1)
+    for _ in range(3):
+        client.receive(next(messages))
+    for _ in range(20):
+        next(messages)  # 断线期间错过了好几轮
+    seq = client.sync.seq
+    replies = host.sync(seq)
+    assert replies[0]["type"] == "snapshot"  # 序号早于本轮快照，先发快照
+    client.resync()
+    assert client.sync.seq == host.seq and seq < host.checkpoint[0]
+    assert same_state(client.state, host.state)
+    for message in messages:
+        client.receive(message)
+    assert same_state(client.state, host.state)
+
+
+def test_sync_from_latest_sends_nothing():
+    host = HostSync(GameState(TARGET))
+    for message in host_messages(host, 2):
+        pass
+    assert host.sync(host.seq) == []
+    assert host.sync(host.seq + 5)[0]["type"] == "snapshot"  # 对方的序号不可能比房主新
+
+
+def test_session_requests_snapshot_after_mismatch():
+    host_state = GameState(TARGET)
+    to_client, to_host = [], []
+    host = NetSession(to_client.append, is_host=True)
+    host.attach(host_state)
+    guest = NetSession(to_host.append, is_host=False)
+    guest_state = GameState(TARGET)
+    guest.attach(guest_state)
+
+    def deliver():
+        for message in to_client:
+            result = guest.accept(message)
+            if result is None:
+                guest.request_resync()
+                continue
+            snapshot, deltas = result
+            nonlocal guest_state
+            if snapshot is not None:
+                guest_state = snapshot
+            for delta in deltas:
+                apply_delta(guest_state, delta)
+        to_client.clear()
+        for message in to_host:
+            assert message["type"] == "resync"
+            host.resend(message["seq"])
+        to_host.clear()
+
+    dice = DiceStream(3)
+    host.publish(host_state.roll(dice.roll(6)))
+    deliver()
+    assert host_state.has_rolled
+    assert same_state(guest_state, host_state)
+
+    # 本地状态被破坏：丢弃状态，请求快照，在快照到达前的增量都不再应用
+    guest_state.scores[0] = 999
+    guest.request_snapshot()
+    assert to_host == [{"type": "resync", "seq": -1}]
+    to_host.clear()
+    host_state.set_kept_mask(host_state.selection.best_mask())
+    host.publish(host_state.end_turn())
+    assert guest.accept(to_client.pop()) == (None, [])
+    host.resend(-1)
+    deliver()
+    assert guest.seq == host.seq
+    assert same_state(guest_state, host_state)
+
+
+def test_intent_round_trip():
+    message = keep_intent(17, 0b101, go_on=False)
+    assert unpack_intent(message["data"]) == (17, BANK, 0b101)
+    with pytest.raises(ValueError):
+        unpack_intent(message["data"][:4])
+    with pytest.raises(ValueError):
+        unpack_deltas(b"\x13\x01")  # 投掷 3 个骰子却只有 1 个点数
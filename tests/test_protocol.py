@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import room_server
+from protocol import MESSAGE_TYPES, RAW_FIELDS, FrameDecoder, ProtocolError, encode_message, read_message
+
+
+def sample_message(kind):
+    message = {"type": kind, "name": "张三", "room": 1}
+    if kind in RAW_FIELDS:
+        message[RAW_FIELDS[kind]] = bytes([0, 1, 0x10, 255])
+    else:
+        message["dice"] = [1, 5, 6]
+    return message
+
+
+# 通过 StreamReader 和 FrameDecoder 各解码一次，两者都应还原出原消息
+def round_trip(message):
+    data = encode_message(message)
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_message(reader)
+
+    assert asyncio.run(read()) == message
+    assert FrameDecoder().feed(data) == [message]
+
+
+@pytest.mark.parametrize("kind", MESSAGE_TYPES)
+def test_every_message_type_round_trips(kind):
+    round_trip(sample_message(kind))
+    if kind not in RAW_FIELDS:
+        round_trip({"type": kind})
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(ProtocolError):
+        encode_message({"type": "no_such_type"})
+
+
+# 走一遍建房、加入、对局消息转发、退出和关房，服务器发出的每条消息都必须能编解码
+def test_every_server_message_round_trips(monkeypatch):
+    sent = []
+    send = room_server.Peer.send
+
+    def record(peer, message):
+        sent.append(message)
+        send(peer, message)
+
+    monkeypatch.setattr(room_server.Peer, "send", record)
+
+    async def scenario():
+        server = room_server.RoomServer()
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        async def connect():
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            return reader, writer
+
+        def request(client, message):
+            client[1].write(encode_message(message))
+
+        # 读到指定类型的消息为止，保证服务器已经处理完之前的请求
+        async def wait_for(client, kind):
+            while (await asyncio.wait_for(read_message(client[0]), 5))["type"] != kind:
+                pass
+
+        host, guest, other = await connect(), await connect(), await connect()
+        request(host, {"type": "create_room", "name": "房主", "room_name": "房间", "password": "pw", "bet": 2000})
+        await wait_for(host, "room_created")
+        request(other, {"type": "list_rooms"})
+        request(other, {"type": "join_room", "room": 99, "name": "路人"})
+        request(other, {"type": "join_room", "room": 1, "name": "路人", "password": "错"})
+        request(guest, {"type": "join_room", "room": 1, "name": "玩家", "password": "pw"})
+        await wait_for(guest, "join_result")
+        request(other, {"type": "join_room", "room": 1, "name": "路人", "password": "pw"})
+        request(host, {"type": "room_list", "rooms": []})  # 服务器不接受的类型
+        for message in (sample_message("game"), sample_message("delta"), sample_message("snapshot")):
+            request(host, message)
+        for message in (sample_message("intent"), {"type": "resync", "seq": 3}):
+            request(guest, message)
+        request(guest, {"type": "exit_room"})
+        await wait_for(host, "player_left")
+        request(guest, {"type": "join_room", "room": 1, "name": "玩家", "password": "pw"})
+        await wait_for(host, "player_joined")
+        request(host, {"type": "close_room"})
+        await wait_for(guest, "room_closed")
+        for _, writer in (host, guest, other):
+            writer.close()
+        await server.close()
+
+    asyncio.run(scenario())
+    kinds = {message["type"] for message in sent}
+    assert {"room_created", "room_list", "join_result", "player_joined", "player_left", "room_closed", "error",
+            "game", "delta", "snapshot", "intent", "resync"} <= kinds
+    for message in sent:
+        round_trip(message)
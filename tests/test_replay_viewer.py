@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+
+import ai
+import DiceGame
+from dice_rng import DiceStream
+from engine import play_game, ROLL
+from replay import Replay, decisions_from_events
+
+SEED = 7
+TARGET_SCORE = 2000
+
+
+# 一局电脑对电脑的对局，按回放界面的方式重建
+def spectator_replay():
+    events = []
+    play_game(TARGET_SCORE, (ai.greedy_choice, ai.greedy_choice), random.Random(1), on_events=events.extend,
+              dice=DiceStream(SEED))
+    return Replay(SEED, TARGET_SCORE, decisions_from_events(events))
+
+
+# 打开观战对局的回放并跳转后，电脑玩家不应自己投掷骰子
+def test_spectator_replay_does_not_autoplay(monkeypatch):
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("没有可用的显示")
+    root.withdraw()
+    # 把主窗口上的定时回调收集起来手动执行，不必等待真实的延迟
+    scheduled = []
+    monkeypatch.setattr(root, "after", lambda ms, func=None, *args: scheduled.append((func, args)) or "after#0")
+    # 投掷不播放动画，电脑玩家一旦开始投掷就立即产生 ROLL 事件
+    play_roll = DiceGame.DiceGame.play_roll
+    monkeypatch.setattr(DiceGame.DiceGame, "play_roll", lambda self, duration: play_roll(self, 0))
+    rolls = []
+    handle_events = DiceGame.DiceGame.handle_events
+    monkeypatch.setattr(DiceGame.DiceGame, "handle_events",
+                        lambda self, events: rolls.extend(e for e in events if e.kind == ROLL) or handle_events(self, events))
+
+    replay = spectator_replay()
+    viewer = DiceGame.ReplayViewer(root, replay, spectator=True)
+    index = len(replay.turns) // 2
+    viewer.jump(index)
+    for _ in range(200):
+        if not scheduled:
+            break
+        func, args = scheduled.pop(0)
+        if func is not None:
+            func(*args)
+
+    assert rolls == []
+    assert viewer.game.state.scores == replay.turns[index][0].scores
+    assert not viewer.game.state.has_rolled
+    root.destroy()
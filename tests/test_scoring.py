@@ -0,0 +1,82 @@
+import random
+from itertools import combinations_with_replacement
+
+import pytest
+
+from scoring import (KEEP_TABLE, RollSelection, _reference_score, all_dice_scoring, dice_key, is_die_scoring,
+                     legal_keeps, score_batch, score_dice)
+
+# 1~6 个骰子的全部点数组合
+MULTISETS = [dice for n in range(1, 7) for dice in combinations_with_replacement(range(1, 7), n)]
+
+
+def counts_of(dice):
+    counts = [0] * 7
+    for die in dice:
+        counts[die] += 1
+    return counts
+
+
+def reference(dice):
+    return _reference_score(counts_of(dice))
+
+
+# 按原始算法逐个枚举一次投掷的全部选择，返回 {掩码: 得分}，只包含可以计分的选择
+def reference_choices(dice):
+    counts = counts_of(dice)
+    choices = {}
+    for mask in range(1, 1 << len(dice)):
+        kept = [die for i, die in enumerate(dice) if mask >> i & 1]
+        if all(is_die_scoring(die, counts) for die in kept):
+            choices[mask] = reference(kept)
+    return choices
+
+
+def test_score_table_matches_reference():
+    for dice in MULTISETS:
+        assert score_dice(dice) == reference(dice), dice
+        assert score_dice(dice[::-1]) == reference(dice), dice
+
+
+def test_keep_table_matches_reference():
+    for dice in MULTISETS:
+        choices = reference_choices(dice)
+        expected = {}
+        for mask, score in choices.items():
+            faces = tuple(sorted(die for i, die in enumerate(dice) if mask >> i & 1))
+            expected[faces] = score
+        keeps = legal_keeps(dice)
+        assert keeps is KEEP_TABLE[dice_key(dice)]
+        assert {keep.faces: keep.score for keep in keeps} == expected, dice
+        assert len(keeps) == len(expected)  # 去重后每种留法只出现一次
+        scores = [keep.score for keep in keeps]
+        assert scores == sorted(scores, reverse=True)
+        for keep in keeps:
+            assert all_dice_scoring(keep.faces, dice)
+
+
+def test_roll_selection_matches_reference():
+    rng = random.Random(1)
+    for dice in MULTISETS:
+        dice = list(dice)
+        rng.shuffle(dice)  # 按钮顺序与点数顺序无关
+        choices = reference_choices(dice)
+        selection = RollSelection(dice)
+        for mask in range(1 << len(dice)):
+            assert selection.is_valid(mask) == (mask in choices), (dice, mask)
+            assert selection.score(mask) == choices.get(mask, 0), (dice, mask)
+        best = selection.best_mask()
+        assert selection.score(best) == max(choices.values(), default=0)
+
+
+def test_score_batch_matches_scalar():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(2)
+    for k in range(1, 7):
+        rolls = rng.integers(1, 7, size=(2000, k))
+        scores, bust, scoring = score_batch(rolls)
+        for roll, score, busted, flags in zip(rolls.tolist(), scores.tolist(), bust.tolist(), scoring.tolist()):
+            counts = counts_of(roll)
+            assert score == score_dice(roll)
+            assert busted == (score == 0)
+            assert flags == [is_die_scoring(die, counts) for die in roll]
@@ -0,0 +1,79 @@
+import os
+import random
+from itertools import product
+
+import pytest
+
+import solver
+from ai import solver_choice
+from engine import BANK, ROLL, WIN, play_game
+from scoring import MAX_DICE, legal_keeps
+from solver import TurnSolver, cache_path, get_solver
+
+BET = 1000
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    # 求解表缓存写到临时目录，并清空内存中的表
+    monkeypatch.setattr(solver, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(solver, "_solvers", {})
+    return tmp_path
+
+
+def test_one_step_values():
+    # 只差 50 分时任何得分都能获胜，期望存分就是不爆点的概率乘 50
+    table = TurnSolver(BET)
+    for n in range(1, MAX_DICE + 1):
+        rolls = list(product(range(1, 7), repeat=n))
+        scoring = sum(1 for dice in rolls if legal_keeps(dice))
+        assert table.expected_value(0, n, 50) == pytest.approx(50 * scoring / len(rolls))
+    # 已经够分时直接返回剩余分数，且不会继续投掷
+    assert table.expected_value(300, 3, 250) == 250
+    assert not table.should_continue(300, 3, 250)
+
+
+def test_cache_round_trip(cache_dir, monkeypatch):
+    table = get_solver(BET)
+    path = cache_path(BET)
+    assert os.path.dirname(path) == str(cache_dir)
+    assert os.path.getsize(path) == len(table.values) * table.values.itemsize
+    assert get_solver(BET) is table
+
+    # 重新读取缓存文件时不应再求解
+    monkeypatch.setattr(solver, "_solvers", {})
+    monkeypatch.setattr(TurnSolver, "_solve", lambda self: pytest.fail("应读取缓存"))
+    loaded = get_solver(BET)
+    assert loaded is not table
+    assert loaded.values == table.values
+
+
+def test_truncated_cache_is_rebuilt(cache_dir):
+    expected = TurnSolver(BET).values
+    path = cache_path(BET)
+    with open(path, "wb") as f:
+        f.write(b"\0" * 100)
+    assert get_solver(BET).values == expected
+    assert os.path.getsize(path) == len(expected) * expected.itemsize
+
+
+def test_solver_choice_never_banks_too_early(cache_dir):
+    # 没有获胜时：还剩 6 个骰子绝不存分，还剩 4、5 个骰子时本轮不足 300 分不存分
+    banks = []
+    last_roll = []
+
+    def on_events(events):
+        for event in events:
+            if event.kind == ROLL:
+                last_roll[:] = event.dice
+            elif event.kind == BANK and not any(e.kind == WIN for e in events):
+                next_n = len(last_roll) - len(event.dice) or MAX_DICE
+                banks.append((event.round_score, next_n))
+
+    for seed in range(100):
+        play_game(BET, [solver_choice, solver_choice], random.Random(seed), on_events=on_events)
+    assert banks
+    for round_score, next_n in banks:
+        assert next_n < MAX_DICE, round_score
+        if next_n >= 4:
+            assert round_score >= 300, (round_score, next_n)